@@ -3,7 +3,7 @@
 import sys
 import argparse
 
-from odfuzz.constants import INFINITY_TIMEOUT, YEAR_IN_SECONDS
+from odfuzz.constants import INFINITY_TIMEOUT, YEAR_IN_SECONDS, DATABASES
 from odfuzz.exceptions import ArgParserError
 
 FUZZER_DESC = 'Fuzzer for testing applications communicating via the OData protocol'
@@ -22,8 +22,32 @@ class ArgParser:
             raise ArgParserError('Cannot parse command line arguments')
         if parsed_arguments.timeout >= YEAR_IN_SECONDS:
             raise ArgParserError('Fuzzer cannot run for over a year')
+        if parsed_arguments.snapshot and parsed_arguments.database != 'memory':
+            raise ArgParserError('Snapshots are supported only by the in-memory database')
+        if parsed_arguments.workers < 1:
+            raise ArgParserError('At least one worker process is required')
+        if parsed_arguments.workers > 1 and parsed_arguments.database == 'memory':
+            raise ArgParserError('Worker processes cannot share the in-memory database')
+        if parsed_arguments.rate is not None and parsed_arguments.rate <= 0:
+            raise ArgParserError('The rate of requests must be positive')
+        if parsed_arguments.burst < 1:
+            raise ArgParserError('The burst must allow at least one request')
+        parsed_arguments.entity_set_rates = self._parse_entity_set_rates(parsed_arguments.entity_set_rate)
         return parsed_arguments
 
+    def _parse_entity_set_rates(self, entity_set_rates):
+        parsed_rates = {}
+        for entity_set_rate in entity_set_rates or []:
+            try:
+                entity_set, rate = entity_set_rate.split('=')
+                rate = float(rate)
+            except ValueError:
+                raise ArgParserError('Entered rate of an entity set {} is not valid'.format(entity_set_rate))
+            if rate <= 0:
+                raise ArgParserError('The rate of requests of the entity set {} must be positive'.format(entity_set))
+            parsed_rates[entity_set] = rate
+        return parsed_rates
+
     def _add_arguments(self):
         self._parser.add_argument('service', type=str, help='An OData service URL')
         self._parser.add_argument('-l', '--logs', type=str, help='A logs directory')
@@ -37,6 +61,18 @@ class ArgParser:
                                   help='Automatically determine which entities are queryable')
         self._parser.add_argument('-c', '--credentials', type=str, metavar='USERNAME:PASSWORD',
                                   help='User name and password used for authentication')
+        self._parser.add_argument('-d', '--database', type=str, choices=DATABASES, default=DATABASES[0],
+                                  help='A storage of the generated population')
+        self._parser.add_argument('--snapshot', type=str, metavar='FILE',
+                                  help='A file to which the in-memory population is written at exit')
+        self._parser.add_argument('-w', '--workers', type=int, default=1, metavar='N',
+                                  help='A number of worker processes fuzzing disjoint shards of entity sets')
+        self._parser.add_argument('--rate', type=float, metavar='RPS',
+                                  help='A maximum number of requests sent per second by all worker processes')
+        self._parser.add_argument('--burst', type=int, default=1, metavar='N',
+                                  help='A number of requests which may be sent at once after a period of idleness')
+        self._parser.add_argument('--entity-set-rate', type=str, action='append', metavar='ENTITY_SET=RPS',
+                                  help='A maximum number of requests sent per second to the entity set')
 
     def _handle_help_option(self, arguments):
         if '-h' in arguments or '--help' in arguments:
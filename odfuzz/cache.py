@@ -0,0 +1,235 @@
+"""This module contains persistent caches of data retrieved from the fuzzed service."""
+
+import io
+import os
+import json
+import copyreg
+import pickle
+import hashlib
+import logging
+
+from pyodata.v2 import model
+
+from odfuzz import __version__
+from odfuzz.constants import FUZZER_LOGGER
+
+try:
+    from importlib.metadata import version as distribution_version
+except ImportError:  # Python < 3.8
+    from pkg_resources import get_distribution
+
+    def distribution_version(name):
+        return get_distribution(name).version
+
+
+class ProbeCache:
+    """A cache of results of the build-time probes stored in a JSON file.
+
+    Every service has its own directory. The file name contains a hash of the service metadata, so the cached
+    results are reused only as long as the metadata of the service do not change. Worker processes probe different
+    entity sets and save the same file, so the new results are merged into the results saved by the others.
+    """
+
+    def __init__(self, directory, service, metadata):
+        self._path = os.path.join(service_directory(directory, service), 'probes-{}.json'.format(
+            content_hash(metadata)))
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+        self._results = self._load()
+        self._updates = {}
+
+    @property
+    def path(self):
+        return self._path
+
+    def get(self, entity_set_name, probe):
+        return self._results.get(entity_set_name, {}).get(probe)
+
+    def contains(self, entity_set_name, probe):
+        return probe in self._results.get(entity_set_name, {})
+
+    def set(self, entity_set_name, probe, result):
+        self._results.setdefault(entity_set_name, {})[probe] = result
+        self._updates[(entity_set_name, probe)] = result
+
+    def save(self):
+        if not self._updates:
+            return
+        results = self._load()
+        for (entity_set_name, probe), result in self._updates.items():
+            results.setdefault(entity_set_name, {})[probe] = result
+        try:
+            write_file(self._path, json.dumps(results).encode('utf-8'))
+        except OSError as os_error:
+            self._logger.warning('Cannot write the probe cache {}: {}'.format(self._path, os_error))
+        else:
+            self._results = results
+            self._updates = {}
+
+    def _load(self):
+        try:
+            with open(self._path) as cache_file:
+                results = json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as load_error:
+            self._logger.warning('Ignoring the probe cache {}: {}'.format(self._path, load_error))
+            return {}
+        return results if isinstance(results, dict) else {}
+
+
+class NullProbeCache:
+    """A probe cache used when no cache directory is configured; it remembers nothing."""
+
+    def get(self, entity_set_name, probe):
+        return None
+
+    def contains(self, entity_set_name, probe):
+        return False
+
+    def set(self, entity_set_name, probe, result):
+        pass
+
+    def save(self):
+        pass
+
+
+class MetadataCache:
+    """A cache of the last metadata downloaded from a service.
+
+    The metadata are stored together with the ETag and Last-Modified headers of the response, so the next download
+    can be conditional and the stored metadata are used when the service answers 304 Not Modified.
+    """
+
+    def __init__(self, directory, service):
+        service_path = service_directory(directory, service)
+        self._metadata_path = os.path.join(service_path, 'metadata.xml')
+        self._headers_path = os.path.join(service_path, 'metadata.json')
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+
+    def conditional_headers(self):
+        try:
+            with open(self._headers_path) as headers_file:
+                validators = json.load(headers_file)
+        except (OSError, ValueError):
+            return {}
+        if not os.path.isfile(self._metadata_path):
+            return {}
+
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def load(self):
+        try:
+            with open(self._metadata_path, 'rb') as metadata_file:
+                return metadata_file.read()
+        except OSError:
+            return None
+
+    def save(self, metadata, response_headers):
+        validators = {'etag': response_headers.get('ETag'), 'last_modified': response_headers.get('Last-Modified')}
+        try:
+            write_file(self._metadata_path, metadata)
+            write_file(self._headers_path, json.dumps(validators).encode('utf-8'))
+        except OSError as os_error:
+            self._logger.warning('Cannot write the metadata cache {}: {}'.format(self._metadata_path, os_error))
+
+
+class NullMetadataCache:
+    def conditional_headers(self):
+        return {}
+
+    def load(self):
+        return None
+
+    def save(self, metadata, response_headers):
+        pass
+
+
+class DataModelCache:
+    """A cache of data models parsed by PyOData, pickled in files named after a hash of the metadata.
+
+    The hash covers the versions of PyOData and odfuzz as well, so a model pickled by other versions is never
+    unpickled. Models too deeply linked to be pickled within the default recursion limit are not cached.
+    The files are unpickled, so the cache directory has to be trusted.
+    """
+
+    def __init__(self, directory):
+        self._directory = os.path.join(directory, 'models')
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+
+    def load(self, metadata):
+        path = self._get_path(metadata)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as model_file:
+                return pickle.load(model_file)
+        except Exception as load_error:  # pylint: disable=broad-except
+            # a stale or corrupted file is parsed from the metadata again and overwritten
+            self._logger.warning('Ignoring the data model cache {}: {}'.format(path, load_error))
+            return None
+
+    def save(self, metadata, data_model):
+        path = self._get_path(metadata)
+        try:
+            pickled_model = io.BytesIO()
+            DataModelPickler(pickled_model, protocol=pickle.HIGHEST_PROTOCOL).dump(data_model)
+            write_file(path, pickled_model.getvalue())
+        except (OSError, pickle.PicklingError, RecursionError) as save_error:
+            self._logger.warning('Cannot write the data model cache {}: {!r}'.format(path, save_error))
+
+    def _get_path(self, metadata):
+        versions = 'pyodata {}, odfuzz {}\n'.format(distribution_version('pyodata'), __version__).encode('utf-8')
+        return os.path.join(self._directory, 'model-{}.pickle'.format(content_hash(versions + metadata)))
+
+
+class DataModelPickler(pickle.Pickler):
+    """A pickler of PyOData models which pickles enumerations created inside PyOData classes by their names.
+
+    PyOData creates these enumerations by the functional API, so pickle cannot find them by their qualified names.
+    """
+
+    dispatch_table = {
+        **copyreg.dispatch_table,
+        model.Typ.Kinds: lambda kind: (typ_kind, (kind.name,)),
+        model.Annotation.Kinds: lambda kind: (annotation_kind, (kind.name,)),
+    }
+
+
+def typ_kind(name):
+    return model.Typ.Kinds[name]
+
+
+def annotation_kind(name):
+    return model.Annotation.Kinds[name]
+
+
+class NullDataModelCache:
+    def load(self, metadata):
+        return None
+
+    def save(self, metadata, data_model):
+        pass
+
+
+def service_directory(directory, service):
+    return os.path.join(directory, content_hash(service)[:16])
+
+
+def write_file(path, content):
+    """Write the content to a temporary file first, so readers never see a partially written file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as cache_file:
+        cache_file.write(content)
+    os.replace(temporary_path, path)
+
+
+def content_hash(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
@@ -9,6 +9,20 @@ from odfuzz.constants import (
     DEFAULT_SAP_CLIENT,
     DEFAULT_URLS_PER_PROPERTY,
     DEFAULT_IGNORE_METADATA_RESTRICTIONS,
+    DEFAULT_DB_WRITE_BUFFER_SIZE,
+    DEFAULT_DB_FLUSH_INTERVAL,
+    DEFAULT_MUTATION_SCHEDULER,
+    DEFAULT_VALUE_POOL_SIZE,
+    DEFAULT_PROBES_NUM,
+    DEFAULT_MAX_QUERY_GROUPS,
+    DEFAULT_DISPATCHER,
+    DEFAULT_MIN_ASYNC_REQUESTS_NUM,
+    DEFAULT_MAX_ASYNC_REQUESTS_NUM,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    DEFAULT_RETRY_BUDGET,
     ENV_ASYNC_REQUESTS_NUM,
     ENV_DATA_FORMAT,
     ENV_USE_ENCODER,
@@ -16,6 +30,21 @@ from odfuzz.constants import (
     ENV_SAP_CLIENT,
     ENV_URLS_PER_PROPERTY,
     ENV_IGNORE_METADATA_RESTRICTIONS,
+    ENV_DB_WRITE_BUFFER_SIZE,
+    ENV_DB_FLUSH_INTERVAL,
+    ENV_MUTATION_SCHEDULER,
+    ENV_VALUE_POOL_SIZE,
+    ENV_PROBES_NUM,
+    ENV_MAX_QUERY_GROUPS,
+    ENV_DISPATCHER,
+    ENV_MIN_ASYNC_REQUESTS_NUM,
+    ENV_MAX_ASYNC_REQUESTS_NUM,
+    ENV_BATCH_SIZE,
+    ENV_RETRY_ATTEMPTS,
+    ENV_RETRY_DELAY,
+    ENV_RETRY_MAX_DELAY,
+    ENV_RETRY_BUDGET,
+    ENV_CACHE_DIR,
 )
 
 
@@ -28,6 +57,9 @@ class FuzzerConfig:
         self._urls_per_property = int(env_url_per_property)
         env_ignore_restriction = os.getenv(ENV_IGNORE_METADATA_RESTRICTIONS,DEFAULT_IGNORE_METADATA_RESTRICTIONS)
         self._ignore_restriction = env_ignore_restriction
+        self._mutation_scheduler = os.getenv(ENV_MUTATION_SCHEDULER, DEFAULT_MUTATION_SCHEDULER)
+        self._value_pool_size = int(os.getenv(ENV_VALUE_POOL_SIZE, DEFAULT_VALUE_POOL_SIZE))
+        self._max_query_groups = int(os.getenv(ENV_MAX_QUERY_GROUPS, DEFAULT_MAX_QUERY_GROUPS))
 
         if os.getenv(ENV_USE_ENCODER, DEFAULT_USE_ENCODER) == 'True':
             self._use_encoder = True
@@ -54,12 +86,36 @@ class FuzzerConfig:
     def ignore_restriction(self):
         return self._ignore_restriction
 
+    @property
+    def mutation_scheduler(self):
+        return self._mutation_scheduler
+
+    @property
+    def value_pool_size(self):
+        return self._value_pool_size
+
+    @property
+    def max_query_groups(self):
+        return self._max_query_groups
+
 
 class DispatcherConfig:
     def __init__(self):
         self._cert_file_path = self._data_format = os.getenv(ENV_ODFUZZ_CERTIFICATE_PATH) #intentionaly no default path
         self._data_format = os.getenv(ENV_DATA_FORMAT, DEFAULT_DATA_FORMAT)
-        self._async_requests_num = os.getenv(ENV_ASYNC_REQUESTS_NUM, DEFAULT_ASYNC_REQUESTS_NUM)
+        self._async_requests_num = int(os.getenv(ENV_ASYNC_REQUESTS_NUM, DEFAULT_ASYNC_REQUESTS_NUM))
+        self._min_async_requests_num = int(os.getenv(ENV_MIN_ASYNC_REQUESTS_NUM, DEFAULT_MIN_ASYNC_REQUESTS_NUM)) \
+            or self._async_requests_num
+        self._max_async_requests_num = int(os.getenv(ENV_MAX_ASYNC_REQUESTS_NUM, DEFAULT_MAX_ASYNC_REQUESTS_NUM)) \
+            or self._async_requests_num
+        self._probes_num = int(os.getenv(ENV_PROBES_NUM, DEFAULT_PROBES_NUM))
+        self._cache_dir = os.getenv(ENV_CACHE_DIR) #no cache is used unless a directory is set
+        self._dispatcher = os.getenv(ENV_DISPATCHER, DEFAULT_DISPATCHER)
+        self._batch_size = int(os.getenv(ENV_BATCH_SIZE, DEFAULT_BATCH_SIZE))
+        self._retry_attempts = int(os.getenv(ENV_RETRY_ATTEMPTS, DEFAULT_RETRY_ATTEMPTS))
+        self._retry_delay = float(os.getenv(ENV_RETRY_DELAY, DEFAULT_RETRY_DELAY))
+        self._retry_max_delay = float(os.getenv(ENV_RETRY_MAX_DELAY, DEFAULT_RETRY_MAX_DELAY))
+        self._retry_budget = float(os.getenv(ENV_RETRY_BUDGET, DEFAULT_RETRY_BUDGET))
 
     @property
     def has_certificate(self):
@@ -74,6 +130,60 @@ class DispatcherConfig:
     def async_requests_num(self):
         return self._async_requests_num
 
+    @property
+    def min_async_requests_num(self):
+        return self._min_async_requests_num
+
+    @property
+    def max_async_requests_num(self):
+        return self._max_async_requests_num
+
+    @property
+    def probes_num(self):
+        return self._probes_num
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def dispatcher(self):
+        return self._dispatcher
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def retry_attempts(self):
+        return self._retry_attempts
+
+    @property
+    def retry_delay(self):
+        return self._retry_delay
+
+    @property
+    def retry_max_delay(self):
+        return self._retry_max_delay
+
+    @property
+    def retry_budget(self):
+        return self._retry_budget
+
+
+class DatabaseConfig:
+    def __init__(self):
+        self._write_buffer_size = int(os.getenv(ENV_DB_WRITE_BUFFER_SIZE, DEFAULT_DB_WRITE_BUFFER_SIZE))
+        self._flush_interval = float(os.getenv(ENV_DB_FLUSH_INTERVAL, DEFAULT_DB_FLUSH_INTERVAL))
+
+    @property
+    def write_buffer_size(self):
+        return self._write_buffer_size
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval
+
 
 class Config:
     fuzzer = None
@@ -15,6 +15,10 @@ FILTER_LOGS_NAME = 'stats_filter'
 DATA_RESPONSES_NAME = 'data_responses'
 URLS_LOGS_NAME = 'list_urls'
 RUNTIME_FILE_NAME = 'runtime_info.txt'
+MUTATION_STATS_FILE_NAME = 'mutation_operators.csv'
+# used in odfuzz.py; every worker process writes its logs and stats to its own subdirectory
+WORKER_DIRECTORY_NAME = 'worker_{}'
+WORKER_STATS_FILE_NAME = 'worker_stats.json'
 
 # this set of constants must be equal to the corresponding
 # logger keys defined in the CONFIG_PATH
@@ -27,6 +31,10 @@ RESPONSE_LOGGER = 'data'
 # used in databases.py as a name of the database in MongoDB (https://docs.mongodb.com/manual/core/databases-and-collections/);
 # collections are created for each OData service separately
 MONGODB_NAME = 'odfuzz'
+# used in arguments.py as choices of the population storage; the first one is the default
+DATABASES = ('mongodb', 'memory')
+# used in config.py and fuzzer.py as names of dispatchers sending the fuzzed requests; the first one is the default
+DISPATCHERS = ('gevent', 'asyncio')
 
 # used for mounting adapters in the module `requests` (this may be located right in Dispatcher)
 ACCESS_PROTOCOL = 'https://'
@@ -41,6 +49,21 @@ ENV_ASYNC_REQUESTS_NUM = 'ODFUZZ_ASYNC_REQUESTS_NUM'
 ENV_ODFUZZ_CERTIFICATE_PATH = 'ODFUZZ_CERTIFICATE_PATH'
 ENV_USE_ENCODER = 'ODFUZZ_USE_ENCODER'
 ENV_IGNORE_METADATA_RESTRICTIONS = 'ODFUZZ_IGNORE_METADATA_RESTRICTIONS'
+ENV_DB_WRITE_BUFFER_SIZE = 'ODFUZZ_DB_WRITE_BUFFER_SIZE'
+ENV_DB_FLUSH_INTERVAL = 'ODFUZZ_DB_FLUSH_INTERVAL'
+ENV_MUTATION_SCHEDULER = 'ODFUZZ_MUTATION_SCHEDULER'
+ENV_VALUE_POOL_SIZE = 'ODFUZZ_VALUE_POOL_SIZE'
+ENV_PROBES_NUM = 'ODFUZZ_PROBES_NUM'
+ENV_MAX_QUERY_GROUPS = 'ODFUZZ_MAX_QUERY_GROUPS'
+ENV_DISPATCHER = 'ODFUZZ_DISPATCHER'
+ENV_MIN_ASYNC_REQUESTS_NUM = 'ODFUZZ_MIN_ASYNC_REQUESTS_NUM'
+ENV_MAX_ASYNC_REQUESTS_NUM = 'ODFUZZ_MAX_ASYNC_REQUESTS_NUM'
+ENV_BATCH_SIZE = 'ODFUZZ_BATCH_SIZE'
+ENV_RETRY_ATTEMPTS = 'ODFUZZ_RETRY_ATTEMPTS'
+ENV_RETRY_DELAY = 'ODFUZZ_RETRY_DELAY'
+ENV_RETRY_MAX_DELAY = 'ODFUZZ_RETRY_MAX_DELAY'
+ENV_RETRY_BUDGET = 'ODFUZZ_RETRY_BUDGET'
+ENV_CACHE_DIR = 'ODFUZZ_CACHE_DIR'
 
 # default configuration values; these values are retrieved by default if no environment variable overwrites them
 DEFAULT_SAP_CLIENT = '500'
@@ -48,6 +71,22 @@ DEFAULT_DATA_FORMAT = 'json'
 DEFAULT_URLS_PER_PROPERTY = 100
 DEFAULT_ASYNC_REQUESTS_NUM = 10
 DEFAULT_IGNORE_METADATA_RESTRICTIONS = 'False'
+DEFAULT_DB_WRITE_BUFFER_SIZE = 64
+DEFAULT_DB_FLUSH_INTERVAL = 1.0
+DEFAULT_MUTATION_SCHEDULER = 'random'
+DEFAULT_VALUE_POOL_SIZE = 0
+DEFAULT_PROBES_NUM = 20
+DEFAULT_MAX_QUERY_GROUPS = 0
+DEFAULT_DISPATCHER = 'gevent'
+# 0 stands for the value of ODFUZZ_ASYNC_REQUESTS_NUM, i.e. the number of concurrent requests is not adapted
+DEFAULT_MIN_ASYNC_REQUESTS_NUM = 0
+DEFAULT_MAX_ASYNC_REQUESTS_NUM = 0
+# 0 stands for sending every request separately, without $batch
+DEFAULT_BATCH_SIZE = 0
+DEFAULT_RETRY_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 100.0
+DEFAULT_RETRY_BUDGET = 0.1
 
 DEFAULT_USE_ENCODER = 'True'
 
@@ -121,6 +160,11 @@ ORDERBY_MAX_PROPS = 3
 
 INT_MAX = 2147483647
 
+# used in entities.py as names of the build-time probes kept by Prober and stored in the probe cache (cache.py)
+PROBE_ENTITY_SET = 'entity_set'
+PROBE_ENTITY = 'entity'
+PROBE_COUNT = 'count'
+
 SCORE_EPS = 200
 ELITE_PROB = 0.7
 FILTER_DEL_PROB = 0.1
@@ -130,17 +174,32 @@ MAX_MULTI_VALUES = 3
 MAX_EXPAND_VALUES = 3
 FILTER_SAMPLE_SIZE = 30
 MAX_BEST_QUERIES = 30
+SCORE_CACHE_SIZE = 10000
 INLINECOUNT_ALL_PAGES_PROB = 0.5
 
 # headers for CSV files (StatsLogger, ResponseTimeLogger)
 CSV = 'StatusCode;ErrorCode;ErrorMessage;EntitySet;AccessibleSet;AccessibleKeys;Property;orderby;top;skip;filter;expand;search;inlinecount;hash'
 CSV_FILTER = 'StatusCode;ErrorCode;ErrorMessage;EntitySet;Property;logical;operator;function;operand;hash'
 CSV_RESPONSES_HEADER = 'Time;Data;EntitySet;URL;Brief'
+CSV_MUTATION_STATS_HEADER = 'Mutator;Operator;Selections;Evaluations;Improvements;AverageScore'
 
 INFINITY_TIMEOUT = -1
 YEAR_IN_SECONDS = 31622400
 REQUEST_TIMEOUT = 600
-RETRY_TIMEOUT = 100
+# the retry budget starts with the reserve of retries and never grows above the capacity (fuzzer.py, RetryPolicy)
+RETRY_BUDGET_RESERVE = 10
+RETRY_BUDGET_CAPACITY = 100
+# responses with these status codes are sent again; they are caused by the load of the service, not by the query
+RETRYABLE_STATUS_CODES = (429, 503)
+# the number of concurrent requests is multiplied by this factor when the service is overloaded
+# (fuzzer.py, ConcurrencyLimiter)
+CONCURRENCY_DECREASE_FACTOR = 0.75
+# the service is considered overloaded when the short-term average latency exceeds the long-term one this many times
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.1
+BASELINE_LATENCY_SMOOTHING = 0.01
+# seconds for which an incomplete $batch request waits for more requests before it is sent (fuzzer.py, BatchDispatcher)
+BATCH_LINGER = 0.05
 
 # range for basic charsets for generator (generators.py) and mutators (mutators.py)
 HEX_BINARY = 'ABCDEFabcdef0123456789'
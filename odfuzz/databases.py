@@ -1,14 +1,34 @@
-"""This module defines an interface for local databases. At the moment, the only supported database is mongoDB."""
+"""This module defines an interface for local databases. Supported are mongoDB and a pure-Python in-memory store."""
 
+import os
+import time
+import asyncio
+import functools
+import heapq
+import weakref
 import random
 import uuid
+import itertools
+
+from collections import Counter, OrderedDict, namedtuple
 
 
 # pylint: disable=unused-import
 from abc import ABCMeta, abstractmethod
-from pymongo import errors, MongoClient, ASCENDING, DESCENDING
+from pymongo import errors, MongoClient, InsertOne, DeleteOne, DeleteMany, ASCENDING, DESCENDING
+from bson import json_util
+import gevent
+
+from odfuzz.constants import MONGODB_NAME, FILTER_PARTS_NUM, FILTER_SAMPLE_SIZE, MAX_BEST_QUERIES, SCORE_CACHE_SIZE
+
+DUPLICATE_KEY_ERROR_CODE = 11000
 
-from odfuzz.constants import MONGODB_NAME, FILTER_PARTS_NUM, FILTER_SAMPLE_SIZE, MAX_BEST_QUERIES
+# handlers which may hold buffered writes; see flush_all()
+_buffered_handlers = weakref.WeakSet()
+
+# a write request of a flush with the scores it removes from the population and a function which puts
+# the buffered operation back when the request fails; the document is set for inserts only
+BufferedWrite = namedtuple('BufferedWrite', 'request removed_scores restore document')
 
 
 class CollectionCreator:
@@ -25,15 +45,176 @@ class CollectionCreator:
         return self._collection_name
 
 
+class PopulationScore:
+    """Running statistics of scores of all entries stored in a collection.
+
+    The statistics are updated on every saved and deleted entry, so they are never
+    aggregated from the whole collection. The minimum and the maximum are kept in heaps
+    from which scores of deleted entries are removed lazily.
+    """
+
+    def __init__(self, scores=()):
+        self._total = 0
+        self._count = 0
+        self._scores = Counter()
+        self._min_heap = []
+        self._max_heap = []
+        for score in scores:
+            self.add(score)
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def average(self):
+        if self._count == 0:
+            return 0
+        return self._total / self._count
+
+    @property
+    def minimum(self):
+        return self._peek(self._min_heap, 1)
+
+    @property
+    def maximum(self):
+        return self._peek(self._max_heap, -1)
+
+    def add(self, score):
+        self._total += score
+        self._count += 1
+        if self._scores[score] == 0:
+            heapq.heappush(self._min_heap, score)
+            heapq.heappush(self._max_heap, -score)
+        self._scores[score] += 1
+
+    def remove(self, score):
+        self._total -= score
+        self._count -= 1
+        self._scores[score] -= 1
+        if self._scores[score] == 0:
+            del self._scores[score]
+
+    def clear(self):
+        self.__init__()
+
+    def _peek(self, heap, sign):
+        while heap and sign * heap[0] not in self._scores:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return sign * heap[0]
+
+
+class SharedPopulationScore:
+    """Statistics of scores of all entries stored in a collection shared with other processes.
+
+    Other processes save and delete entries of the collection as well, so the statistics cannot follow
+    the writes of this process. They are aggregated from the collection when they are refreshed instead.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._total = 0
+        self._count = 0
+        self._minimum = None
+        self._maximum = None
+        self.refresh()
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def average(self):
+        if self._count == 0:
+            return 0
+        return self._total / self._count
+
+    @property
+    def minimum(self):
+        return self._minimum
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    def add(self, score):
+        pass
+
+    def remove(self, score):
+        pass
+
+    def clear(self):
+        self.refresh()
+
+    def refresh(self):
+        results = list(self._collection.aggregate([
+            {'$group': {'_id': None, 'total': {'$sum': '$score'}, 'count': {'$sum': 1},
+                        'minimum': {'$min': '$score'}, 'maximum': {'$max': '$score'}}}
+        ]))
+        result = next(iter(results), {'total': 0, 'count': 0, 'minimum': None, 'maximum': None})
+        self._total, self._count = result['total'], result['count']
+        self._minimum, self._maximum = result['minimum'], result['maximum']
+
+
+class ScoreCache:
+    """A least recently used cache of scores of stored entries, keyed by their IDs."""
+
+    def __init__(self, size):
+        self._size = size
+        self._scores = OrderedDict()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def get(self, entry_id):
+        score = self._scores.get(entry_id)
+        if score is not None:
+            self._scores.move_to_end(entry_id)
+        return score
+
+    def put(self, entry_id, score):
+        self._scores[entry_id] = score
+        self._scores.move_to_end(entry_id)
+        if len(self._scores) > self._size:
+            self._scores.popitem(last=False)
+
+    def discard(self, entry_id):
+        self._scores.pop(entry_id, None)
+
+    def clear(self):
+        self._scores.clear()
+
+
 class DatabaseOperationsHandler:
     @abstractmethod
     def save_entry(self, data):
-        pass
+        """Save the entry unless an entry with the same ID or the same URL hash is already stored.
+
+        :return: True if the entry was saved, False if it was rejected as a duplicate
+        """
+
+    @abstractmethod
+    def is_duplicate(self, data):
+        """Return True if an entry with the same ID or the same URL hash is already stored."""
     
     @abstractmethod
     def find_entry(self, id):
         pass
 
+    @abstractmethod
+    def find_score(self, id):
+        """Return the score of the stored entry or None if there is no such entry."""
+
     @abstractmethod
     def delete_entry(self, id):
         pass
@@ -54,14 +235,33 @@ class DatabaseOperationsHandler:
     def total_score(self):
         pass
     
+    @abstractmethod
+    def population_score(self):
+        pass
+
     @abstractmethod
     def sample_filter_entry(self, entity_set_name, exclude_id):
         pass
     
     @abstractmethod
-    def find_best_entries(self):
+    def find_best_entries(self, entity_set_name):
+        pass
+
+    @abstractmethod
+    def find_distinct_errorous_entity_names(self):
         pass
 
+    def flush(self):
+        """Write all buffered operations to the database."""
+
+    @property
+    def rejected_duplicates(self):
+        """A number of entries which were not saved because they were already stored."""
+        return self._rejected_duplicates
+
+    def close(self):
+        """Release resources held by the handler when the fuzzer exits."""
+
 
 class MongoDB:
     def __init__(self, collection_name):
@@ -76,63 +276,557 @@ class MongoDB:
 
 
 class MongoDBHandler(DatabaseOperationsHandler):
-    def __init__(self, mongodb_client):
+    """A handler which buffers writes and sends them to mongoDB in bulks.
+
+    Saved and deleted entries are collected in a write-behind buffer. The buffer is flushed when it holds
+    `write_buffer_size` operations, when `flush_interval` seconds passed since the last flush or before
+    reading from the collection. A timer flushes the buffer when no other write arrives within the interval.
+    Scores of buffered entries are accounted in the population score right away, scores of deleted entries
+    when the deletions are written. Operations which cannot be written are put back into the buffer.
+
+    Deletion of a buffered entry, whose presence in the collection is not verified yet, is reported as
+    successful. If the entry turns out to be missing, the worst entry is deleted instead, as it is done by
+    the callers of `delete_entry`. By default, the buffer holds a single operation only, i.e. all writes are
+    sent immediately.
+
+    A collection shared with other processes is modified by them as well, so the population score is then
+    aggregated from the collection whenever it is read.
+    """
+
+    def __init__(self, mongodb_client, write_buffer_size=1, flush_interval=0, shared_collection=False):
         self._collection = mongodb_client.collection
+        self._rejected_duplicates = 0
+        self._create_indexes()
+        self._shared_collection = shared_collection
+        if shared_collection:
+            self._population_score = SharedPopulationScore(self._collection)
+        else:
+            self._population_score = PopulationScore(
+                query['score'] for query in self._collection.find({}, {'score': 1}))
+        self._score_cache = ScoreCache(SCORE_CACHE_SIZE)
+
+        self._write_buffer_size = write_buffer_size
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._pending_inserts = OrderedDict()
+        self._pending_hashes = set()
+        self._pending_deletes = OrderedDict()
+        self._pending_evictions = 0
+        self._scheduled_flush = None
+        _buffered_handlers.add(self)
     
     def save_entry(self, data):
-        if self._collection.find(data).count() == 0:
-            self._collection.insert_one(data)
+        if data['_id'] in self._pending_inserts or data.get('hash') in self._pending_hashes:
+            self._rejected_duplicates += 1
+            return False
+        self._buffer_insert(data)
+        self._population_score.add(data['score'])
+        self._score_cache.put(data['_id'], data['score'])
+        if self._is_flush_due():
+            _, rejected_ids = self._flush()
+            return data['_id'] not in rejected_ids
+        self._schedule_flush()
+        return True
     
+    def is_duplicate(self, data):
+        url_hash = data.get('hash')
+        if data['_id'] in self._pending_inserts or url_hash in self._pending_hashes:
+            return True
+        # a duplicate stored in the collection would be rejected by the unique index only when the buffer is flushed
+        query_filter = {'_id': data['_id']}
+        if url_hash is not None:
+            query_filter = {'$or': [query_filter, {'hash': url_hash}]}
+        return self._collection.find_one(query_filter, {'_id': 1}) is not None
+
     def find_entry(self, id):
+        if id in self._pending_inserts:
+            return self._pending_inserts[id]
+        if id in self._pending_deletes:
+            return None
         queries = list(self._collection.find({'_id': id}))
-        return next(iter(queries), None)
+        query = next(iter(queries), None)
+        if query is not None:
+            self._score_cache.put(id, query['score'])
+        return query
+
+    def find_score(self, id):
+        if id in self._pending_deletes:
+            return None
+        score = self._score_cache.get(id)
+        if score is not None:
+            return score
+        query = self.find_entry(id)
+        if query is None:
+            return None
+        return query['score']
     
     def delete_entry(self, id):
-        result = self._collection.delete_one({'_id': id})
-        return result.deleted_count
+        self._score_cache.discard(id)
+        document = self._pending_inserts.pop(id, None)
+        if document is not None:
+            self._pending_hashes.discard(document.get('hash'))
+            self._population_score.remove(document['score'])
+            return 1
+        if id in self._pending_deletes:
+            return 0
+        if self._is_flush_due(1):
+            self._pending_deletes[id] = False
+            missed_ids, _ = self._flush()
+            return int(id not in missed_ids)
+        # the deletion is verified later, when the buffer is flushed
+        self._pending_deletes[id] = True
+        self._schedule_flush()
+        return 1
     
     def delete_worst_entries(self, number):
         if number > 0:
-            queries = self._collection.find().sort('score', ASCENDING).limit(number)
-
-            ids_to_remove = [query['_id'] for query in queries]
-            self._collection.delete_many({'_id': {'$in': ids_to_remove}})
+            self._pending_evictions += number
+            self._flush_if_due()
+            self._schedule_flush()
 
     def delete_collection(self):
+        self._clear_buffer()
         self._collection.drop()
+        self._create_indexes()
+        self._population_score.clear()
+        self._score_cache.clear()
 
     def total_entries(self):
-        return self._collection.find().count()
+        return self.population_score().count
     
     def total_score(self):
-        scores = list(self._collection.aggregate([
-            {'$project': {'score': 1}},
-            {'$group': {'_id': None, 'overall': {'$sum': '$score'}}}
-        ]))
-        if  scores:
-            overall_score = scores[0]['overall']
-        else:
-            overall_score = 0
-        return overall_score
-    
+        return self.population_score().total
+
+    def population_score(self):
+        self.flush()
+        if self._shared_collection:
+            self._population_score.refresh()
+        return self._population_score
+
+    def flush(self):
+        """Send all buffered operations to mongoDB in a single unordered bulk."""
+        self._flush()
+
+    def close(self):
+        self.flush()
+
+    def _flush(self):
+        """Send all buffered operations and return IDs of missed deletions and IDs of rejected duplicates."""
+        inserts, deletes, evictions = self._pending_inserts, self._pending_deletes, self._pending_evictions
+        self._clear_buffer()
+        self._last_flush = time.monotonic()
+        if not (inserts or deletes or evictions):
+            return set(), set()
+
+        writes = []
+        missed_ids = set()
+        buffered_evictions = evictions
+        try:
+            found_scores = {}
+            if deletes:
+                found_scores = {query['_id']: query['score'] for query in
+                                self._collection.find({'_id': {'$in': list(deletes)}}, {'score': 1})}
+                for entry_id, compensate in deletes.items():
+                    if entry_id in found_scores:
+                        writes.append(BufferedWrite(DeleteOne({'_id': entry_id}), [found_scores[entry_id]],
+                                                    functools.partial(self._buffer_delete, entry_id, compensate),
+                                                    None))
+                    else:
+                        missed_ids.add(entry_id)
+                        evictions += compensate
+            if evictions:
+                writes.extend(self._evict_worst_entries(evictions, list(found_scores)))
+        except errors.PyMongoError:
+            # nothing is written yet
+            self._restore_buffer(inserts, deletes, buffered_evictions)
+            raise
+
+        writes.extend(BufferedWrite(InsertOne(document), [], functools.partial(self._buffer_insert, document),
+                                    document) for document in inserts.values())
+        return missed_ids, self._bulk_write(writes)
+
     def sample_filter_entry(self, entity_set_name, exclude_id):
+        self.flush()
         queries = list(self._collection.aggregate([
-            {'$match': {'entity_set': entity_set_name, '_id': {'$ne': exclude_id},
-                        '_$filter.parts': {'$exists': True},
-                        '$expr': {'$gte': [{'$size': '$_$filter.parts'}, FILTER_PARTS_NUM]}}},
+            {'$match': {'entity_set': entity_set_name, 'filter_parts_count': {'$gte': FILTER_PARTS_NUM},
+                        '_id': {'$ne': exclude_id}}},
             {'$sample': {'size': FILTER_SAMPLE_SIZE}},
             {'$sort': {'score': DESCENDING}}, {'$limit': 1}
         ]))
-        return next(iter(queries), None)
+        query = next(iter(queries), None)
+        if query is not None:
+            # the sampled entry is likely to become a parent whose score is compared with its offspring's score
+            self._score_cache.put(query['_id'], query['score'])
+        return query
     
     def find_best_entries(self, entity_set_name):
+        self.flush()
         queries = self._collection.find(
             {'entity_set': entity_set_name, 'http': '500'}).sort([('score', DESCENDING)]).limit(MAX_BEST_QUERIES)
         return list(queries)
 
     def find_distinct_errorous_entity_names(self):
+        self.flush()
         entity_names = self._collection.aggregate([
             {'$match': {'http': '500'}},
             {'$group': {'_id': '$entity_set'}}
         ])
         return [entity_name['_id'] for entity_name in entity_names]
+
+    def _evict_worst_entries(self, number, exclude_ids):
+        """Evict entries with the lowest score, except the excluded ones, by the score index.
+
+        A single entry is deleted right away by one call. Otherwise, the entries are only looked up and
+        a request which deletes them is returned, so it can be written within the bulk of other requests.
+        """
+        query_filter = {'_id': {'$nin': list(exclude_ids)}} if exclude_ids else {}
+        if number == 1:
+            query = self._collection.find_one_and_delete(
+                query_filter, projection={'score': 1}, sort=[('score', ASCENDING)])
+            if query is not None:
+                self._population_score.remove(query['score'])
+                self._score_cache.discard(query['_id'])
+            return []
+
+        queries = list(self._collection.find(query_filter, {'score': 1}).sort('score', ASCENDING).limit(number))
+        for query in queries:
+            self._score_cache.discard(query['_id'])
+        if not queries:
+            return []
+        return [BufferedWrite(DeleteMany({'_id': {'$in': [query['_id'] for query in queries]}}),
+                              [query['score'] for query in queries],
+                              functools.partial(self._buffer_evictions, number), None)]
+
+    def _create_indexes(self):
+        # entries saved by older versions do not contain the hash, hence the sparse index
+        self._collection.create_index('hash', unique=True, sparse=True)
+        # eviction of the worst entries
+        self._collection.create_index('score')
+        # sampling of parents within an entity set
+        self._collection.create_index([('entity_set', ASCENDING), ('score', DESCENDING)])
+        self._collection.create_index([('entity_set', ASCENDING), ('filter_parts_count', ASCENDING)])
+        # find_best_entries()
+        self._collection.create_index([('entity_set', ASCENDING), ('http', ASCENDING), ('score', DESCENDING)])
+
+    def _bulk_write(self, writes):
+        """Write the requests in an unordered bulk and return IDs of rejected duplicates.
+
+        The failed operations, except for the rejected duplicates, are put back into the buffer and the error
+        is raised, so they are written by the next flush.
+        """
+        if not writes:
+            return set()
+        write_errors = {}
+        try:
+            self._collection.bulk_write([write.request for write in writes], ordered=False)
+        except errors.BulkWriteError as bulk_error:
+            write_errors = {write_error['index']: write_error['code']
+                            for write_error in bulk_error.details['writeErrors']}
+            error = bulk_error
+        except errors.PyMongoError:
+            # it is unknown which requests were written, so all of them are sent again
+            for write in writes:
+                write.restore()
+            raise
+
+        rejected_ids = set()
+        failed = False
+        for index, write in enumerate(writes):
+            error_code = write_errors.get(index)
+            if error_code is None:
+                for score in write.removed_scores:
+                    self._population_score.remove(score)
+            elif error_code == DUPLICATE_KEY_ERROR_CODE and write.document is not None:
+                rejected_ids.add(write.document['_id'])
+                self._score_cache.discard(write.document['_id'])
+                self._rejected_duplicates += 1
+                self._population_score.remove(write.document['score'])
+            else:
+                write.restore()
+                failed = True
+        if failed:
+            raise error
+        return rejected_ids
+
+    def _is_flush_due(self, incoming=0):
+        buffered = len(self._pending_inserts) + len(self._pending_deletes) + self._pending_evictions + incoming
+        return buffered >= self._write_buffer_size or \
+            time.monotonic() - self._last_flush >= self._flush_interval
+
+    def _flush_if_due(self):
+        if self._is_flush_due():
+            self.flush()
+
+    def _schedule_flush(self):
+        """Flush the buffer when the interval passes, even if no other write arrives until then."""
+        if self._scheduled_flush is not None or not self._has_buffered():
+            return
+        delay = max(self._last_flush + self._flush_interval - time.monotonic(), 0)
+        # the asyncio dispatcher saves the queries from its event loop, which does not run greenlets;
+        # asyncio.get_running_loop() is not available in Python 3.6
+        loop = asyncio._get_running_loop()
+        if loop is None:
+            self._scheduled_flush = gevent.spawn_later(delay, self._run_scheduled_flush)
+        else:
+            self._scheduled_flush = loop.call_later(delay, self._run_scheduled_flush)
+
+    def _run_scheduled_flush(self):
+        self._scheduled_flush = None
+        self._flush_if_due()
+        self._schedule_flush()
+
+    def _has_buffered(self):
+        return bool(self._pending_inserts or self._pending_deletes or self._pending_evictions)
+
+    def _buffer_insert(self, document):
+        self._pending_inserts[document['_id']] = document
+        if document.get('hash') is not None:
+            self._pending_hashes.add(document['hash'])
+
+    def _buffer_delete(self, entry_id, compensate):
+        self._pending_deletes[entry_id] = compensate
+
+    def _buffer_evictions(self, number):
+        self._pending_evictions += number
+
+    def _restore_buffer(self, inserts, deletes, evictions):
+        for document in inserts.values():
+            self._buffer_insert(document)
+        for entry_id, compensate in deletes.items():
+            self._buffer_delete(entry_id, compensate)
+        self._buffer_evictions(evictions)
+
+    def _clear_buffer(self):
+        self._pending_inserts = OrderedDict()
+        self._pending_hashes = set()
+        self._pending_deletes = OrderedDict()
+        self._pending_evictions = 0
+
+
+class SampledSet:
+    """A set of items from which random samples are drawn in time proportional to the sample size."""
+
+    def __init__(self):
+        self._items = []
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last_item = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last_item
+            self._positions[last_item] = position
+
+    def sample(self, size):
+        size = min(size, len(self._items))
+        return [self._items[position] for position in random.sample(range(len(self._items)), size)]
+
+
+class MemoryCollection:
+    """Documents of a single collection together with structures which keep the handler's operations cheap.
+
+    Scores are kept in a heap ordered from the worst to the best one. Removed entries stay in the heap and
+    are marked as such (see https://docs.python.org/3/library/heapq.html#priority-queue-implementation-notes).
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.hashes = set()
+        self.entity_sets = {}
+        self.crossable = {}
+        self.heap = []
+        self.heap_entries = {}
+        self.population_score = PopulationScore()
+        self.counter = itertools.count()
+
+    def clear(self):
+        self.__init__()
+
+
+class MemoryDB:
+    """An in-process replacement of the mongoDB client.
+
+    Collections are shared by all clients within the process, so the collection
+    can be opened again, e.g. by the statistics printer, when the fuzzer exits.
+    """
+
+    _collections = {}
+
+    def __init__(self, collection_name, snapshot_file=None):
+        self._collection = MemoryDB._collections.setdefault(collection_name, MemoryCollection())
+        self._snapshot_file = snapshot_file
+
+    @property
+    def collection(self):
+        return self._collection
+
+    @property
+    def snapshot_file(self):
+        return self._snapshot_file
+
+
+class InMemoryDBHandler(DatabaseOperationsHandler):
+    """A handler of the in-memory collection.
+
+    Documents are not copied when they are saved or returned. The fuzzer never modifies them;
+    offspring are built by copying only the changed parts of their parents.
+    """
+
+    _REMOVED = None
+
+    def __init__(self, memorydb_client):
+        self._collection = memorydb_client.collection
+        self._snapshot_file = memorydb_client.snapshot_file
+        self._rejected_duplicates = 0
+
+    def save_entry(self, data):
+        entry_id = data['_id']
+        url_hash = data.get('hash')
+        if self.is_duplicate(data):
+            self._rejected_duplicates += 1
+            return False
+        document = dict(data)
+        self._collection.documents[entry_id] = document
+        if url_hash is not None:
+            self._collection.hashes.add(url_hash)
+        self._collection.entity_sets.setdefault(document['entity_set'], {})[entry_id] = document
+        if filter_parts_count(document) >= FILTER_PARTS_NUM:
+            self._collection.crossable.setdefault(document['entity_set'], SampledSet()).add(entry_id)
+        self._collection.population_score.add(document['score'])
+
+        heap_entry = [document['score'], next(self._collection.counter), entry_id]
+        self._collection.heap_entries[entry_id] = heap_entry
+        heapq.heappush(self._collection.heap, heap_entry)
+        return True
+
+    def is_duplicate(self, data):
+        return data['_id'] in self._collection.documents or data.get('hash') in self._collection.hashes
+
+    def find_entry(self, id):
+        return self._collection.documents.get(id)
+
+    def find_score(self, id):
+        document = self._collection.documents.get(id)
+        if document is None:
+            return None
+        return document['score']
+
+    def delete_entry(self, id):
+        document = self._collection.documents.pop(id, None)
+        if document is None:
+            return 0
+        self._unindex_document(document)
+        heap_entry = self._collection.heap_entries.pop(id)
+        heap_entry[-1] = self._REMOVED
+        self._compact_heap()
+        return 1
+
+    def delete_worst_entries(self, number):
+        heap = self._collection.heap
+        while number > 0 and heap:
+            _, _, entry_id = heapq.heappop(heap)
+            if entry_id is self._REMOVED:
+                continue
+            del self._collection.heap_entries[entry_id]
+            self._unindex_document(self._collection.documents.pop(entry_id))
+            number -= 1
+
+    def delete_collection(self):
+        self._collection.clear()
+
+    def total_entries(self):
+        return self._collection.population_score.count
+
+    def total_score(self):
+        return self._collection.population_score.total
+
+    def population_score(self):
+        return self._collection.population_score
+
+    def sample_filter_entry(self, entity_set_name, exclude_id):
+        crossable = self._collection.crossable.get(entity_set_name)
+        if not crossable:
+            return None
+        # sample one more entry in case the excluded one is drawn
+        sample = [entry_id for entry_id in crossable.sample(FILTER_SAMPLE_SIZE + 1) if entry_id != exclude_id]
+        if not sample:
+            return None
+        documents = [self._collection.documents[entry_id] for entry_id in sample[:FILTER_SAMPLE_SIZE]]
+        return max(documents, key=lambda document: document['score'])
+
+    def find_best_entries(self, entity_set_name):
+        documents = self._collection.entity_sets.get(entity_set_name, {}).values()
+        errorous = [document for document in documents if document['http'] == '500']
+        return heapq.nlargest(MAX_BEST_QUERIES, errorous, key=lambda document: document['score'])
+
+    def find_distinct_errorous_entity_names(self):
+        return [entity_set_name for entity_set_name, documents in self._collection.entity_sets.items()
+                if any(document['http'] == '500' for document in documents.values())]
+
+    def close(self):
+        if self._snapshot_file:
+            self.write_snapshot(self._snapshot_file)
+
+    def write_snapshot(self, file_path):
+        """Write all documents to a file, one extended JSON document per line.
+
+        The file can be imported to mongoDB by `mongoimport --file FILE_PATH`.
+        """
+        temporary_path = file_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as snapshot_file:
+            for document in self._collection.documents.values():
+                snapshot_file.write(json_util.dumps(document) + '\n')
+        os.replace(temporary_path, file_path)
+
+    def _unindex_document(self, document):
+        self._collection.hashes.discard(document.get('hash'))
+        entity_set_documents = self._collection.entity_sets[document['entity_set']]
+        del entity_set_documents[document['_id']]
+        if not entity_set_documents:
+            del self._collection.entity_sets[document['entity_set']]
+        crossable = self._collection.crossable.get(document['entity_set'])
+        if crossable is not None:
+            crossable.discard(document['_id'])
+        self._collection.population_score.remove(document['score'])
+
+    def _compact_heap(self):
+        heap = self._collection.heap
+        if len(heap) > 2 * len(self._collection.heap_entries) + 64:
+            self._collection.heap = [entry for entry in heap if entry[-1] is not self._REMOVED]
+            heapq.heapify(self._collection.heap)
+
+
+def select_database(name, snapshot_file=None, write_buffer_size=1, flush_interval=0, shared_collection=False):
+    """Return a pair of a database handler factory and a database client factory.
+
+    The collection is shared when worker processes store their populations in it.
+    """
+    if name == 'memory':
+        return InMemoryDBHandler, lambda collection_name: MemoryDB(collection_name, snapshot_file)
+    return lambda client: MongoDBHandler(client, write_buffer_size, flush_interval, shared_collection), MongoDB
+
+
+def flush_all():
+    """Flush writes buffered by all existing database handlers, e.g. before the process exits."""
+    for handler in list(_buffered_handlers):
+        handler.flush()
+
+
+def filter_parts_count(document):
+    """Return the number of parts of the $filter option, also for documents saved without the count."""
+    if 'filter_parts_count' in document:
+        return document['filter_parts_count']
+    filter_option = document.get('_$filter')
+    if not filter_option:
+        return 0
+    return len(filter_option.get('parts', []))
@@ -10,11 +10,13 @@ QUERY = part of URL: EntitySet?queryoptions
 import copy
 import random
 import inspect
-import uuid
+import itertools
 import requests
 
+from gevent.pool import Pool
+from gevent.threadpool import ThreadPool
 from abc import ABCMeta, abstractmethod
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 from pyodata.v2.model import Edmx, ComplexType
 from pyodata.exceptions import PyODataException
@@ -27,6 +29,14 @@ from odfuzz.generators import (
     RandomGenerator,
 )
 from odfuzz.monkey import patch_proprties, patch_entity_set
+from odfuzz.cache import (
+    ProbeCache,
+    NullProbeCache,
+    MetadataCache,
+    NullMetadataCache,
+    DataModelCache,
+    NullDataModelCache,
+)
 from odfuzz.config import Config
 
 # pylint: disable=wildcard-import
@@ -37,58 +47,91 @@ NullNavProperties = namedtuple('NullNavProprties', 'nav_proprties')
 NullEntityType = namedtuple('NullEntityType', 'name entity_type')
 StringSelf = namedtuple('StringSelf', 'max_length')
 OptionRestriction = namedtuple('OptionRestriction', 'restr is_restricted')
+Shard = namedtuple('Shard', 'index count')
+
+# all entity sets are fuzzed by a single process
+SINGLE_SHARD = Shard(0, 1)
 
 
 class DispatchedBuilder:
     """A class for building and initializing all queryable entities trough network call."""
 
-    def __init__(self, dispatcher, restrictions, first_touch):
+    def __init__(self, dispatcher, restrictions, first_touch, shard=SINGLE_SHARD):
         self._dispatcher = dispatcher
-        self._queryable = QueryableEntities()
+        self._queryable = LazyQueryableEntities(Config.fuzzer.max_query_groups)
         self._restrictions = restrictions
-
-        if first_touch:
-            self._first_touch = FirstTouch(restrictions, dispatcher)
-        else:
-            self._first_touch = NullFirstTouch(restrictions)
+        self._first_touch = first_touch
+        self._shard = shard
 
     def build(self):
         # call just once on fuzzer process start
-        data_model = self._get_data_model()
+        metadata = self._get_metadata()
+        data_model = get_data_model(metadata)
 
+        # entity sets of other shards are patched too, they may be principal entities of the own ones
         for entity_set in data_model.entity_sets:
             patch_entity_set(entity_set, data_model.association_sets)
             patch_proprties(entity_set.name, entity_set.entity_type.proprties(), self._restrictions)
-            principal_entities = get_principal_entities(data_model, entity_set)
-            restrictions = self._first_touch.analyze(entity_set)
+        entity_sets = select_shard(data_model.entity_sets, self._shard)
+
+        prober = Prober(self._dispatcher, self._create_probe_cache(metadata), Config.dispatcher.probes_num)
+        prober.probe(entity_sets, self._first_touch)
+        if self._first_touch:
+            first_touch = FirstTouch(self._restrictions, prober)
+        else:
+            first_touch = NullFirstTouch(self._restrictions)
+
+        association_sets = index_association_sets(data_model.association_sets)
+        for entity_set in entity_sets:
+            principal_entities = get_principal_entities(association_sets.get(entity_set.name, []), entity_set)
+            restrictions = first_touch.analyze(entity_set)
 
-            query_group_data = QueryGroupData(entity_set, principal_entities, restrictions, self._dispatcher)
+            query_group_data = QueryGroupData(entity_set, principal_entities, restrictions, prober)
             self._append_queryable(query_group_data)
 
         return self._queryable
 
-    def _get_data_model(self):
-        metadata_response = self._get_metadata_from_service()
-        try:
-            service_model = Edmx.parse(metadata_response.content)
-        except (PyODataException, RuntimeError) as pyodata_ex:
-            raise BuilderError('An exception occurred while parsing metadata: {}'.format(pyodata_ex))
-        return service_model
+    def _get_metadata(self):
+        metadata_cache = self._create_metadata_cache()
+        metadata_response = self._get_metadata_from_service(metadata_cache.conditional_headers())
+        if metadata_response.status_code == requests.codes.not_modified:
+            metadata = metadata_cache.load()
+            if metadata is not None:
+                return metadata
+            metadata_response = self._get_metadata_from_service({})
+
+        metadata_cache.save(metadata_response.content, metadata_response.headers)
+        return metadata_response.content
 
-    def _get_metadata_from_service(self):
+    def _get_metadata_from_service(self, headers):
         metadata_request = '$metadata?' + 'sap-client=' + Config.fuzzer.sap_client
         try:
-            metadata_response = self._dispatcher.get(metadata_request, timeout=5)
+            metadata_response = self._dispatcher.get(metadata_request, timeout=5, headers=headers)
         except DispatcherError as disp_error:
             raise BuilderError('An exception occurred while retrieving metadata: {}'.format(disp_error))
-        if metadata_response.status_code != 200:
+        if metadata_response.status_code not in (requests.codes.ok, requests.codes.not_modified):
             raise BuilderError('Cannot retrieve metadata from {}. Status code is {}.'.format(
                 self._dispatcher.service, metadata_response.status_code))
         return metadata_response
 
+    def _create_metadata_cache(self):
+        if not Config.dispatcher.cache_dir:
+            return NullMetadataCache()
+        return MetadataCache(Config.dispatcher.cache_dir, self._get_cached_service())
+
+    def _create_probe_cache(self, metadata):
+        if not Config.dispatcher.cache_dir:
+            return NullProbeCache()
+        return ProbeCache(Config.dispatcher.cache_dir, self._get_cached_service(), metadata)
+
+    def _get_cached_service(self):
+        # responses of the service differ for each SAP client
+        return self._dispatcher.service + '?sap-client=' + Config.fuzzer.sap_client
+
     def _append_queryable(self, query_group_data):
-        self._append_corresponding_queryable(QueryGroupMultiple(query_group_data))
-        self._append_corresponding_queryable(QueryGroupSingle(query_group_data))
+        # query groups are built when they are selected for the first time
+        self._queryable.add(LazyQueryGroup(QueryGroupMultiple, query_group_data))
+        self._queryable.add(LazyQueryGroup(QueryGroupSingle, query_group_data))
 
         self._append_associated_queryables(query_group_data)
 
@@ -96,15 +139,11 @@ class DispatchedBuilder:
         if query_group_data.principal_entities:
             principal_entities = query_group_data.principal_entities.multiplicity_one_entities
             if principal_entities:
-                self._append_corresponding_queryable(QueryGroupAssociation(query_group_data, principal_entities))
+                self._queryable.add(LazyQueryGroup(QueryGroupAssociation, query_group_data, principal_entities))
 
             principal_entities = query_group_data.principal_entities.multiplicity_many_entities
             if principal_entities:
-                self._append_corresponding_queryable(QueryGroupAssociationSet(query_group_data, principal_entities))
-
-    def _append_corresponding_queryable(self, query_group):
-        if query_group.query_options():
-            self._queryable.add(query_group)
+                self._queryable.add(LazyQueryGroup(QueryGroupAssociationSet, query_group_data, principal_entities))
 
 
 class DirectBuilder:
@@ -120,27 +159,20 @@ class DirectBuilder:
 
     def build(self):
         # call just once on fuzzer process start
-        data_model = self._get_data_model()
+        data_model = get_data_model(self._metadata_string)
+        association_sets = index_association_sets(data_model.association_sets)
 
         for entity_set in data_model.entity_sets:
             patch_entity_set(entity_set, data_model.association_sets)
             patch_proprties(entity_set.name, entity_set.entity_type.proprties(), self._restrictions)
-            principal_entities = get_principal_entities(data_model, entity_set)
+            principal_entities = get_principal_entities(association_sets.get(entity_set.name, []), entity_set)
             query_group_data = QueryGroupData(entity_set, principal_entities, self._restrictions, None)
             self._append_queryable(query_group_data)
 
         return self._queryable
 
-    def _get_data_model(self):
-        try:
-            service_model = Edmx.parse(self._metadata_string)
-        except (PyODataException, RuntimeError) as pyodata_ex:
-            raise BuilderError('An exception occurred while parsing metadata: {}'.format(pyodata_ex))
-        return service_model
-
-
     def _append_queryable(self, query_group_data):
-        # TODO REFACTOR DRY this method is direct copypaste from DispatchedBuilder just to have a prototype for integration. Intentionally no abstract class at the moment.
+        # TODO REFACTOR DRY this method is an eager copy of DispatchedBuilder's one just to have a prototype for integration. Intentionally no abstract class at the moment.
         self._append_corresponding_queryable(QueryGroupMultiple(query_group_data))
         self._append_corresponding_queryable(QueryGroupSingle(query_group_data))
         self._append_associated_queryables(query_group_data)
@@ -162,15 +194,117 @@ class DirectBuilder:
             self._queryable.add(query_group)
 
 
+class Prober:
+    """Sends the build-time probing requests concurrently and keeps their results.
+
+    At most pool_size requests are in flight at once. Results found in the probe cache are not requested again
+    and the new lasting ones are written back to it, so restarts of the fuzzer against unchanged metadata send
+    no probes.
+    With the asyncio dispatcher, sockets are not patched by gevent, so the probes are sent from threads.
+    """
+
+    def __init__(self, dispatcher, cache, pool_size):
+        self._dispatcher = dispatcher
+        self._cache = cache
+        self._pool_size = pool_size
+        self._results = {}
+
+    def probe(self, entity_sets, first_touch):
+        if Config.dispatcher.dispatcher == 'asyncio':
+            pool = ThreadPool(self._pool_size)
+        else:
+            pool = Pool(self._pool_size)
+        for entity_set in entity_sets:
+            for probe, send_probe in self._get_probes(entity_set, first_touch):
+                if self._cache.contains(entity_set.name, probe):
+                    self._results[(entity_set.name, probe)] = self._cache.get(entity_set.name, probe)
+                else:
+                    pool.spawn(self._store_result, entity_set.name, probe, send_probe)
+        pool.join()
+        self._cache.save()
+
+    def status_code(self, entity_set_name, probe):
+        return self._results.get((entity_set_name, probe))
+
+    def total_entities(self, entity_set_name):
+        total_entities = self._results.get((entity_set_name, PROBE_COUNT))
+        return INT_MAX if total_entities is None else total_entities
+
+    def _get_probes(self, entity_set, first_touch):
+        if first_touch:
+            yield PROBE_ENTITY_SET, lambda: self._get_status_code(entity_set.name)
+            yield PROBE_ENTITY, lambda: self._get_status_code(
+                SingleEntity(entity_set).generate_accessible_entity().path)
+        if entity_set.topable or Config.fuzzer.ignore_restriction == 'True':
+            yield PROBE_COUNT, lambda: self._get_count(entity_set.name)
+
+    def _store_result(self, entity_set_name, probe, send_probe):
+        try:
+            result = send_probe()
+        except DispatcherError:
+            # the service was not reached, so there is nothing worth remembering for the next run
+            return
+        self._results[(entity_set_name, probe)] = result
+        if self._is_lasting(probe, result):
+            self._cache.set(entity_set_name, probe, result)
+
+    @staticmethod
+    def _is_lasting(probe, result):
+        # unknown counts, rejected credentials and server errors, except for not implemented methods, may be
+        # different by the next run, so they are probed again
+        if result is None:
+            return False
+        if probe == PROBE_COUNT:
+            return True
+        if result in (requests.codes.unauthorized, requests.codes.forbidden):
+            return False
+        return result < requests.codes.internal_server_error or result == requests.codes.not_implemented
+
+    def _get_status_code(self, path):
+        response = self._dispatcher.get(path + '?sap-client=' + Config.fuzzer.sap_client)
+        return response.status_code
+
+    def _get_count(self, entity_set_name):
+        url = entity_set_name + '/' + '$count?' + 'sap-client=' + Config.fuzzer.sap_client
+        response = self._dispatcher.get(url, timeout=5)
+        try:
+            return int(response.text)
+        except ValueError:
+            return None
+
+
+def select_shard(entity_sets, shard):
+    """Deal the entity sets to shards in the order of the metadata, so every process computes the same shards."""
+    return [entity_set for position, entity_set in enumerate(entity_sets) if position % shard.count == shard.index]
+
+
+def get_data_model(metadata):
+    """Parse the metadata, or load the data model parsed from the same metadata by one of the previous runs."""
+    if Config.dispatcher.cache_dir:
+        data_model_cache = DataModelCache(Config.dispatcher.cache_dir)
+    else:
+        data_model_cache = NullDataModelCache()
+
+    data_model = data_model_cache.load(metadata)
+    if data_model is None:
+        try:
+            data_model = Edmx.parse(metadata)
+        except (PyODataException, RuntimeError) as pyodata_ex:
+            raise BuilderError('An exception occurred while parsing metadata: {}'.format(pyodata_ex))
+        # the model is cached before the properties and entity sets are patched
+        data_model_cache.save(metadata, data_model)
+    return data_model
+
+
 class FirstTouch:
     """
     if --first-touch CLI flag; checks if methods for entitysets are even implemented,
     so it does not creates queries that will be ignored by user in output analysis.
     """
     #TODO potential refactor move, logically should be part of fuzzer.py module.
-    def __init__(self, restrictions, dispatcher):
+    def __init__(self, restrictions, prober):
         self._restrictions = restrictions
-        self._dispatcher = dispatcher
+        self._prober = prober
 
     def analyze(self, entity_set):
         self.check_empty_entity_set(entity_set)
@@ -178,16 +312,11 @@ class FirstTouch:
         return self._restrictions
 
     def check_empty_entity_set(self, entity_set):
-        response = self._dispatcher.get(entity_set.name + '?sap-client=' + Config.fuzzer.sap_client)
-        if response.status_code == requests.codes.not_implemented:
+        if self._prober.status_code(entity_set.name, PROBE_ENTITY_SET) == requests.codes.not_implemented:
             self._restrictions.add_exclude_restriction(entity_set.name, GLOBAL_ENTITY_SET)
 
     def check_empty_entity(self, entity_set):
-        non_addressable_entity = SingleEntity(entity_set)
-        queryable_entity = non_addressable_entity.generate_accessible_entity()
-
-        response = self._dispatcher.get(queryable_entity.path + '?sap-client=' + Config.fuzzer.sap_client)
-        if response.status_code == requests.codes.not_implemented:
+        if self._prober.status_code(entity_set.name, PROBE_ENTITY) == requests.codes.not_implemented:
             self._restrictions.add_exclude_restriction(entity_set.name, GLOBAL_ENTITY)
 
 
@@ -211,13 +340,80 @@ class QueryableEntities(object):
     def all(self):
         return self._entities
 
+    def random(self):
+        if not self._entities:
+            return None
+        return random.choice(self._entities)
+
+
+class LazyQueryableEntities:
+    """A wrapper of all queryable entities whose query groups are built on the first selection.
+
+    At most max_built query groups are kept built; the least recently selected one is evicted and built again
+    when it is selected next time. All built query groups are kept if max_built is 0.
+    """
+
+    def __init__(self, max_built):
+        self._entities = []
+        self._built = OrderedDict()
+        self._max_built = max_built
+
+    def add(self, lazy_query_group):
+        self._entities.append(lazy_query_group)
+
+    def all(self):
+        for lazy_query_group in list(self._entities):
+            query_group = self._get(lazy_query_group)
+            if query_group:
+                yield query_group
+
+    def random(self):
+        while self._entities:
+            query_group = self._get(random.choice(self._entities))
+            if query_group:
+                return query_group
+        return None
+
+    def _get(self, lazy_query_group):
+        query_group = self._built.get(lazy_query_group)
+        if query_group:
+            self._built.move_to_end(lazy_query_group)
+            return query_group
+
+        query_group = lazy_query_group.build()
+        if not query_group.query_options():
+            # groups without query options were never added by the eager builders either
+            self._entities.remove(lazy_query_group)
+            return None
+
+        self._built[lazy_query_group] = query_group
+        if self._max_built and len(self._built) > self._max_built:
+            self._built.popitem(last=False)
+        return query_group
+
+
+class LazyQueryGroup:
+    """A recipe for building a query group."""
+
+    def __init__(self, query_group_class, query_group_data, *args):
+        self._query_group_class = query_group_class
+        self._query_group_data = query_group_data
+        self._args = args
+
+    @property
+    def entity_set(self):
+        return self._query_group_data.entity_set
+
+    def build(self):
+        return self._query_group_class(self._query_group_data, *self._args)
+
 
 class QueryGroupData:
-    def __init__(self, entity_set, principal_entities, restrictions, dispatcher):
+    def __init__(self, entity_set, principal_entities, restrictions, prober):
         self._entity_set = entity_set
         self._principal_entities = principal_entities
         self._restrictions = restrictions
-        self._dispatcher = dispatcher
+        self._prober = prober
 
     @property
     def entity_set(self):
@@ -232,16 +428,61 @@ class QueryGroupData:
         return self._restrictions
 
     @property
-    def dispatcher(self):
-        return self._dispatcher
+    def prober(self):
+        return self._prober
+
+
+class EntitySetView:
+    """A view of an entity set whose entity type exposes a filtered set of properties.
+
+    Replaces deep copies of entity sets created by PyOData. All other attributes are read from the viewed entity set.
+    """
+
+    def __init__(self, entity_set, entity_type):
+        self._entity_set = entity_set
+        self._entity_type = entity_type
+
+    @property
+    def entity_type(self):
+        return self._entity_type
+
+    def __getattr__(self, name):
+        return getattr(self._entity_set, name)
+
+
+class EntityTypeView:
+    """A view of an entity type with its own dictionaries of properties and navigation properties.
+
+    The dictionaries may be altered without affecting the viewed entity type.
+    """
+
+    def __init__(self, entity_type, proprties, nav_proprties):
+        self._entity_type = entity_type
+        self._properties = OrderedDict((proprty.name, proprty) for proprty in proprties)
+        self._nav_properties = OrderedDict((proprty.name, proprty) for proprty in nav_proprties)
+
+    @property
+    def nav_proprties(self):
+        return list(self._nav_properties.values())
+
+    def nav_proprty(self, property_name):
+        return self._nav_properties[property_name]
+
+    def proprties(self):
+        return list(self._properties.values())
+
+    def proprty(self, property_name):
+        return self._properties[property_name]
+
+    def __getattr__(self, name):
+        return getattr(self._entity_type, name)
 
 
 class QueryGroup:
     def __init__(self, query_group_data):
         self._entity_set = query_group_data.entity_set
         self._restrictions = query_group_data.restrictions
-        self._dispatcher = query_group_data.dispatcher
-        # TODO REFACTOR this is not ideal structure.. if this module is  "wrapper classes for queryable entities" it should not contain essentially networking
+        self._prober = query_group_data.prober
 
         self._query_options = {}
         self._optional_query_options = []
@@ -360,7 +601,7 @@ class QueryGroup:
             self._query_options[ORDERBY] = OrderbyQuery(entity_set, option_restr.restr)
             self._optional_query_options.append(self._query_options[ORDERBY])
 
-    def _init_query_type(self, option_name, metadata_attr, query_object, dispatcher, restriction_type):
+    def _init_query_type(self, option_name, metadata_attr, query_object, prober, restriction_type):
         if option_name in self._restrictions.forbidden_options():
             return
 
@@ -371,7 +612,7 @@ class QueryGroup:
             is_queryable = getattr(self._entity_set, metadata_attr)
 
         if is_queryable and not option_restr.is_restricted:
-            self._query_options[option_name] = query_object(self._entity_set, option_restr.restr, dispatcher)
+            self._query_options[option_name] = query_object(self._entity_set, option_restr.restr, prober)
             include_restrictions = getattr(option_restr.restr, 'include', None)
             if include_restrictions and include_restrictions.get(self._entity_set.name):
                 self._required_query_options.append(self._query_options[option_name])
@@ -379,10 +620,13 @@ class QueryGroup:
                 self._optional_query_options.append(self._query_options[option_name])
 
     def _delete_restricted_proprties(self, exclude_restr, attribute, draft_proprties):
-        entity_set = copy.deepcopy(self._entity_set)
+        # query options set their own attributes to the properties, so each view gets shallow copies of them
+        entity_type = self._entity_set.entity_type
+        entity_set = EntitySetView(self._entity_set, EntityTypeView(
+            entity_type, [copy.copy(proprty) for proprty in entity_type.proprties()], entity_type.nav_proprties))
         if exclude_restr:
-            restr_proprty_list = exclude_restr.get(self._entity_set.name, [])
-            restr_proprty_list.extend(exclude_restr.get(GLOBAL_PROPRTY, []))
+            # the restrictions are shared by all query groups, which may be rebuilt, so they are not modified
+            restr_proprty_list = exclude_restr.get(self._entity_set.name, []) + exclude_restr.get(GLOBAL_PROPRTY, [])
         else:
             restr_proprty_list = []
 
@@ -407,6 +651,7 @@ class QueryGroup:
                 self._expand_complex_proprty(entity_set, complex_proprty, prefix + '/' + proprty.typ.name)
                 del entity_set.entity_type._properties[proprty.name]
             else:
+                proprty = copy.copy(proprty)
                 proprty._name = prefix + '/' + proprty.name
                 entity_set.entity_type._properties[proprty.name] = proprty
 
@@ -419,7 +664,9 @@ class QueryGroup:
     def _delete_restricted_nav_proprties(self, option_restrictions):
         entity_set = self._entity_set
         if option_restrictions.exclude:
-            entity_set = copy.deepcopy(self._entity_set)
+            entity_type = self._entity_set.entity_type
+            entity_set = EntitySetView(self._entity_set, EntityTypeView(
+                entity_type, entity_type.proprties(), entity_type.nav_proprties))
             restricted_proprties = set(option_restrictions.exclude.get(NAV_PROPRTY, []))
             restricted_proprties |= set(option_restrictions.exclude.get(self._entity_set.name, []))
             for navigation_proprty in self._entity_set.entity_type.nav_proprties:
@@ -454,10 +701,10 @@ class QueryGroupMultiple(QueryGroup):
         self._init_filter_option(GLOBAL_ENTITY_SET)
         self._init_expand_option(GLOBAL_ENTITY_SET)
         self._init_orderby_query(GLOBAL_ENTITY_SET)
-        self._init_query_type(TOP, 'topable', TopQuery, self._dispatcher, GLOBAL_ENTITY_SET)
-        self._init_query_type(SKIP, 'pageable', SkipQuery, self._dispatcher, GLOBAL_ENTITY_SET)
-        self._init_query_type(SEARCH, 'searchable', SearchQuery, self._dispatcher, GLOBAL_ENTITY_SET)
-        self._init_query_type(INLINECOUNT, 'countable', InlineCountQuery, self._dispatcher, GLOBAL_ENTITY_SET)
+        self._init_query_type(TOP, 'topable', TopQuery, self._prober, GLOBAL_ENTITY_SET)
+        self._init_query_type(SKIP, 'pageable', SkipQuery, self._prober, GLOBAL_ENTITY_SET)
+        self._init_query_type(SEARCH, 'searchable', SearchQuery, self._prober, GLOBAL_ENTITY_SET)
+        self._init_query_type(INLINECOUNT, 'countable', InlineCountQuery, self._prober, GLOBAL_ENTITY_SET)
 
     def _init_accessible_entity(self):
         self._accessible_entity = MultipleEntities(self._entity_set)
@@ -474,10 +721,10 @@ class QueryGroupAssociationSet(QueryGroup):
         self._init_filter_option(GLOBAL_ENTITY_ASSOC)
         self._init_expand_option(GLOBAL_ENTITY_ASSOC)
         self._init_orderby_query(GLOBAL_ENTITY_ASSOC)
-        self._init_query_type(TOP, 'topable', TopQuery, self._dispatcher, GLOBAL_ENTITY_ASSOC)
-        self._init_query_type(SKIP, 'pageable', SkipQuery, self._dispatcher, GLOBAL_ENTITY_ASSOC)
-        self._init_query_type(SEARCH, 'searchable', SearchQuery, self._dispatcher, GLOBAL_ENTITY_ASSOC)
-        self._init_query_type(INLINECOUNT, 'countable', InlineCountQuery, self._dispatcher, GLOBAL_ENTITY_SET)
+        self._init_query_type(TOP, 'topable', TopQuery, self._prober, GLOBAL_ENTITY_ASSOC)
+        self._init_query_type(SKIP, 'pageable', SkipQuery, self._prober, GLOBAL_ENTITY_ASSOC)
+        self._init_query_type(SEARCH, 'searchable', SearchQuery, self._prober, GLOBAL_ENTITY_ASSOC)
+        self._init_query_type(INLINECOUNT, 'countable', InlineCountQuery, self._prober, GLOBAL_ENTITY_SET)
 
     def _init_accessible_entity(self):
         self._accessible_entity = AssociatedEntities(self._entity_set, self._principal_entities)
@@ -540,7 +787,7 @@ class QueryOption(metaclass=ABCMeta):
 
 
 class InlineCountQuery(QueryOption): #TODO refactor rename InlineCOuntQueryOption (in all subclasses)
-    def __init__(self, entity, restrictions, dispatcher):
+    def __init__(self, entity, restrictions, prober):
         super(InlineCountQuery, self).__init__(entity, INLINECOUNT, '$', restrictions)
 
     def apply_restrictions(self):
@@ -559,7 +806,7 @@ class InlineCountQuery(QueryOption): #TODO refactor rename InlineCOuntQueryOptio
 
 
 class SearchQuery(QueryOption):
-    def __init__(self, entity, restrictions, dispatcher):
+    def __init__(self, entity, restrictions, prober):
         super(SearchQuery, self).__init__(entity, SEARCH, '', restrictions)
 
     def apply_restrictions(self):
@@ -665,9 +912,9 @@ class OrderbyQuery(QueryOption):
 class TopQuery(QueryOption):
     """The $top query option."""
 
-    def __init__(self, entity, restrictions, dispatcher):
+    def __init__(self, entity, restrictions, prober):
         super(TopQuery, self).__init__(entity, TOP, '$', restrictions)
-        self._dispatcher = dispatcher
+        self._prober = prober
         self._max_range_prob = {INT_MAX: 1.0}
         self._depending_data = 0
         self.apply_restrictions()
@@ -709,29 +956,18 @@ class TopQuery(QueryOption):
             self._max_range_prob[total_entities] = 0.999
 
     def _get_total_entities(self):
-        # TODO REFACTOR here entity (model of metada) collide/collide with Networking - see   QueryGroup - self._dispatcher = query_group_data.dispatcher
-        total_entities = INT_MAX  # default value, used for when called trough DirectBuilder
-        if (self._dispatcher):
-            try:
-                url = self._entity_set.name + '/' + '$count?' + 'sap-client=' + Config.fuzzer.sap_client
-                response = self._dispatcher.get(url, timeout=5)
-            except DispatcherError:
-                total_entities = INT_MAX
-            else:
-                try:
-                    total_entities = int(response.text)
-                except ValueError:
-                    total_entities = INT_MAX
-
-        return total_entities
+        # the $count of the entity set is probed by DispatchedBuilder before the query groups are built
+        if self._prober:
+            return self._prober.total_entities(self._entity_set.name)
+        return INT_MAX  # default value, used for when called trough DirectBuilder
 
 
 class SkipQuery(QueryOption):
     """The $skip query option."""
 
-    def __init__(self, entity, restrictions, dispatcher):
+    def __init__(self, entity, restrictions, prober):
         super(SkipQuery, self).__init__(entity, SKIP, '$', restrictions)
-        self._dispatcher = dispatcher
+        self._prober = prober
         self._max_range_prob = {INT_MAX: 1.0}
         self._depending_data = 0
         self.apply_restrictions()
@@ -1205,6 +1441,14 @@ class FilterOption(Option):
         self._groups = groups
         self._option_string = ''
 
+        # the lists are indexed by ids of their items, so the items can be looked up in a constant time
+        self._logicals_by_id = index_by_id(logicals)
+        self._parts_by_id = index_by_id(parts)
+        self._groups_by_id = index_by_id(groups)
+
+        # logicals, parts and groups share one sequence of ids, so the ids are unique within the filter
+        self._ids = itertools.count(next_filter_id(logicals, parts, groups))
+
     @property
     def logicals(self):
         return self._logicals
@@ -1236,41 +1480,42 @@ class FilterOption(Option):
 
     @last_part.setter
     def last_part(self, value):
+        del self._parts_by_id[self._parts[-1]['id']]
         self._parts[-1] = value
+        self._parts_by_id[value['id']] = value
 
     @last_logical.setter
     def last_logical(self, value):
+        del self._logicals_by_id[self._logicals[-1]['id']]
         self._logicals[-1] = value
+        self._logicals_by_id[value['id']] = value
 
     def add_logical(self):
-        logical_id = str(uuid.UUID(int=random.getrandbits(128), version=4))
-        self._logicals.append({'id': logical_id})
+        logical_id = next(self._ids)
+        logical = {'id': logical_id}
+        self._logicals.append(logical)
+        self._logicals_by_id[logical_id] = logical
 
     def add_part(self):
-        part_id = str(uuid.UUID(int=random.getrandbits(128), version=4))
-        self._parts.append({'id': part_id})
+        part_id = next(self._ids)
+        part = {'id': part_id}
+        self._parts.append(part)
+        self._parts_by_id[part_id] = part
 
     def add_group(self):
-        group_id = str(uuid.UUID(int=random.getrandbits(128), version=4))
-        self._groups.append({'id': group_id, 'logicals': []})
+        group_id = next(self._ids)
+        group = {'id': group_id, 'logicals': []}
+        self._groups.append(group)
+        self._groups_by_id[group_id] = group
 
     def logical_by_id(self, id_logical):
-        for logical in self._logicals:
-            if logical['id'] == id_logical:
-                return logical
-        return None
+        return self._logicals_by_id.get(id_logical)
 
     def part_by_id(self, id_part):
-        for part in self._parts:
-            if part['id'] == id_part:
-                return part
-        return None
+        return self._parts_by_id.get(id_part)
 
     def group_by_id(self, id_group):
-        for group in self._groups:
-            if group['id'] == id_group:
-                return group
-        return None
+        return self._groups_by_id.get(id_group)
 
     def reverse_logicals(self):
         self._logicals = list(reversed(self._logicals))
@@ -1284,6 +1529,7 @@ class FilterOption(Option):
                 filtered_groups.append(group)
             else:
                 redundant_groups_id.append(group['id'])
+                del self._groups_by_id[group['id']]
         self._groups[:] = filtered_groups
 
         for logical in self._logicals:
@@ -1343,7 +1589,7 @@ class FilterOptionBuilder(object):
     def __init__(self, option):
         self._option = option
         self._option_string = None
-        self._used_logicals = []
+        self._used_logicals = set()
 
     def build(self):
         if not self._option_string:
@@ -1358,7 +1604,7 @@ class FilterOptionBuilder(object):
         if 'group_id' in first_logical:
             self._build_first_group(first_logical['group_id'])
         else:
-            self._used_logicals.append(first_logical['id'])
+            self._used_logicals.add(first_logical['id'])
             self._option_string = self._build_left(first_logical) + ' ' + first_logical['name'] \
                                                                   + ' ' + self._build_right(first_logical)
         self._check_last_logical()
@@ -1395,19 +1641,19 @@ class FilterOptionBuilder(object):
     def _build_surroundings(self, skip_left, part, generated_string):
         if skip_left and 'left_id' in part:
             left_logical = self._option.logical_by_id(part['left_id'])
-            self._used_logicals.append(left_logical['id'])
+            self._used_logicals.add(left_logical['id'])
             generated_string = self._build_left(left_logical) + ' ' + left_logical['name']\
                                                               + ' ' + generated_string
         if not skip_left and 'right_id' in part:
             right_logical = self._option.logical_by_id(part['right_id'])
-            self._used_logicals.append(right_logical['id'])
+            self._used_logicals.add(right_logical['id'])
             generated_string += ' ' + right_logical['name'] + ' ' + self._build_right(right_logical)
         return generated_string
 
     def _build_group(self, group):
         first_logical_id = group['logicals'][0]
         logical = self._option.logical_by_id(first_logical_id)
-        self._used_logicals.append(logical['id'])
+        self._used_logicals.add(logical['id'])
         group_string = '(' + self._build_left(logical) + ' ' + logical['name']\
                            + ' ' + self._build_right(logical) + ')'
         return group_string
@@ -1423,11 +1669,17 @@ class FilterOptionDeleter(object):
     """A filter option remover that deletes a random part next to the selected logical operator.
 
     Used in mutation. Rationale for this method is trying to find possible shorter URL to the one that generated server error.
+
+    Parts, logicals and groups are looked up by their ids in maps which are built once per deletion;
+    the lists of the option value are updated when the deletion is finished.
     """
 
     def __init__(self, option_value, logical):
         self._option_value = option_value
         self._logical = logical
+        self._logicals = index_by_id(option_value['logicals'])
+        self._parts = index_by_id(option_value['parts'])
+        self._groups = index_by_id(option_value['groups'])
         self._selected_id = None
         self._remained_id = None
         self._deleting_part = None
@@ -1437,30 +1689,37 @@ class FilterOptionDeleter(object):
         self._remove_logical_in_group()
         self._init_selection(selected_id)
         if self._deleting_part:
-            self._option_value['parts'].remove(self._deleting_part)
+            del self._parts[self._deleting_part['id']]
             self._add_part_references()
         else:
-            self._deleting_part = dict_by_id(self._option_value['groups'],
-                                             self._logical[self._selected_id])
-            self._option_value['groups'].remove(self._deleting_part)
+            self._deleting_part = self._groups.pop(self._logical[self._selected_id], None)
             self._add_part_references()
             self._remove_all(self._deleting_part)
-        for group in self._option_value['groups'][:]:
+        for group_id, group in list(self._groups.items()):
             if not group['logicals']:
-                self._option_value['groups'].remove(group)
+                del self._groups[group_id]
+        self._update_option_value()
+
+    def _update_option_value(self):
+        for name, remaining in (('logicals', self._logicals), ('parts', self._parts), ('groups', self._groups)):
+            items = self._option_value[name]
+            if len(items) != len(remaining):
+                items[:] = [item for item in items if remaining.get(item['id']) is item]
 
     def _remove_logical_in_group(self):
         group_id = self._logical.get('group_id')
         if group_id:
-            remove_logical_from_group(self._option_value, group_id, self._logical['id'])
+            try:
+                self._groups[group_id]['logicals'].remove(self._logical['id'])
+            except ValueError:
+                pass
 
     def _init_selection(self, selected_id):
         self._selected_id = selected_id
         self._remained_id = 'left_id' if self._selected_id.startswith('right') else 'right_id'
-        self._deleting_part = dict_by_id(self._option_value['parts'],
-                                         self._logical[self._selected_id])
-        self._remaining_part = get_part_by_id(self._option_value, self._logical,
-                                              self._remained_id)
+        self._deleting_part = self._parts.get(self._logical[self._selected_id])
+        remained_id = self._logical[self._remained_id]
+        self._remaining_part = self._parts.get(remained_id) or self._groups.get(remained_id)
 
     def _add_part_references(self):
         if self._selected_id in self._deleting_part:
@@ -1472,46 +1731,44 @@ class FilterOptionDeleter(object):
 
     def _manage_part_references(self):
         self._remaining_part[self._selected_id] = self._deleting_part[self._selected_id]
-        if self._option_value['logicals']:
-            referencing_logical = dict_by_id(self._option_value['logicals'],
-                                             self._deleting_part[self._selected_id])
+        if self._logicals:
+            referencing_logical = self._logicals.get(self._deleting_part[self._selected_id])
             referencing_logical[self._remained_id] = self._remaining_part['id']
 
     def _manage_group_references(self):
-        group_border = dict_by_id(self._option_value['groups'], self._logical['group_id'])
+        group_border = self._groups.get(self._logical['group_id'])
         if not group_border['logicals']:
-            try:
-                self._option_value['groups'].remove(group_border)
-            except ValueError:
-                pass
-            else:
-                self._update_group_references(group_border, self._option_value['logicals'])
+            if self._groups.pop(group_border['id'], None) is not None:
+                self._update_group_references(group_border)
 
-    def _update_group_references(self, group_border, logicals):
+    def _update_group_references(self, group_border):
         if self._selected_id in group_border:
-            remaining_logical = dict_by_id(logicals, group_border[self._selected_id])
+            remaining_logical = self._logicals.get(group_border[self._selected_id])
             self._remaining_part[self._selected_id] = group_border[self._selected_id]
             remaining_logical[self._remained_id] = self._remaining_part['id']
         if self._remained_id in group_border:
-            remaining_logical = dict_by_id(logicals, group_border[self._remained_id])
+            remaining_logical = self._logicals.get(group_border[self._remained_id])
             self._remaining_part[self._remained_id] = group_border[self._remained_id]
             remaining_logical[self._selected_id] = self._remaining_part['id']
 
-    def _remove_all(self, part):
-        for logical in self._option_value['logicals'][:]:
+    def _remove_all(self, group):
+        logicals_in_groups = {}
+        for logical in self._logicals.values():
             if 'group_id' in logical:
-                if logical['group_id'] == part['id']:
-                    self._option_value['logicals'].remove(logical)
-                    remove_by_reference(self._option_value['parts'], logical['left_id'])
-                    remove_by_reference(self._option_value['parts'], logical['right_id'])
-                    part_del = dict_by_id(self._option_value['groups'], logical['left_id'])
-                    if part_del:
-                        self._option_value['groups'].remove(part_del)
-                        self._remove_all(part_del)
-                    part_del = dict_by_id(self._option_value['groups'], logical['right_id'])
-                    if part_del:
-                        self._option_value['groups'].remove(part_del)
-                        self._remove_all(part_del)
+                logicals_in_groups.setdefault(logical['group_id'], []).append(logical)
+        self._remove_group_content(group, logicals_in_groups)
+
+    def _remove_group_content(self, group, logicals_in_groups):
+        for logical in logicals_in_groups.get(group['id'], []):
+            del self._logicals[logical['id']]
+            self._parts.pop(logical['left_id'], None)
+            self._parts.pop(logical['right_id'], None)
+            nested_group = self._groups.pop(logical['left_id'], None)
+            if nested_group:
+                self._remove_group_content(nested_group, logicals_in_groups)
+            nested_group = self._groups.pop(logical['right_id'], None)
+            if nested_group:
+                self._remove_group_content(nested_group, logicals_in_groups)
 
 
 class FilterFunctionsGroup(object):
@@ -1975,38 +2232,29 @@ def build_filter_part(part):
     return string_part
 
 
-def dict_by_id(object_list, identifier):
-    for dictionary in object_list:
-        if dictionary['id'] == identifier:
-            return dictionary
-    return None
-
+def index_by_id(object_list):
+    return {dictionary['id']: dictionary for dictionary in object_list}
 
-def get_part_by_id(option_value, logical, selected_id):
-    part = dict_by_id(option_value['parts'], logical[selected_id])
-    if not part:
-        part = dict_by_id(option_value['groups'], logical[selected_id])
-    return part
 
+def next_filter_id(*object_lists):
+    """Return the first id not used in the filter. String ids (UUIDs) of queries saved by older versions are skipped."""
+    used_ids = [dictionary['id'] for object_list in object_lists for dictionary in object_list
+                if isinstance(dictionary['id'], int)]
+    return max(used_ids, default=0) + 1
 
-def remove_by_reference(corresponding_list, corresponding_id):
-    part_del = dict_by_id(corresponding_list, corresponding_id)
-    if part_del:
-        corresponding_list.remove(part_del)
-    return part_del
 
-
-def remove_logical_from_group(option_value, group_id, logical_id):
-    group = dict_by_id(option_value['groups'], group_id)
-    try:
-        group['logicals'].remove(logical_id)
-    except ValueError:
-        pass
+def index_association_sets(association_sets):
+    """Group association sets by names of entity sets at their ends, so each entity set checks only its own."""
+    association_sets_by_name = {}
+    for association_set in association_sets:
+        for end_entity_set_name in OrderedDict.fromkeys(end.entity_set.name for end in association_set.end_roles):
+            association_sets_by_name.setdefault(end_entity_set_name, []).append(association_set)
+    return association_sets_by_name
 
 
-def get_principal_entities(data_model, entity_set):
+def get_principal_entities(association_sets, entity_set):
     principal_entities = []
-    for association_set in data_model.association_sets:
+    for association_set in association_sets:
         ends_principal_getter = EndsPrincipal(association_set, entity_set)
         principal_data = ends_principal_getter.get()
         if principal_data.entity:
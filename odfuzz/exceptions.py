@@ -21,6 +21,11 @@ class DispatcherError(ODfuzzException):
     pass
 
 
+class DispatcherTransientError(DispatcherError):
+    """A transient error occurred while sending a request, the same request may succeed when it is sent again."""
+    pass
+
+
 class RestrictionsError(ODfuzzException):
     """An error occurred while initializing a restrictions object."""
     pass
@@ -1,35 +1,47 @@
 """This module contains core parts of the fuzzer and additional handler classes."""
 
+import re
+import time
 import random
 import io
 import sys
+import ssl
+import json
+import base64
+import asyncio
+import uuid
 import hashlib
 import logging
 import gevent
 import requests
 import requests.adapters
 
-from copy import deepcopy
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import namedtuple
 from abc import ABCMeta, abstractmethod
 from lxml import etree
-from gevent.pool import Pool
+from gevent.event import Event, AsyncResult
+from gevent.pool import Group
+from gevent.queue import JoinableQueue
 from bson.objectid import ObjectId
 from pymongo.errors import ServerSelectionTimeoutError  #TODO leaky abstraction, should be new exception class in database.py, untied to specific database usage.
 
 from odfuzz.entities import DispatchedBuilder, FilterOptionBuilder, FilterOptionDeleter, FilterOption, \
-    OrderbyOptionBuilder, OrderbyOption, KeyValuesBuilder
+    OrderbyOptionBuilder, OrderbyOption, KeyValuesBuilder, SINGLE_SHARD
 from odfuzz.restrictions import RestrictionsGroup
 from odfuzz.statistics import Stats #TODO this is the part where computation of runtime statistic is done via module import
-from odfuzz.databases import MongoDB, MongoDBHandler
-from odfuzz.mutators import NumberMutator, StringMutator
+from odfuzz.mutators import NumberMutator, StringMutator, mutation_scheduler, set_mutation_scheduler
 from odfuzz.output import StandardOutput, BindOutput
-from odfuzz.exceptions import DispatcherError
+from odfuzz.exceptions import DispatcherError, DispatcherTransientError
 from odfuzz.config import Config
 from odfuzz.utils import decode_string
 from odfuzz import __version__
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # pylint: disable=wildcard-import
 from odfuzz.constants import *  
 
@@ -37,14 +49,23 @@ from odfuzz.constants import *
 class Manager:
     """A class for managing the fuzzer runtime."""
 
-    def __init__(self, bind, arguments, collection_name):
+    def __init__(self, bind, arguments, database_handler, database_client, collection_name, shard=SINGLE_SHARD):
         Config.init()
 
-        self._dispatcher = Dispatcher(arguments)
+        # both dispatchers share the limiter, so the metadata and the probes are counted in the rate as well
+        rate_limiter = RateLimiter.from_arguments(arguments, shard.count)
+        # the metadata and the probes are always requested by the requests dispatcher
+        self._dispatcher = Dispatcher(arguments, rate_limiter)
+        self._fuzzing_dispatcher = self._create_fuzzing_dispatcher(arguments, rate_limiter)
         self._asynchronous = arguments.asynchronous
         self._first_touch = arguments.first_touch
         self._restrictions = RestrictionsGroup(arguments.restrictions)
+        self._database_handler = database_handler
+        self._database_client = database_client
         self._collection_name = collection_name
+        self._shard = shard
+        # the gevent dispatcher is interrupted by gevent.with_timeout, the asyncio pipeline watches the deadline itself
+        self._deadline = None if arguments.timeout == INFINITY_TIMEOUT else time.monotonic() + arguments.timeout
 
         self._using_encoder = Config.fuzzer.use_encoder
 
@@ -56,10 +77,10 @@ class Manager:
     def start(self):
         self._output_handler.print_status('odfuzz version: ' + __version__)
 
-        database = self.establish_database_connection(MongoDBHandler, MongoDB)
+        database = self.establish_database_connection(self._database_handler, self._database_client)
         entities = self.build_entities()
-        fuzzer = Fuzzer(self._dispatcher, entities, database, self._output_handler, self._asynchronous,
-                        self._using_encoder)
+        fuzzer = Fuzzer(self._fuzzing_dispatcher, entities, database, self._output_handler, self._asynchronous,
+                        self._using_encoder, shared_collection=self._shard.count > 1, deadline=self._deadline)
 
         self._output_handler.print_status('Fuzzing...')
         fuzzer.run()
@@ -78,15 +99,32 @@ class Manager:
         """
         self._output_handler.print_status('Collection: {}'.format(self._collection_name))
         self._output_handler.print_status('Initializing queryable entities...')
-        builder = DispatchedBuilder(self._dispatcher, self._restrictions, self._first_touch)
+        builder = DispatchedBuilder(self._dispatcher, self._restrictions, self._first_touch, self._shard)
         return builder.build()
         # TODO: possible feature/enhancement.. only generate metadata calls and save them or requests X URLS without evolution algorithm (REST service)
 
+    def _create_fuzzing_dispatcher(self, arguments, rate_limiter):
+        dispatcher = Config.dispatcher.dispatcher
+        if dispatcher not in DISPATCHERS:
+            raise DispatcherError('Unknown dispatcher {}, use one of: {}'.format(dispatcher, ', '.join(DISPATCHERS)))
+        batch_size = Config.dispatcher.batch_size
+        if dispatcher == 'asyncio':
+            if batch_size > 1:
+                raise DispatcherError('The asyncio dispatcher does not support $batch requests')
+            return AsyncDispatcher(arguments, rate_limiter)
+        # requests are packed only when several of them are sent at once, otherwise every batch would wait
+        # for the linger and then hold a single request
+        max_batch_size = min(batch_size, Config.dispatcher.max_async_requests_num) if arguments.asynchronous else 1
+        if max_batch_size > 1:
+            return BatchDispatcher(self._dispatcher, max_batch_size)
+        return self._dispatcher
+
 
 class Fuzzer:
     """A main class that is responsible for the fuzzing process."""
 
-    def __init__(self, dispatcher, entities, database, output_handler, asynchronous, using_encoder):
+    def __init__(self, dispatcher, entities, database, output_handler, asynchronous, using_encoder,
+                 shared_collection=False, deadline=None):
         self._logger = logging.getLogger(FUZZER_LOGGER)
         self._urls_logger = URLsLogger()
         self._stats_logger = StatsLogger()
@@ -95,6 +133,8 @@ class Fuzzer:
         self._entities = entities
         self._output_handler = output_handler
         self._database = database
+        # the collection shared by worker processes is not cleared by any of them
+        self._shared_collection = shared_collection
 
         self._analyzer = Analyzer(database)
         self._selector = Selector(database, entities)
@@ -102,10 +142,19 @@ class Fuzzer:
         self._asynchronous = asynchronous
         if asynchronous:
             self._queryable_factory = MultipleQueryable
-            self._dispatch = self._get_multiple_responses
+            self._limiter = ConcurrencyLimiter(Config.dispatcher.async_requests_num,
+                                               Config.dispatcher.min_async_requests_num,
+                                               Config.dispatcher.max_async_requests_num)
         else:
             self._queryable_factory = SingleQueryable
-            self._dispatch = self._get_single_response
+            self._limiter = ConcurrencyLimiter(1, 1, 1)
+        self._retry_policy = RetryPolicy(Config.dispatcher.retry_attempts, Config.dispatcher.retry_delay,
+                                         Config.dispatcher.retry_max_delay, Config.dispatcher.retry_budget)
+        if isinstance(dispatcher, AsyncDispatcher):
+            self._pipeline = AsyncPipeline(self._send_query_async, self._limiter.maximum, self._limiter, deadline)
+        else:
+            self._pipeline = Pipeline(self._send_query, self._limiter.maximum, self._limiter)
+        set_mutation_scheduler(Config.fuzzer.mutation_scheduler)
 
         if not using_encoder:
             self._decode_queries = lambda *args: None
@@ -113,6 +162,7 @@ class Fuzzer:
         Stats.tests_num = 0
         Stats.fails_num = 0
         Stats.exceptions_num = 0
+        Stats.rejected_duplicates = 0
 
         # This step is required to redirect printing of stack trace by greenlets. I haven't
         # found any other conventional way to suppress such a printing. In the past, it was
@@ -131,15 +181,22 @@ class Fuzzer:
         random.seed(time_seed, version=1)
         self._logger.info('Seed is set to \'{}\''.format(time_seed))
 
-        self._database.delete_collection()
-        self.seed_population()
-        if self._database.total_entries() == 0:
-            self._logger.info('There are no queries generated yet.')
-            sys.stdout.write('OData service does not contain any queryable entities. Exiting...\n')
-            sys.exit(0)
-
-        self._selector.score_average = self._database.total_score() / self._database.total_entries()
-        self.evolve_population()
+        if not self._shared_collection:
+            self._database.delete_collection()
+        self._pipeline.start()
+        try:
+            self.seed_population()
+            if self._database.total_entries() == 0 or self._entities.random() is None:
+                self._logger.info('There are no queries generated yet.')
+                sys.stdout.write('OData service does not contain any queryable entities. Exiting...\n')
+                sys.exit(0)
+
+            self._selector.score_average = self._database.population_score().average
+            self.evolve_population()
+        finally:
+            if isinstance(self._dispatcher, AsyncDispatcher):
+                self._pipeline.run(self._dispatcher.close())
+            self._pipeline.stop()
 
     def seed_population(self):
         """
@@ -164,34 +221,46 @@ class Fuzzer:
                               .format(queryable.entity_set.name, entityset_urls_count))
             for _ in range(entityset_urls_count):
                 q = self._queryable_factory(queryable, self._logger, Config.dispatcher.async_requests_num)
-                queries = q.generate()
-                self._send_queries(queries)
-                self._analyze_queries(queries)
-                self._save_queries(queries)
+                self._pipeline.put(q.generate(), self._settle_seeded_query)
+        self._pipeline.join()
 
     def evolve_population(self):
         """
+        Second half of the fuzzing process, the genetic loop.
+
+        New queries are generated, or crossed from the stored ones, while the queries of previous iterations
+        are still being dispatched and analyzed by the pipeline.
 
         :return:
         """
         self._logger.info('Evolving population of requests...')
         while True:
             selection = self._selector.select()
+            q = self._queryable_factory(selection.queryable, self._logger, Config.dispatcher.async_requests_num)
             if selection.crossable:
                 self._logger.info('Crossing parents...')
-                q = self._queryable_factory(selection.queryable, self._logger, Config.dispatcher.async_requests_num)
-                queries = q.crossover(selection.crossable)
-                self._send_queries(queries)
-                analyzed_queries = self._analyze_queries(queries)
-                self._remove_weak_queries(analyzed_queries, queries)
+                self._pipeline.put(q.crossover(selection.crossable), self._settle_crossed_query)
             else:
                 self._logger.info('Generating new queries...')
-                q = self._queryable_factory(selection.queryable, self._logger, Config.dispatcher.async_requests_num)
-                queries = q.generate()
-                self._send_queries(queries)
-                self._analyze_queries(queries)
-                self._slay_weakest_individuals(len(queries))
-            self._save_queries(queries)
+                self._pipeline.put(q.generate(), self._settle_generated_query)
+
+    def _settle_seeded_query(self, query):
+        self._analyzer.analyze(query)
+        self._save_queries([query])
+
+    def _settle_generated_query(self, query):
+        self._analyzer.analyze(query)
+        # a duplicate is rejected by the database, so it must not replace any individual of the population
+        if not self._database.is_duplicate(query.dictionary):
+            self._slay_weakest_individuals(1)
+        self._save_queries([query])
+
+    def _settle_crossed_query(self, query):
+        offspring = self._analyzer.analyze(query)
+        queries = [query]
+        if not self._database.is_duplicate(query.dictionary):
+            offspring.slay_weak_individual(queries)
+        self._save_queries(queries)
 
     def _save_queries(self, queries):
         self._decode_queries(queries)
@@ -210,18 +279,21 @@ class Fuzzer:
         self._decode_accessible_keys(query)
 
     def _decode_filter_option(self, query):
-        filter_option = query.dictionary.get('_$filter')
+        filter_option = query.options.get(FILTER)
         if filter_option:
+            decoded_parts = []
+            # parts may be shared with other queries, so the decoded values are stored to their copies
             for part in filter_option['parts']:
+                decoded_part = dict(part)
                 # decode all Edm types, even those which were not encoded
-                decoded_value = decode_string(part['operand'])
-                part['operand'] = decoded_value
+                decoded_part['operand'] = decode_string(part['operand'])
 
                 # decode functions' parameters
                 params = part.get('params', None)
                 if params:
-                    for i, param in enumerate(params):
-                        params[i] = decode_string(param)
+                    decoded_part['params'] = [decode_string(param) for param in params]
+                decoded_parts.append(decoded_part)
+            query.options[FILTER] = dict(filter_option, parts=decoded_parts)
 
     def _decode_search_option(self, query):
         search_option = query.dictionary.get('_search')
@@ -239,35 +311,64 @@ class Fuzzer:
             for key, value in accessible_keys.items():
                 accessible_keys[key] = decode_string(value)
 
-    def _send_queries(self, queries):
+    def _send_query(self, query):
+        attempt = 0
         while True:
-            success = self._dispatch(queries)
-            if success:
-                break
-
-    def _get_multiple_responses(self, queries):
-        pool = Pool(Config.dispatcher.async_requests_num)
-        for query in queries:
-            pool.spawn(self._get_response, query)
-        try:
-            pool.join(raise_error=True)
-        except DispatcherError:
-            pool.kill()
-            self._handle_dispatcher_exception()
-            return False
+            attempt += 1
+            try:
+                query.response = self._dispatcher.get(query.query_string, timeout=REQUEST_TIMEOUT)
+            except DispatcherError as dispatcher_ex:
+                self._limiter.record_exception(dispatcher_ex)
+                delay = self._retry_after_exception(query, attempt, dispatcher_ex)
+                if delay is None:
+                    return False
+            else:
+                self._limiter.record_response(query.response)
+                delay = self._retry_after_response(query, attempt)
+                if delay is None:
+                    break
+            gevent.sleep(delay)
+        self._check_response(query)
         return True
 
-    def _get_single_response(self, queries):
-        query = queries[0]
-        try:
-            self._get_response(query)
-        except DispatcherError:
-            self._handle_dispatcher_exception()
-            return False
+    async def _send_query_async(self, query):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                query.response = await self._dispatcher.get(query.query_string, timeout=REQUEST_TIMEOUT)
+            except DispatcherError as dispatcher_ex:
+                self._limiter.record_exception(dispatcher_ex)
+                delay = self._retry_after_exception(query, attempt, dispatcher_ex)
+                if delay is None:
+                    return False
+            else:
+                self._limiter.record_response(query.response)
+                delay = self._retry_after_response(query, attempt)
+                if delay is None:
+                    break
+            await asyncio.sleep(delay)
+        self._check_response(query)
         return True
 
-    def _get_response(self, query):
-        query.response = self._dispatcher.get(query.query_string, timeout=REQUEST_TIMEOUT)
+    def _retry_after_exception(self, query, attempt, dispatcher_ex):
+        Stats.exceptions_num += 1
+        self._output_handler.print_test_num()
+        delay = self._retry_policy.retry_delay(attempt, error=dispatcher_ex)
+        if delay is None:
+            self._logger.info('Giving up the query {} after {} attempts'.format(query.query_string, attempt))
+        else:
+            self._logger.info('Retrying in {:.2f} seconds...'.format(delay))
+        return delay
+
+    def _retry_after_response(self, query, attempt):
+        delay = self._retry_policy.retry_delay(attempt, response=query.response)
+        if delay is not None:
+            self._logger.info('Received HTTP {}, retrying in {:.2f} seconds...'
+                              .format(query.response.status_code, delay))
+        return delay
+
+    def _check_response(self, query):
         if query.response.status_code != 200:
             self._set_error_attributes(query)
             Stats.fails_num += 1
@@ -276,28 +377,13 @@ class Fuzzer:
             setattr(query.response, 'error_code', '')
             setattr(query.response, 'error_message', '')
 
-    def _handle_dispatcher_exception(self):
-        Stats.exceptions_num += 1
-        self._output_handler.print_test_num()
-        self._logger.info('Retrying in {} seconds...'.format(RETRY_TIMEOUT))
-        gevent.sleep(RETRY_TIMEOUT)
-
-    def _analyze_queries(self, queries):
-        analyzed_offsprings = []
-        for query in queries:
-            analyzed_offsprings.append(self._analyzer.analyze(query))
-        return analyzed_offsprings
-
-    def _remove_weak_queries(self, analyzed_offsprings, queries):
-        for offspring in analyzed_offsprings:
-            offspring.slay_weak_individual(queries)
-
     def _slay_weakest_individuals(self, number_of_individuals):
         self._database.delete_worst_entries(number_of_individuals)
 
     def _save_to_database(self, queries):
         for query in queries:
             self._database.save_entry(query.dictionary)
+        Stats.rejected_duplicates = self._database.rejected_duplicates
 
     def _set_error_attributes(self, query):
         self._set_attribute_value(query, 'error_code', 'error', 'code')
@@ -331,6 +417,304 @@ class Fuzzer:
         return value
 
 
+class RetryPolicy:
+    """A policy deciding whether a failed request is sent again and how long to wait before that.
+
+    Only transient errors of the dispatcher and responses of an overloaded service are retried. The delays grow
+    exponentially up to the maximum delay and are drawn with a full jitter, so requests failed at the same moment
+    are not sent again at the same moment. Every retry is paid from a budget which is refilled by a fraction
+    of each sent request; when the budget is spent, failed requests are given up instead of being retried.
+    """
+
+    def __init__(self, attempts, base_delay, max_delay, budget_ratio):
+        self._attempts = attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._budget_ratio = budget_ratio
+        self._budget = RETRY_BUDGET_RESERVE
+        # the jitter does not consume values of the seeded generator which generates the queries
+        self._random = random.Random()
+
+    def retry_delay(self, attempt, error=None, response=None):
+        """Return a delay in seconds before the next attempt to send a request, or None if it is not retried.
+
+        :param attempt: A number of attempts made so far, starting with 1
+        :param error: An exception raised by the dispatcher in the last attempt
+        :param response: A response received in the last attempt
+        """
+        self._budget = min(self._budget + self._budget_ratio, RETRY_BUDGET_CAPACITY)
+        if not self._is_retryable(error, response) or attempt >= self._attempts or self._budget < 1:
+            return None
+        self._budget -= 1
+        delay = self._random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+        if response is not None:
+            delay = max(delay, self._get_retry_after(response))
+        return min(delay, self._max_delay)
+
+    def _is_retryable(self, error, response):
+        if error is not None:
+            return isinstance(error, DispatcherTransientError)
+        return response.status_code in RETRYABLE_STATUS_CODES
+
+    def _get_retry_after(self, response):
+        retry_after = response.headers.get('Retry-After', '')
+        # the HTTP date format of the header is not used by the known services
+        return int(retry_after) if retry_after.isdigit() else 0
+
+
+class ConcurrencyLimiter:
+    """An AIMD limiter of the number of requests sent concurrently.
+
+    The limit grows by one after each limit of answered requests and it is multiplied by a factor lower than one
+    when the service looks overloaded, i.e. when a transient error is raised, when the service responds
+    by HTTP 429 or 503, or when the short-term average latency grows far above the long-term average latency.
+    Only latencies of successful responses are averaged, since the fuzzed queries rejected by the service are
+    answered much faster; batched responses are skipped, since they carry the time of the whole batch. The limit
+    is decreased at most once per limit of answered requests, so the requests sent before the decrease do not
+    decrease it again. Error responses caused by the fuzzed queries themselves do not change the limit.
+    """
+
+    def __init__(self, initial, minimum, maximum):
+        self._minimum = minimum
+        self._maximum = max(minimum, maximum)
+        self._limit = float(min(max(initial, self._minimum), self._maximum))
+        self._latency = None
+        self._baseline_latency = None
+        self._cooldown = 0
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    def record_response(self, response):
+        # the time of a batched response is the time of the whole batch
+        if response.status_code == 200 and not getattr(response, 'batched', False):
+            self._record_latency(response.elapsed.total_seconds())
+
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            self._decrease('HTTP {}'.format(response.status_code))
+        elif self._latency is not None and self._latency > LATENCY_TOLERANCE * self._baseline_latency:
+            self._decrease('latency {:.3f}s'.format(self._latency))
+        else:
+            self._increase()
+
+    def _record_latency(self, latency):
+        if self._latency is None:
+            self._latency = self._baseline_latency = latency
+            return
+        self._latency = LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self._latency
+        self._baseline_latency = BASELINE_LATENCY_SMOOTHING * latency \
+            + (1 - BASELINE_LATENCY_SMOOTHING) * self._baseline_latency
+
+    def record_exception(self, dispatcher_ex):
+        if isinstance(dispatcher_ex, DispatcherTransientError):
+            self._decrease('{}'.format(dispatcher_ex))
+
+    def _increase(self):
+        self._cooldown = max(self._cooldown - 1, 0)
+        limit = self.limit
+        self._limit = min(self._limit + 1 / self._limit, self._maximum)
+        if self.limit != limit:
+            self._logger.info('Concurrent requests increased to {}'.format(self.limit))
+
+    def _decrease(self, reason):
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return
+        limit = self.limit
+        self._limit = max(self._limit * CONCURRENCY_DECREASE_FACTOR, self._minimum)
+        self._cooldown = limit
+        if self.limit != limit:
+            self._logger.info('Concurrent requests decreased to {} due to {}'.format(self.limit, reason))
+
+
+class Pipeline:
+    """Generation, dispatching and analysis of queries joined by bounded queues.
+
+    Generated queries wait in a bounded queue which is consumed by a fixed number of dispatching greenlets,
+    so the same number of requests stays in flight while next queries are being generated. Answered queries
+    are passed to a single settling greenlet which analyzes and saves them one by one in the order of arrival.
+    Only queries for which the sending callable returns True are settled, the others were given up. If a limiter
+    is passed, the dispatching greenlets send at most its current limit of requests at once.
+    """
+
+    def __init__(self, send, requests_num, limiter=None):
+        self._send = send
+        self._requests_num = requests_num
+        self._limiter = limiter
+        self._in_flight = 0
+        self._slot_released = Event()
+        self._dispatch_queue = JoinableQueue(requests_num)
+        self._settle_queue = JoinableQueue(requests_num)
+        self._stages = Group()
+
+    def start(self):
+        caller = gevent.getcurrent()
+        for _ in range(self._requests_num):
+            self._spawn_stage(self._dispatch_queries, caller)
+        self._spawn_stage(self._settle_queries, caller)
+
+    def stop(self):
+        self._stages.kill()
+
+    def put(self, queries, settle):
+        """Enqueue queries for dispatching; blocks while the queue is full.
+
+        :param queries: A list of generated queries.
+        :param settle: A callable which is passed every query after its response was received.
+        """
+        for query in queries:
+            self._dispatch_queue.put((query, settle))
+
+    def join(self):
+        """Wait until all enqueued queries are dispatched and settled."""
+        self._dispatch_queue.join()
+        self._settle_queue.join()
+
+    def _spawn_stage(self, stage, caller):
+        greenlet = self._stages.spawn(stage)
+        # an unhandled exception in a stage is re-raised in the greenlet that feeds the pipeline; the failed
+        # query is never marked as done, so the feeding greenlet keeps waiting until the exception arrives
+        greenlet.link_exception(lambda failed: caller.throw(*failed.exc_info))
+
+    def _dispatch_queries(self):
+        while True:
+            query, settle = self._dispatch_queue.get()
+            self._acquire_slot()
+            try:
+                sent = self._send(query)
+            finally:
+                self._release_slot()
+            if sent:
+                self._settle_queue.put((query, settle))
+            self._dispatch_queue.task_done()
+
+    def _acquire_slot(self):
+        while self._limiter is not None and self._in_flight >= self._limiter.limit:
+            self._slot_released.clear()
+            self._slot_released.wait()
+        self._in_flight += 1
+
+    def _release_slot(self):
+        self._in_flight -= 1
+        self._slot_released.set()
+
+    def _settle_queries(self):
+        while True:
+            query, settle = self._settle_queue.get()
+            settle(query)
+            self._settle_queue.task_done()
+
+
+class AsyncPipeline:
+    """The Pipeline for AsyncDispatcher, run by an asyncio event loop instead of greenlets.
+
+    The stages are tasks of an event loop owned by the pipeline. The loop runs only while the generating code
+    waits in put or join, so the requests are in flight while the fuzzer blocks on the full queue. When
+    the deadline, in the time of time.monotonic, passes, put and join raise asyncio.TimeoutError.
+    """
+
+    def __init__(self, send, requests_num, limiter=None, deadline=None):
+        self._send = send
+        self._deadline = deadline
+        self._requests_num = requests_num
+        self._limiter = limiter
+        self._in_flight = 0
+        self._slot_released = None
+        self._loop = asyncio.new_event_loop()
+        self._dispatch_queue = None
+        self._settle_queue = None
+        self._stages = []
+
+    def start(self):
+        # queues of older Python versions are bound to the current event loop when they are created
+        asyncio.set_event_loop(self._loop)
+        self._dispatch_queue = asyncio.Queue(self._requests_num)
+        self._settle_queue = asyncio.Queue(self._requests_num)
+        self._slot_released = asyncio.Event()
+        for _ in range(self._requests_num):
+            self._stages.append(self._loop.create_task(self._dispatch_queries()))
+        self._stages.append(self._loop.create_task(self._settle_queries()))
+
+    def stop(self):
+        for stage in self._stages:
+            stage.cancel()
+        self._loop.run_until_complete(asyncio.gather(*self._stages, return_exceptions=True))
+        self._stages = []
+        self._loop.close()
+
+    def run(self, coroutine):
+        """Run the coroutine in the event loop of the pipeline, e.g. to close the dispatcher."""
+        return self._loop.run_until_complete(coroutine)
+
+    def put(self, queries, settle):
+        """Enqueue queries for dispatching; runs the event loop while the queue is full.
+
+        :param queries: A list of generated queries.
+        :param settle: A callable which is passed every query after its response was received.
+        """
+        for query in queries:
+            self._run_until(self._dispatch_queue.put((query, settle)))
+
+    def join(self):
+        """Wait until all enqueued queries are dispatched and settled."""
+        self._run_until(self._dispatch_queue.join())
+        self._run_until(self._settle_queue.join())
+
+    def _run_until(self, coroutine):
+        # an unhandled exception in a stage is re-raised here; the failed query is never marked as done,
+        # so the waiting task would never finish on its own
+        waiting = self._loop.create_task(coroutine)
+        timeout = None if self._deadline is None else max(self._deadline - self._loop.time(), 0)
+        self._loop.run_until_complete(asyncio.wait([waiting] + self._stages, timeout=timeout,
+                                                   return_when=asyncio.FIRST_COMPLETED))
+        for stage in self._stages:
+            if stage.done():
+                self._cancel(waiting)
+                stage.result()
+        if not waiting.done():
+            self._cancel(waiting)
+            raise asyncio.TimeoutError('The fuzzing timed out')
+        waiting.result()
+
+    def _cancel(self, task):
+        task.cancel()
+        self._loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+
+    async def _dispatch_queries(self):
+        while True:
+            query, settle = await self._dispatch_queue.get()
+            await self._acquire_slot()
+            try:
+                sent = await self._send(query)
+            finally:
+                self._release_slot()
+            if sent:
+                await self._settle_queue.put((query, settle))
+            self._dispatch_queue.task_done()
+
+    async def _acquire_slot(self):
+        while self._limiter is not None and self._in_flight >= self._limiter.limit:
+            self._slot_released.clear()
+            await self._slot_released.wait()
+        self._in_flight += 1
+
+    def _release_slot(self):
+        self._in_flight -= 1
+        self._slot_released.set()
+
+    async def _settle_queries(self):
+        while True:
+            query, settle = await self._settle_queue.get()
+            settle(query)
+            self._settle_queue.task_done()
+
+
 class Queryable:
     """ Assemble the final query by appending different entitity parts.
     """
@@ -361,17 +745,20 @@ class Queryable:
         self._logger.info('Generated query \'{}\''.format(query.query_string))
 
     def _crossover_queries(self, query1, query2):
+        # parents are never modified; the offspring shares all unchanged data with them
+        # and only containers along the changed path are copied (see copy-on-write helpers)
         if is_filter_crossable(query1, query2):
-            replaceable_parts = [part for part in query1['_$filter']['parts'] if part.get('replaceable', True)]
-            if replaceable_parts:
-                offspring = self._crossover_filter(replaceable_parts, query1, query2)
+            replaceable_indexes = [index for index, part in enumerate(query1['_$filter']['parts'])
+                                   if part.get('replaceable', True)]
+            if replaceable_indexes:
+                offspring = self._crossover_filter(replaceable_indexes, query1, query2)
             else:
                 offspring = self._crossover_options(query1, query2)
         else:
             offspring = self._crossover_options(query1, query2)
         Stats.created_by_crossover += 1
 
-        query = self.build_offspring(deepcopy(offspring))
+        query = self.build_offspring(offspring)
         self._mutate_query(query)
         query.add_predecessor(query1['_id'])
         query.add_predecessor(query2['_id'])
@@ -380,11 +767,12 @@ class Queryable:
         Stats.tests_num += 1
         return query
 
-    def _crossover_filter(self, replaceable_parts, query1, query2):
+    def _crossover_filter(self, replaceable_indexes, query1, query2):
         filter_option2 = query2['_$filter']
 
         # properties that are not required for draft entities are replaceable by default
-        part_to_replace = random.choice(replaceable_parts)
+        part_index = random.choice(replaceable_indexes)
+        part_to_replace = dict(query1['_$filter']['parts'][part_index])
         replacing_part = random.choice(filter_option2['parts'])
 
         if 'func' in replacing_part:
@@ -403,11 +791,17 @@ class Queryable:
         part_to_replace['operator'] = replacing_part['operator']
         part_to_replace['operand'] = replacing_part['operand']
 
-        return query1
+        offspring = dict(query1)
+        offspring['_$filter'] = replace_filter_part(query1['_$filter'], part_index, part_to_replace)
+        return offspring
 
     def build_offspring(self, offspring):
+        accessible_keys = offspring['accessible_keys']
+        if accessible_keys:
+            # keys are decoded in place before the offspring is saved
+            accessible_keys = dict(accessible_keys)
         accessible_entity = self._queryable.get_existing_accessible_entity(
-            offspring['accessible_keys'], offspring['accessible_set'])
+            accessible_keys, offspring['accessible_set'])
         query = Query(accessible_entity)
         for option in offspring['order']:
             query.add_option(option[1:], offspring[option])
@@ -417,22 +811,28 @@ class Queryable:
         filled_options = [option_name for option_name, value in query2.items()
                           if value is not None and option_name.startswith('_$')]
         selected_option = random.choice(filled_options)
+        offspring = dict(query1)
         if selected_option not in query1['order']:
-            query1['order'].append(selected_option)
-        query1[selected_option] = query2[selected_option]
-        return query1
+            offspring['order'] = query1['order'] + [selected_option]
+        offspring[selected_option] = query2[selected_option]
+        return offspring
 
     def _mutate_query(self, query):
         option_name, option_value = random.choice(list(query.options.items()))
         if query.is_option_deletable(option_name) and len(query.order) > 1 and random.random() < OPTION_DEL_PROB:
             query.delete_option(option_name)
         else:
-            self._mutate_option(query, option_name, option_value)
+            with mutation_scheduler().recording() as mutation_operators:
+                self._mutate_option(query, option_name, option_value)
+            query.mutation_operators = tuple(mutation_operators)
         Stats.created_by_mutation += 1
 
     def build_mutated_accessible_keys(self, accessible_keys, data_to_be_mutated):
-        self._mutate_accessible_keys(accessible_keys, data_to_be_mutated)
-        query = self.build_offspring(data_to_be_mutated)
+        accessible_keys = dict(accessible_keys)
+        with mutation_scheduler().recording() as mutation_operators:
+            self._mutate_accessible_keys(accessible_keys, data_to_be_mutated)
+        query = self.build_offspring(dict(data_to_be_mutated, accessible_keys=accessible_keys))
+        query.mutation_operators = tuple(mutation_operators)
         query.add_predecessor(data_to_be_mutated['_id'])
         query.build_string()
         return query
@@ -452,9 +852,9 @@ class Queryable:
 
     def _mutate_option(self, query, option_name, option_value):
         if option_name == FILTER:
-            self._mutate_filter(option_value)
+            query.options[option_name] = self._mutate_filter(option_value)
         elif option_name == ORDERBY:
-            self._mutate_orderby_part(option_value)
+            query.options[option_name] = self._mutate_orderby_part(option_value)
         elif option_name == EXPAND:
             # TODO: implement mutator for expand method
             pass
@@ -467,16 +867,17 @@ class Queryable:
             query.options[option_name] = self._mutate_value(NumberMutator, option_value)
 
     def _mutate_filter(self, option_value):
+        """Return a mutated copy of the filter option; the original option value is left untouched."""
         if option_value['logicals'] and random.random() < FILTER_DEL_PROB:
             logical_index = round(random.random() * (len(option_value['logicals']) - 1))
             parts = self._get_removable_parts(option_value, logical_index)
             if parts:
                 random_part = random.choice(parts)
+                # the deleter rewires references all over the filter, so all its nodes have to be copied
+                option_value = copy_filter(option_value)
                 self._remove_logical_part(option_value, logical_index, random_part)
-            else:
-                self._mutate_filter_part(option_value)
-        else:
-            self._mutate_filter_part(option_value)
+                return option_value
+        return self._mutate_filter_part(option_value)
 
     def _get_removable_parts(self, option_value, logical_index):
         logical = option_value['logicals'][logical_index]
@@ -492,7 +893,8 @@ class Queryable:
         FilterOptionDeleter(option_value, logical).remove_adjacent(adjacent_id)
 
     def _mutate_filter_part(self, option_value):
-        part = random.choice(option_value['parts'])
+        part_index = random.randrange(len(option_value['parts']))
+        part = dict(option_value['parts'][part_index])
         entity_type = self._queryable.query_option(FILTER).entity_set.entity_type
         if 'func' in part:
             self._mutate_filter_function(part, entity_type)
@@ -500,12 +902,13 @@ class Queryable:
             proprty = entity_type.proprty(part['name'])
             if getattr(proprty, 'mutate', None):
                 part['operand'] = proprty.mutate(part['operand'])
+        return replace_filter_part(option_value, part_index, part)
 
     def _mutate_filter_function(self, part, entity_type):
         if part['params'] and random.random() < 0.5:
             # TODO: mutate more than one parameter
             proprty = entity_type.proprty(part['proprties'][0])
-            part['params'][0] = proprty.mutate(part['params'][0])
+            part['params'] = [proprty.mutate(part['params'][0])] + part['params'][1:]
         else:
             if part['return_type'] == 'Edm.Boolean':
                 part['operand'] = 'true' if part['operand'] == 'false' else 'false'
@@ -517,33 +920,27 @@ class Queryable:
                 part['operand'] = self._mutate_value(NumberMutator, part['operand'])
 
     def _mutate_orderby_part(self, option_value):
+        option_value = list(option_value)
         proprties_num = len(option_value) - 1
         if proprties_num > 1 and random.random() < ORDERBY_DEL_PROB:
             remove_index = round(random.random() * proprties_num)
             del option_value[remove_index]
 
         self._mutate_proprty_order(option_value)
+        return option_value
 
     def _mutate_proprty_order(self, option_value):
-        random_proprty = random.choice(option_value)
-        current_order = random_proprty[1]
-        possible_orders = {'asc', 'desc', ''}
+        proprty_index = random.randrange(len(option_value))
+        proprty_name, current_order = option_value[proprty_index]
+        possible_orders = ['asc', 'desc', '']
         possible_orders.remove(current_order)
-        random_proprty[1] = random.choice(list(possible_orders))
+        option_value[proprty_index] = [proprty_name, random.choice(possible_orders)]
 
     def _mutate_value(self, mutator_class, value, self_mock=None):
-        mutators = self._get_mutators(mutator_class)
-        mutator = random.choice(mutators)
-        mutated_value = getattr(mutator_class, mutator)(self_mock, value)
+        mutator = mutator_class.select_operator()
+        mutated_value = mutator(self_mock, value)
         return mutated_value
 
-    def _get_mutators(self, mutators_class):
-        mutators = []
-        for func_name in mutators_class.__dict__.keys():
-            if not func_name.startswith('_'):
-                mutators.append(func_name)
-        return mutators
-
 
 class MultipleQueryable(Queryable):
     """ Used when fuzzer triggered with async option, generates URL for requests in async batches
@@ -810,7 +1207,7 @@ class Selector:
 
     def select(self):
         if self._is_score_stagnating():
-            selection = Selection(None, random.choice(list(self._entities.all())))
+            selection = Selection(None, self._entities.random())
         else:
             selection = self._crossable_selection()
         self._passed_iterations += 1
@@ -818,7 +1215,7 @@ class Selector:
         return selection
 
     def _crossable_selection(self):
-        queryable = random.choice(list(self._entities.all()))
+        queryable = self._entities.random()
         crossable = self._get_crossable(queryable)
         selection = Selection(crossable, queryable)
         return selection
@@ -826,7 +1223,7 @@ class Selector:
     def _is_score_stagnating(self):
         if self._passed_iterations > ITERATIONS_THRESHOLD:
             self._passed_iterations = 0
-            current_average = self._database.total_score() / self._database.total_entries()
+            current_average = self._database.population_score().average
             old_average = self._score_average
             self._score_average = current_average
             if (current_average - old_average) < SCORE_EPS:
@@ -868,31 +1265,27 @@ class Analyzer:
 
     def __init__(self, database):
         self._database = database
-        self._population_score = 0
 
     def analyze(self, query):
         new_score = FitnessEvaluator.evaluate(query)
         query.score = new_score
-        self._update_population_score(new_score)
         predecessors_ids = query.dictionary['predecessors']
         if predecessors_ids:
             offspring = self._build_offspring_by_score(predecessors_ids, query, new_score)
         else:
             offspring = EmptyOffspring(self._database)
+        if query.mutation_operators:
+            mutation_scheduler().credit(query.mutation_operators, new_score, isinstance(offspring, BetterOffspring))
         return offspring
 
     def _build_offspring_by_score(self, predecessors_id, query, new_score):
         for predecessor_id in predecessors_id:
-            if self._database.find_entry(predecessor_id)['score'] < new_score:
+            # the predecessor may have been already slayed by its sibling which was settled earlier
+            predecessor_score = self._database.find_score(predecessor_id)
+            if predecessor_score is not None and predecessor_score < new_score:
                 return BetterOffspring(self._database, predecessor_id)
         return WorseOffspring(query)
 
-    def _update_population_score(self, query_score):
-        if self._population_score == 0:
-            self._population_score = self._database.total_score()
-        else:
-            self._population_score += query_score
-
 
 class Offspring(metaclass=ABCMeta):
     """
@@ -976,7 +1369,8 @@ class FitnessEvaluator:
 
     @staticmethod
     def eval_http_response_time(response):
-        if not response.headers.get('content-length'):
+        # the time of a batched response is the time of the whole batch
+        if getattr(response, 'batched', False) or not response.headers.get('content-length'):
             return 0
         if int(response.headers['content-length']) > CONTENT_LEN_SIZE:
             return -10
@@ -1032,6 +1426,7 @@ class Query:
         self._options_strings = {'$orderby': '', '$filter': '', '$skip': '', '$top': '', '$expand': '',
                                  'search': '', '$inlinecount': ''}
         self._url_hash = ''
+        self._mutation_operators = ()
 
     @property
     def entity_name(self):
@@ -1082,6 +1477,10 @@ class Query:
     def url_hash(self):
         return self._url_hash
 
+    @property
+    def mutation_operators(self):
+        return self._mutation_operators
+
     @query_string.setter
     def query_string(self, value):
         self._query_string = value
@@ -1098,6 +1497,10 @@ class Query:
     def accessible_entity(self, value):
         self._accessible_entity = value
 
+    @mutation_operators.setter
+    def mutation_operators(self, value):
+        self._mutation_operators = value
+
     def is_option_deletable(self, name):
         return not (name == FILTER and self._accessible_entity.entity_set.requires_filter)
 
@@ -1117,8 +1520,7 @@ class Query:
         self._query_string = self._accessible_entity.path + '?'
         for option_name in self._order:
             if option_name.endswith('filter'):
-                filter_data = deepcopy(self._options[option_name[1:]])
-                option_string = build_filter_string(filter_data)
+                option_string = build_filter_string(self._options[option_name[1:]])
             elif option_name.endswith('orderby'):
                 orderby_data = self._options[option_name[1:]]
                 orderby_option = OrderbyOption(orderby_data)
@@ -1150,7 +1552,9 @@ class Query:
             'accessible_keys': self._accessible_entity.key_pairs,
             'predecessors': self._predecessors,
             'string': self._query_string,
+            'hash': self._url_hash,
             'score': self._score,
+            'filter_parts_count': len(self._options[FILTER]['parts']) if self._options.get(FILTER) else 0,
             'order': self._order,
             '_$orderby': self._options.get(ORDERBY),
             '_$top': self._options.get(TOP),
@@ -1174,18 +1578,70 @@ class HashGenerator:
         return hashlib.md5(string.encode('utf-8')).hexdigest()
 
 
+class TokenBucket:
+    """A bucket of tokens refilled at the given rate up to the capacity of the burst.
+
+    A token is taken from the bucket by every request, even if the bucket is empty; the debt is then paid by waiting,
+    so the requests are sent in the order of their reservations.
+    """
+
+    def __init__(self, rate, burst):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def reserve(self, now):
+        """Take a token and return the number of seconds to wait until the token is available."""
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        self._tokens -= 1
+        return max(-self._tokens / self._rate, 0)
+
+
+class RateLimiter:
+    """A limiter of the rate of requests sent to the service and to its particular entity sets."""
+
+    def __init__(self, rate, burst, entity_set_rates):
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._entity_set_buckets = {entity_set: TokenBucket(entity_set_rate, burst)
+                                    for entity_set, entity_set_rate in entity_set_rates.items()}
+
+    @classmethod
+    def from_arguments(cls, arguments, workers_num):
+        """Return a limiter of the rates passed by command line arguments, or None if no rate is limited.
+
+        The global rate is split among the worker processes. Entity sets are fuzzed by one worker only,
+        so their rates are not split.
+        """
+        if arguments.rate is None and not arguments.entity_set_rates:
+            return None
+        rate = arguments.rate / workers_num if arguments.rate else None
+        return cls(rate, arguments.burst, arguments.entity_set_rates)
+
+    def reserve(self, query):
+        """Reserve sending of the query and return the number of seconds to wait before sending it."""
+        now = time.monotonic()
+        delay = self._bucket.reserve(now) if self._bucket else 0
+        entity_set_bucket = self._entity_set_buckets.get(re.match(r'[^/?(]*', query).group())
+        if entity_set_bucket:
+            delay = max(delay, entity_set_bucket.reserve(now))
+        return delay
+
+
 class Dispatcher:
     """A dispatcher for sending HTTP requests to the particular OData service."""
 
-    def __init__(self, arguments):
+    def __init__(self, arguments, rate_limiter=None):
         self._config = Config.dispatcher
+        self._rate_limiter = rate_limiter
 
         self._logger = logging.getLogger(FUZZER_LOGGER)
         self._service = arguments.service.rstrip('/') + '/'
 
         self._session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(pool_connections=self._config.async_requests_num,
-                                                pool_maxsize=self._config.async_requests_num)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self._config.max_async_requests_num,
+                                                pool_maxsize=self._config.max_async_requests_num)
         self._session.mount(ACCESS_PROTOCOL, adapter)
         self._session.verify = self._get_sap_certificate()
         self._session.headers.update({'user-agent': 'odfuzz/1.0'})
@@ -1196,10 +1652,22 @@ class Dispatcher:
     def service(self):
         return self._service
 
-    def send(self, method, query, **kwargs):
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    def send(self, method, query, rate_limited=True, **kwargs):
+        """Send the request; unless rate_limited is False, e.g. when the caller waited for the limiter itself."""
         url = self._service + query
+        if self._rate_limiter and rate_limited:
+            gevent.sleep(self._rate_limiter.reserve(query))
         try:
             response = self._session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as requests_ex:
+            self._logger.error('An exception {} was raised'.format(requests_ex))
+            raise DispatcherTransientError('A transient exception was raised while sending HTTP {}: {}'
+                                           .format(method, requests_ex))
         except requests.exceptions.RequestException as requests_ex:
             self._logger.error('An exception {} was raised'.format(requests_ex))
             raise DispatcherError('An exception was raised while sending HTTP {}: {}'
@@ -1233,6 +1701,289 @@ class Dispatcher:
             self._session.auth = (os.getenv(ENV_USERNAME), os.getenv(ENV_PASSWORD))
 
 
+class AsyncDispatcher:
+    """A dispatcher with the contract of Dispatcher whose methods are coroutines sending requests by aiohttp.
+
+    The connection pool is limited to the maximum number of asynchronous requests. The session is created by the first
+    request, so it belongs to the event loop which runs the requests.
+    """
+
+    def __init__(self, arguments, rate_limiter=None):
+        if aiohttp is None:
+            raise DispatcherError('The asyncio dispatcher requires aiohttp, install odfuzz[asyncio]')
+        self._config = Config.dispatcher
+        self._rate_limiter = rate_limiter
+
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+        self._service = arguments.service.rstrip('/') + '/'
+        self._session = None
+        self._headers = {'user-agent': 'odfuzz/1.0'}
+
+        self._init_auth_credentials(arguments.credentials)
+
+    @property
+    def service(self):
+        return self._service
+
+    async def send(self, method, query, **kwargs):
+        url = self._service + query
+        timeout = kwargs.pop('timeout', None)
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        if self._rate_limiter:
+            await asyncio.sleep(self._rate_limiter.reserve(query))
+        session = self._get_session()
+        try:
+            started = asyncio.get_event_loop().time()
+            async with session.request(method, url, **kwargs) as client_response:
+                elapsed = timedelta(seconds=asyncio.get_event_loop().time() - started)
+                content = await client_response.read()
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as client_ex:
+            self._logger.error('An exception {!r} was raised'.format(client_ex))
+            raise DispatcherTransientError('A transient exception was raised while sending HTTP {}: {!r}'
+                                           .format(method, client_ex))
+        except aiohttp.ClientError as client_ex:
+            self._logger.error('An exception {!r} was raised'.format(client_ex))
+            raise DispatcherError('An exception was raised while sending HTTP {}: {!r}'
+                                  .format(method, client_ex))
+        response = DispatchedResponse(client_response.status, client_response.headers, content,
+                                      client_response.charset, elapsed, str(client_response.url))
+        self._logger.info('Received HTTP {} from {}'.format(response.status_code, url))
+        return response
+
+    async def get(self, query, **kwargs):
+        return await self.send('GET', query, **kwargs)
+
+    async def post(self, query, **kwargs):
+        return await self.send('POST', query, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._config.max_async_requests_num, ssl=self._get_ssl_context())
+            self._session = aiohttp.ClientSession(connector=connector, headers=self._headers)
+        return self._session
+
+    def _get_ssl_context(self):
+        if self._config.has_certificate and os.path.isfile(self._config.cert_file_path):
+            return ssl.create_default_context(cafile=self._config.cert_file_path)
+        return None
+
+    def _init_auth_credentials(self, credentials):
+        if credentials:
+            try:
+                username, password = credentials.split(':')
+            except ValueError:
+                raise DispatcherError('Entered credentials {} are not valid'.format(credentials))
+        else:
+            username, password = os.getenv(ENV_USERNAME), os.getenv(ENV_PASSWORD)
+        if username is not None:
+            # the header is encoded here as the authentication helpers of aiohttp differ between its versions
+            basic_credentials = '{}:{}'.format(username, password or '').encode('latin1')
+            self._headers['authorization'] = 'Basic ' + base64.b64encode(basic_credentials).decode('ascii')
+
+
+class BatchDispatcher:
+    """A dispatcher packing GET requests of concurrent greenlets into OData $batch requests.
+
+    Requests are collected until the batch is full, or until a short time passes since the first of them, and they
+    are sent by the wrapped dispatcher in one multipart POST. Every caller then receives its own response unpacked
+    from the multipart response. The elapsed time of the unpacked responses is the time of the whole batch, so they
+    are marked as batched. Every packed request takes its own token of the rate limiter. When the service rejects
+    the $batch request, all further requests are sent separately.
+    """
+
+    def __init__(self, dispatcher, batch_size):
+        self._dispatcher = dispatcher
+        self._batch_size = batch_size
+        self._batching = True
+        self._pending = []
+        self._flusher = None
+        self._csrf_token = None
+        self._logger = logging.getLogger(FUZZER_LOGGER)
+
+        self._batch_query = '$batch'
+        if Config.fuzzer.sap_client:
+            self._batch_query += '?sap-client=' + Config.fuzzer.sap_client
+
+    @property
+    def service(self):
+        return self._dispatcher.service
+
+    def send(self, method, query, **kwargs):
+        if method != 'GET' or not self._batching:
+            return self._dispatcher.send(method, query, **kwargs)
+        if self._dispatcher.rate_limiter:
+            gevent.sleep(self._dispatcher.rate_limiter.reserve(query))
+        result = AsyncResult()
+        self._pending.append((query, result))
+        if len(self._pending) >= self._batch_size:
+            self._flush(kwargs)
+        elif self._flusher is None:
+            self._flusher = gevent.spawn_later(BATCH_LINGER, self._flush, kwargs)
+        return result.get()
+
+    def get(self, query, **kwargs):
+        return self.send('GET', query, **kwargs)
+
+    def post(self, query, **kwargs):
+        return self.send('POST', query, **kwargs)
+
+    def _flush(self, kwargs):
+        batch, self._pending = self._pending, []
+        if self._flusher is not None and self._flusher is not gevent.getcurrent():
+            self._flusher.kill(block=False)
+        self._flusher = None
+        gevent.spawn(self._send_batch, batch, kwargs)
+
+    def _send_batch(self, batch, kwargs):
+        try:
+            responses = self._post_batch([query for query, _ in batch], kwargs)
+        except DispatcherError as dispatcher_ex:
+            # the exception is raised in every waiting greenlet, so every request may be retried separately
+            self._fail(batch, dispatcher_ex)
+            return
+        except Exception as ex:
+            # a programming error is raised in the waiting greenlets as well, so they do not wait forever
+            self._fail(batch, ex)
+            raise
+
+        if responses is None:
+            for query, result in batch:
+                gevent.spawn(self._send_single, query, result, kwargs)
+        else:
+            for (_, result), response in zip(batch, responses):
+                result.set(response)
+
+    def _send_single(self, query, result, kwargs):
+        try:
+            # the token of the rate limiter was taken when the request was packed
+            result.set(self._dispatcher.get(query, rate_limited=False, **kwargs))
+        except DispatcherError as dispatcher_ex:
+            result.set_exception(dispatcher_ex)
+        except Exception as ex:
+            self._fail([(query, result)], ex)
+            raise
+
+    def _fail(self, batch, ex):
+        for _, result in batch:
+            result.set_exception(ex)
+
+    def _post_batch(self, queries, kwargs):
+        boundary = 'batch_' + uuid.uuid4().hex
+        body = self._build_batch_body(queries, boundary)
+        response = self._post(body, boundary, kwargs)
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise DispatcherTransientError('The $batch request was answered by HTTP {}'.format(response.status_code))
+        if response.status_code not in (200, 202):
+            self._logger.warning('The $batch request was rejected by HTTP {}, sending single requests from now on'
+                                 .format(response.status_code))
+            self._batching = False
+            return None
+
+        try:
+            responses = self._parse_batch_response(response, queries)
+        except (ValueError, IndexError) as parse_error:
+            self._logger.error('The $batch response cannot be parsed: {}, sending the requests again'
+                               .format(parse_error))
+            return None
+        if len(responses) != len(queries):
+            self._logger.error('The $batch response contains {} responses instead of {}, sending them again'
+                               .format(len(responses), len(queries)))
+            return None
+        return responses
+
+    def _post(self, body, boundary, kwargs):
+        headers = {'Content-Type': 'multipart/mixed; boundary=' + boundary}
+        for _ in range(2):
+            if self._csrf_token is None:
+                self._csrf_token = self._fetch_csrf_token(kwargs)
+            headers['X-CSRF-Token'] = self._csrf_token
+            # the tokens of the rate limiter were taken by the packed requests
+            response = self._dispatcher.post(self._batch_query, data=body.encode('utf-8'), headers=headers,
+                                             rate_limited=False, **kwargs)
+            # an expired token is fetched once again
+            if response.status_code != 403 or response.headers.get('x-csrf-token', '').lower() != 'required':
+                break
+            self._csrf_token = None
+        return response
+
+    def _fetch_csrf_token(self, kwargs):
+        # SAP Gateway requires the token for every POST request, even for a $batch of GET requests
+        response = self._dispatcher.get('', headers={'X-CSRF-Token': 'Fetch'}, **kwargs)
+        return response.headers.get('x-csrf-token', '')
+
+    def _build_batch_body(self, queries, boundary):
+        lines = []
+        for query in queries:
+            lines.extend(['--' + boundary, 'Content-Type: application/http', 'Content-Transfer-Encoding: binary', '',
+                          'GET {} HTTP/1.1'.format(requests.utils.requote_uri(query)), '', ''])
+        lines.append('--' + boundary + '--')
+        return '\r\n'.join(lines)
+
+    def _parse_batch_response(self, response, queries):
+        match = re.search(r'boundary="?([^";]+)"?', response.headers.get('content-type', ''))
+        if not match:
+            return []
+        parts = response.content.split(b'--' + match.group(1).encode('ascii'))
+        responses = []
+        # the first part is a preamble, the last one follows the closing delimiter
+        for part, query in zip(parts[1:-1], queries):
+            # the line break before a delimiter belongs to the delimiter
+            _, http_response = self._split_message(re.sub(rb'\r?\n\Z', b'', part))
+            responses.append(self._parse_http_response(http_response, query, response.elapsed))
+        return responses
+
+    def _parse_http_response(self, http_response, query, elapsed):
+        head, content = self._split_message(http_response)
+        status_line, *header_lines = head.decode('latin1').splitlines()
+        headers = requests.structures.CaseInsensitiveDict()
+        for header_line in header_lines:
+            name, _, value = header_line.partition(':')
+            headers[name.strip()] = value.strip()
+        charset = re.search(r'charset=([^;\s]+)', headers.get('content-type', ''))
+        return DispatchedResponse(int(status_line.split()[1]), headers, content, charset and charset.group(1),
+                                  elapsed, self._dispatcher.service + query, batched=True)
+
+    def _split_message(self, message):
+        message = message.lstrip(b'\r\n')
+        separator = re.search(rb'\r?\n\r?\n', message)
+        if not separator:
+            return message, b''
+        return message[:separator.start()], message[separator.end():]
+
+
+class DispatchedResponse:
+    """A response not received by requests with the attributes of a requests' response which are used by the fuzzer.
+
+    It is created by AsyncDispatcher and by BatchDispatcher for every response unpacked from a $batch response.
+    The elapsed time of a batched response is the time of the whole batch.
+    """
+
+    def __init__(self, status_code, headers, content, encoding, elapsed, url, batched=False):
+        self.status_code = status_code
+        self.headers = headers
+        self.encoding = encoding
+        self.content = content
+        self.elapsed = elapsed
+        self.batched = batched
+        self.request = DispatchedRequest(url)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+DispatchedRequest = namedtuple('DispatchedRequest', 'url')
+
+
 class LoggerErrorWritter:
     """ """
     def __init__(self, logger):
@@ -1267,6 +2018,25 @@ def build_filter_string(filter_data):
     return option_string
 
 
+def replace_filter_part(filter_option, part_index, part):
+    """Return a copy of the filter option in which the part at the given index is replaced.
+
+    Other parts, logicals and groups are shared with the original filter option.
+    """
+    parts = list(filter_option['parts'])
+    parts[part_index] = part
+    return dict(filter_option, parts=parts)
+
+
+def copy_filter(filter_option):
+    """Return a copy of the filter option with copies of all its parts, logicals and groups."""
+    return {
+        'logicals': [dict(logical) for logical in filter_option['logicals']],
+        'parts': [dict(part) for part in filter_option['parts']],
+        'groups': [dict(group, logicals=list(group['logicals'])) for group in filter_option['groups']]
+    }
+
+
 def build_xpath_format_string(*args):
     xpath_string = ''
     for arg in args:
@@ -3,8 +3,12 @@
 import random
 import uuid
 import datetime
+import asyncio
+import itertools
+import gevent
 
 from odfuzz.constants import BASE_CHARSET, HEX_BINARY
+from odfuzz.config import Config
 from odfuzz.encoders import EncoderMixin
 
 START_DATE = datetime.datetime(1900, 1, 1, 0, 0, 0)
@@ -15,10 +19,18 @@ DATE_INTERVAL = (END_DATE - START_DATE).total_seconds()
 class EdmBinary:
     @staticmethod
     def generate():
+        if value_pools.enabled:
+            return value_pools.pop('Edm.Binary', EdmBinary.generate_values)
         prefix = 'X' if random.random() < 0.5 else 'binary'
         binary = ''.join([random.choice(HEX_BINARY) for _ in range(random.randrange(2, 20, 2))])
         return '{0}\'{1}\''.format(prefix, binary)
 
+    @staticmethod
+    def generate_values(number):
+        prefixes = random.choices(('X', 'binary'), k=number)
+        binaries = split_characters(HEX_BINARY, random.choices(range(2, 20, 2), k=number))
+        return ['{0}\'{1}\''.format(prefix, binary) for prefix, binary in zip(prefixes, binaries)]
+
 
 class EdmBoolean:
     @staticmethod
@@ -68,8 +80,22 @@ class EdmSingle:
 class EdmGuid:
     @staticmethod
     def generate():
+        if value_pools.enabled:
+            return value_pools.pop('Edm.Guid', EdmGuid.generate_values)
         return 'guid\'{0}\''.format(str(uuid.UUID(int=random.getrandbits(128), version=4)))
 
+    @staticmethod
+    def generate_values(number):
+        """Format version 4 UUIDs from one bulk of random bits."""
+        hex_digits = random.getrandbits(128 * number).to_bytes(16 * number, 'little').hex()
+        values = []
+        for start in range(0, 32 * number, 32):
+            digits = hex_digits[start:start + 32]
+            variant = '89ab'[int(digits[16], 16) & 3]
+            values.append('guid\'{0}-{1}-4{2}-{3}{4}-{5}\''.format(
+                digits[:8], digits[8:12], digits[13:16], variant, digits[17:20], digits[20:]))
+        return values
+
 
 class EdmInt16:
     @staticmethod
@@ -121,6 +147,103 @@ class EdmDateTimeOffset:
 class RandomGenerator(EncoderMixin):
     @staticmethod
     def random_string(max_length):
+        if value_pools.enabled:
+            return value_pools.pop(('Edm.String', max_length),
+                                   lambda number: RandomGenerator.random_strings(max_length, number))
         string_length = round(random.random() * max_length)
         generated_string = ''.join(random.choice(BASE_CHARSET) for _ in range(string_length))
         return RandomGenerator._encode_string(generated_string)
+
+    @staticmethod
+    def random_strings(max_length, number):
+        lengths = [round(random.random() * max_length) for _ in range(number)]
+        return [RandomGenerator._encode_string(string) for string in split_characters(BASE_CHARSET, lengths)]
+
+
+class ValuePool:
+    """A pool of pre-generated values of one type.
+
+    When the pool runs low, it is refilled in a background greenlet, so the values are generated while the fuzzer
+    waits for responses. With the asyncio dispatcher, the refill is scheduled in the event loop of the pipeline
+    instead, since the gevent hub does not run then. An empty pool is refilled immediately.
+    """
+
+    def __init__(self, generate_values, size):
+        self._generate_values = generate_values
+        self._size = size
+        self._values = []
+        self._refilling = None
+
+    def pop(self):
+        if not self._values:
+            self._values = self._generate_values(self._size)
+        elif len(self._values) < self._size // 4 and not self._refilling:
+            self._schedule_refill()
+        return self._values.pop()
+
+    def _schedule_refill(self):
+        if Config.dispatcher.dispatcher == 'asyncio':
+            self._refilling = asyncio.get_event_loop().call_soon(self._refill)
+        else:
+            self._refilling = gevent.spawn(self._refill)
+
+    def _refill(self):
+        self._values[:0] = self._generate_values(self._size - len(self._values))
+        self._refilling = None
+
+
+class ValuePools:
+    """Pools of pre-generated values keyed by the Edm type (and its facets). Pools of the size 0 are disabled."""
+
+    def __init__(self, size):
+        self._size = size
+        self._pools = {}
+
+    @property
+    def enabled(self):
+        return self._size > 0
+
+    def pop(self, key, generate_values):
+        try:
+            pool = self._pools[key]
+        except KeyError:
+            pool = self._pools[key] = ValuePool(generate_values, self._size)
+        return pool.pop()
+
+
+def random_characters(charset, number):
+    """Return a string of random characters from the charset, generated from bulks of random bytes.
+
+    Bytes are mapped to the characters by a translation table; bytes above the largest multiple of the charset
+    length are deleted, so all characters are equally likely.
+    """
+    table = _translation_table(charset)
+    accepted_bytes = 256 // len(charset) * len(charset)
+    characters = ''
+    while len(characters) < number:
+        bytes_num = (number - len(characters)) * 256 // accepted_bytes + 16
+        random_bytes = random.getrandbits(8 * bytes_num).to_bytes(bytes_num, 'little')
+        characters += random_bytes.decode('latin-1').translate(table)
+    return characters[:number]
+
+
+def split_characters(charset, lengths):
+    characters = random_characters(charset, sum(lengths))
+    ends = list(itertools.accumulate(lengths))
+    return [characters[end - length:end] for length, end in zip(lengths, ends)]
+
+
+_translation_tables = {}
+
+
+def _translation_table(charset):
+    try:
+        return _translation_tables[charset]
+    except KeyError:
+        accepted_bytes = 256 // len(charset) * len(charset)
+        table = {byte: (charset[byte % len(charset)] if byte < accepted_bytes else None) for byte in range(256)}
+        _translation_tables[charset] = table
+        return table
+
+
+value_pools = ValuePools(Config.fuzzer.value_pool_size)
@@ -5,7 +5,8 @@ mutation. When the fuzzer starts generating, or mutating, requests, it goes thro
 1. A selection of a property that is destined to be used in the filter query option.
 2. A value generation for the corresponding property, based on its type and other characteristics.
 The second stage is crucial for a computational time and a code complexity. ODfuzz omits all unnecessary checks for
-such characteristics of a property by binding new methods for each property.
+such characteristics of a property by binding new methods for each property. The methods are created only once for
+all properties with the same type, facets and restricted values.
 
 In this module, the methods 'operators()', 'generate()' and 'mutate()' are dynamically patched to the existing
 properties' objects. Therefore, it is possible to call `property.generate()` or `property.mutate(old_value)`, while
@@ -20,6 +21,9 @@ the associated ends are tied to the corresponding entity sets.
 import random
 import logging
 import types
+import functools
+
+from collections import namedtuple
 
 from pyodata.v2.model import VariableDeclaration, ComplexType
 
@@ -59,6 +63,11 @@ MAX_STRING_LENGTH = 100
 MAX_PRECISION = 20
 MAX_SCALE = 10
 
+ProprtyFacets = namedtuple('ProprtyFacets', 'max_length precision scale')
+ProprtyBundle = namedtuple('ProprtyBundle', 'generate mutate operators')
+
+_bundles = {}
+
 
 def patch_entity_set(entity_set, association_sets):
     """
@@ -88,9 +97,11 @@ def patch_proprties(entity_set_name, proprties, restrictions):
         patch_complex_types(entity_set_name, proprty, restrictions)
         patch_proprty_max_length(proprty)
         patch_proprty_precision_scale(proprty)
-        patch_proprty_generator(entity_set_name, proprty, restrictions)
-        patch_proprty_mutator(entity_set_name, proprty, restrictions)
-        patch_proprty_operator(proprty)
+        bundle = proprty_bundle(entity_set_name, proprty, restrictions)
+        if bundle.generate:
+            proprty.generate = bundle.generate
+        proprty.mutate = bundle.mutate
+        proprty.operators = bundle.operators
 
 
 def patch_complex_types(entity_set_name, proprty, restrictions):
@@ -115,91 +126,123 @@ def patch_proprty_precision_scale(proprty):
 
 
 def patch_proprty_generator(entity_set_name, proprty, restrictions):
+    generate = proprty_bundle(entity_set_name, proprty, restrictions).generate
+    if generate:
+        proprty.generate = generate
+
+
+def patch_proprty_mutator(entity_set_name, proprty, restrictions):
+    proprty.mutate = proprty_bundle(entity_set_name, proprty, restrictions).mutate
+
+
+def patch_proprty_operator(proprty):
+    proprty.operators = create_operators(proprty.typ.name, proprty.filter_restriction)
+
+
+def proprty_bundle(entity_set_name, proprty, restrictions):
+    """
+    Return generate(), mutate() and operators of a property. Properties with the same type, facets and restricted
+    values share one immutable bundle, which is created only once.
+
+    :param entity_set_name: A name of the entity set the property belongs to.
+    :param proprty: A patched property.
+    :param restrictions: A group of user defined restrictions.
+    :return: A bundle of methods and operators.
+    """
+    restricted_values = get_restricted_values(entity_set_name, proprty, restrictions)
+    signature = (proprty.typ.name, getattr(proprty, 'max_length', None), getattr(proprty, 'precision', None),
+                 getattr(proprty, 'scale', None), proprty.filter_restriction, restricted_values)
+    try:
+        return _bundles[signature]
+    except KeyError:
+        bundle = _bundles[signature] = create_bundle(*signature)
+        return bundle
+
+
+def get_restricted_values(entity_set_name, proprty, restrictions):
     filter_restriction = restrictions.get(VALUE)
     if filter_restriction.include:
         entity_set_restr = filter_restriction.include.get(entity_set_name)
         if entity_set_restr:
             proprty_restr = entity_set_restr.get(proprty.name)
             if proprty_restr:
-                proprty.generate = lambda: random.choice(proprty_restr)
-                return
+                return tuple(proprty_restr)
+    return None
 
-    proprty_type = proprty.typ.name
+
+def create_bundle(proprty_type, max_length, precision, scale, filter_restriction, restricted_values):
+    facets = ProprtyFacets(max_length, precision, scale)
+    if restricted_values:
+        generate = functools.partial(random.choice, restricted_values)
+        mutate = lambda _: random.choice(restricted_values)
+    else:
+        generate = create_generator(proprty_type, facets)
+        mutate = create_mutator(proprty_type, facets)
+    return ProprtyBundle(generate, mutate, create_operators(proprty_type, filter_restriction))
+
+
+def create_generator(proprty_type, facets):
     if proprty_type == 'Edm.String':
-        proprty.generate = types.MethodType(EdmString.generate, proprty)
+        return types.MethodType(EdmString.generate, facets)
     elif proprty_type == 'Edm.DateTime':
-        proprty.generate = EdmDateTime.generate
+        return EdmDateTime.generate
     elif proprty_type == 'Edm.Boolean':
-        proprty.generate = EdmBoolean.generate
+        return EdmBoolean.generate
     elif proprty_type == 'Edm.Byte':
-        proprty.generate = EdmByte.generate
+        return EdmByte.generate
     elif proprty_type == 'Edm.SByte':
-        proprty.generate = EdmSByte.generate
+        return EdmSByte.generate
     elif proprty_type == 'Edm.Single':
-        proprty.generate = EdmSingle.generate
+        return EdmSingle.generate
     elif proprty_type == 'Edm.Guid':
-        proprty.generate = EdmGuid.generate
+        return EdmGuid.generate
     elif proprty_type == 'Edm.Decimal':
-        proprty.generate = types.MethodType(EdmDecimal.generate, proprty)
+        return types.MethodType(EdmDecimal.generate, facets)
     elif proprty_type == 'Edm.DateTimeOffset':
-        proprty.generate = EdmDateTimeOffset.generate
+        return EdmDateTimeOffset.generate
     elif proprty_type == 'Edm.Time':
-        proprty.generate = EdmTime.generate
+        return EdmTime.generate
     elif proprty_type == 'Edm.Binary':
-        proprty.generate = EdmBinary.generate
+        return EdmBinary.generate
     elif proprty_type == 'Edm.Double':
-        proprty.generate = EdmDouble.generate
+        return EdmDouble.generate
     elif proprty_type.startswith('Edm.Int'):
         if proprty_type.endswith('16'):
-            proprty.generate = EdmInt16.generate
+            return EdmInt16.generate
         elif proprty_type.endswith('32'):
-            proprty.generate = EdmInt32.generate
+            return EdmInt32.generate
         elif proprty_type.endswith('64'):
-            proprty.generate = EdmInt64.generate
-        else:
-            logging.info('Property type {} is not supported by generator yet'.format(proprty_type))
-    else:
-        logging.info('Property type {} is not supported by generator yet'.format(proprty_type))
+            return EdmInt64.generate
+    logging.info('Property type {} is not supported by generator yet'.format(proprty_type))
+    return None
 
 
-def patch_proprty_mutator(entity_set_name, proprty, restrictions):
-    filter_restriction = restrictions.get(VALUE)
-    if filter_restriction.include:
-        entity_set_restr = filter_restriction.include.get(entity_set_name)
-        if entity_set_restr:
-            proprty_restr = entity_set_restr.get(proprty.name)
-            if proprty_restr:
-                proprty.mutate = lambda _: random.choice(proprty_restr)
-                return
-
-    proprty_type = proprty.typ.name
+def create_mutator(proprty_type, facets):
     if proprty_type == 'Edm.String':
-        proprty.mutate = types.MethodType(StringMutator._mutate, proprty)
+        return types.MethodType(StringMutator._mutate, facets)
     elif proprty_type.startswith('Edm.Int'):
-        proprty.mutate = types.MethodType(NumberMutator._mutate, proprty)
+        return types.MethodType(NumberMutator._mutate, facets)
     elif proprty_type == 'Edm.Decimal':
-        proprty.mutate = types.MethodType(DecimalMutator._mutate, proprty)
+        return types.MethodType(DecimalMutator._mutate, facets)
     elif proprty_type == 'Edm.Guid':
-        proprty.mutate = GuidMutator.replace_char
+        return types.MethodType(GuidMutator._mutate, facets)
     elif proprty_type == 'Edm.Boolean':
-        proprty.mutate = BooleanMutator.flip_value
+        return types.MethodType(BooleanMutator._mutate, facets)
     elif proprty_type == 'Edm.DateTime':
-        proprty.mutate = types.MethodType(DateTimeMutator._mutate, proprty)
-    else:
-        proprty.mutate = lambda value: value
-        logging.info('Property type {} is not supported by mutator yet'.format(proprty_type))
+        return types.MethodType(DateTimeMutator._mutate, facets)
+    logging.info('Property type {} is not supported by mutator yet'.format(proprty_type))
+    return lambda value: value
 
 
-def patch_proprty_operator(proprty):
-    proprty_type = proprty.typ.name
-    if proprty.filter_restriction in ('single-value', 'multi-value'):
-        proprty.operators = Operators({'eq': 1.0})
-    elif proprty.filter_restriction == 'interval':
-        proprty.operators = IntervalOperators((INTERVAL_OPERATORS, {'eq': 1.0}))
+def create_operators(proprty_type, filter_restriction):
+    if filter_restriction in ('single-value', 'multi-value'):
+        return Operators({'eq': 1.0})
+    elif filter_restriction == 'interval':
+        return IntervalOperators((INTERVAL_OPERATORS, {'eq': 1.0}))
     elif proprty_type == 'Edm.Boolean':
-        proprty.operators = Operators(BOOLEAN_OPERATORS)
+        return Operators(BOOLEAN_OPERATORS)
     else:
-        proprty.operators = Operators(EXPRESSION_OPERATORS)
+        return Operators(EXPRESSION_OPERATORS)
 
 
 class Operators:
@@ -1,23 +1,32 @@
+import math
 import random
 
+from contextlib import contextmanager
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 from odfuzz.constants import BASE_CHARSET, HEX_BINARY, INT_MAX
 from odfuzz.encoders import EncoderMixin
+from odfuzz.exceptions import ODfuzzException
 
 
 class Mutator:
-    _methods = []
+    """A base class of mutators. Public static methods of subclasses are registered as mutation operators."""
+    _operators = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._operators = tuple(member.__func__ for name, member in cls.__dict__.items()
+                               if not name.startswith('_') and isinstance(member, staticmethod))
 
     @classmethod
-    def _mutate(cls, proprty, value):
-        """Select a random mutation function from the list of all available functions."""
-        if not cls._methods:
-            cls._methods = [name for name in cls.__dict__ if not name.startswith('_')]
+    def select_operator(cls):
+        """Select a mutation function from the registered operators by the current mutation scheduler."""
+        return _scheduler.select(cls)
 
-        chosen_mutator = random.choice(cls._methods)
-        mutated_value = getattr(cls, chosen_mutator)(proprty, value)
+    @classmethod
+    def _mutate(cls, proprty, value):
+        mutated_value = cls.select_operator()(proprty, value)
         return cls._normalize_format(cls._encode_value(mutated_value))
 
     @classmethod
@@ -193,11 +202,11 @@ class NumberMutator(Mutator):
         return generated_number + appendix
 
 
-class GuidMutator:
+class GuidMutator(Mutator):
     GUID_DASH_INDEXES = (8, 13, 18, 23)  # mandatory part of GUUID, "-"
 
     @staticmethod
-    def replace_char(string_guid):
+    def replace_char(self, string_guid):
         # get the proper index to the string array by skipping the prefix "guid'"
         # and trimming the last single quote enclosing the GUUID part
         index = round(random.random() * (len(string_guid) - 2 - 5)) + 5
@@ -208,9 +217,9 @@ class GuidMutator:
         return mutated_guid
 
 
-class BooleanMutator:
+class BooleanMutator(Mutator):
     @staticmethod
-    def flip_value(boolean):
+    def flip_value(self, boolean):
         return 'true' if boolean == 'false' else 'false'
 
 
@@ -269,17 +278,7 @@ class DecimalMutator(Mutator):
         return mutated_value
 
 
-class DateTimeMutator:
-    _methods = []
-
-    @staticmethod
-    def _mutate(proprty, value):
-        if not DateTimeMutator._methods:
-            DateTimeMutator._methods = [func_name for func_name in DateTimeMutator.__dict__ if not func_name.startswith('_')]
-        func_name = random.choice(DateTimeMutator._methods)
-        mutated_value = getattr(DateTimeMutator, func_name)(proprty, value)
-        return mutated_value
-
+class DateTimeMutator(Mutator):
     @staticmethod
     def _mutate_date(date_time, time_delta):
         converted_date = datetime.strptime(date_time.replace('datetime', '').replace('\'', ''), '%Y-%m-%dT%I:%M:%S')
@@ -315,3 +314,121 @@ def normalize_surrogates(ord_char):
     if 0xD800 <= ord_char <= 0xDFFF:
         return 0xD7FF
     return ord_char
+
+
+class OperatorStats:
+    """Counters of a single mutation operator."""
+
+    def __init__(self):
+        self.selections = 0
+        self.evaluations = 0
+        self.improvements = 0
+        self.total_score = 0
+
+    @property
+    def average_score(self):
+        return self.total_score / self.evaluations if self.evaluations else 0
+
+
+class MutationScheduler:
+    """A base class of schedulers selecting mutation operators.
+
+    Operators selected while recording are attached to the mutated query. When the query is evaluated,
+    the operators are credited with its score and with the information whether it is better than its parent.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._recorded = None
+
+    @property
+    def stats(self):
+        """Return the stats of operators keyed by (mutator name, operator name)."""
+        return self._stats
+
+    def select(self, mutator_class):
+        operator = self._select(mutator_class)
+        key = (mutator_class.__name__, operator.__name__)
+        self._operator_stats(key).selections += 1
+        if self._recorded is not None:
+            self._recorded.append(key)
+        return operator
+
+    @contextmanager
+    def recording(self):
+        """Collect keys of all operators selected within the context."""
+        self._recorded = recorded = []
+        try:
+            yield recorded
+        finally:
+            self._recorded = None
+
+    def credit(self, operator_keys, score, improved):
+        for key in operator_keys:
+            operator_stats = self._operator_stats(key)
+            operator_stats.evaluations += 1
+            operator_stats.total_score += score
+            if improved:
+                operator_stats.improvements += 1
+
+    def _operator_stats(self, key):
+        try:
+            return self._stats[key]
+        except KeyError:
+            operator_stats = self._stats[key] = OperatorStats()
+            return operator_stats
+
+    def _select(self, mutator_class):
+        raise NotImplementedError
+
+
+class RandomScheduler(MutationScheduler):
+    """Select operators at random."""
+
+    def _select(self, mutator_class):
+        return random.choice(mutator_class._operators)
+
+
+class UCBScheduler(MutationScheduler):
+    """Select operators by the UCB1 algorithm, rewarding operators that created offspring better than their parents.
+
+    Selections whose offspring were not evaluated yet are counted as unsuccessful.
+    """
+
+    def __init__(self, exploration=math.sqrt(2)):
+        super(UCBScheduler, self).__init__()
+        self._exploration = exploration
+
+    def _select(self, mutator_class):
+        operators = mutator_class._operators
+        operators_stats = [self._operator_stats((mutator_class.__name__, operator.__name__))
+                           for operator in operators]
+
+        untried = [operator for operator, stats in zip(operators, operators_stats) if not stats.selections]
+        if untried:
+            return random.choice(untried)
+
+        log_total = math.log(sum(stats.selections for stats in operators_stats))
+        bounds = [stats.improvements / stats.selections
+                  + self._exploration * math.sqrt(log_total / stats.selections) for stats in operators_stats]
+        return operators[bounds.index(max(bounds))]
+
+
+MUTATION_SCHEDULERS = {'random': RandomScheduler, 'ucb': UCBScheduler}
+
+_scheduler = RandomScheduler()
+
+
+def mutation_scheduler():
+    return _scheduler
+
+
+def set_mutation_scheduler(name):
+    """Replace the current mutation scheduler by a new one of the given name."""
+    global _scheduler
+    try:
+        _scheduler = MUTATION_SCHEDULERS[name]()
+    except KeyError:
+        raise ODfuzzException('Unknown mutation scheduler \'{}\', use one of: {}'.format(
+            name, ', '.join(MUTATION_SCHEDULERS)))
+    return _scheduler
@@ -1,21 +1,32 @@
-# patches core python lib - sockets - to be non-blocking.
-from gevent import monkey
-monkey.patch_all()
+import os
+
+# the constants import neither sockets nor ssl, so they can be read before the patching
+from odfuzz.constants import ENV_DISPATCHER, DEFAULT_DISPATCHER
+
+# patches core python lib - sockets - to be non-blocking; the asyncio dispatcher does not need the patching
+ASYNCIO_DISPATCHER = os.getenv(ENV_DISPATCHER, DEFAULT_DISPATCHER) == 'asyncio'
+if not ASYNCIO_DISPATCHER:
+    from gevent import monkey
+    monkey.patch_all()
 
 import sys
 import signal
+import asyncio
 import logging
 import gevent
 import traceback
+import multiprocessing
 
 from datetime import datetime
 
 from odfuzz.arguments import ArgParser
 from odfuzz.fuzzer import Manager
-from odfuzz.statistics import Stats, StatsPrinter
-from odfuzz.loggers import init_loggers, DirectoriesCreator
-from odfuzz.databases import CollectionCreator, MongoDB, MongoDBHandler
-from odfuzz.constants import INFINITY_TIMEOUT
+from odfuzz.entities import Shard, SINGLE_SHARD
+from odfuzz.statistics import Stats, StatsPrinter, dump_stats, merge_stats
+from odfuzz.loggers import init_loggers, DirectoriesCreator, make_directory
+from odfuzz.databases import CollectionCreator, select_database, flush_all
+from odfuzz.config import DatabaseConfig
+from odfuzz.constants import INFINITY_TIMEOUT, WORKER_DIRECTORY_NAME, WORKER_STATS_FILE_NAME
 from odfuzz.exceptions import ArgParserError, ODfuzzException
 
 
@@ -30,14 +41,23 @@ def execute(arguments, bind=None):
     except ArgParserError as argparser_error:
         sys.exit(argparser_error)
 
-    init_logging(parsed_arguments)
+    directories = init_logging(parsed_arguments)
 
     collection_name = create_collection_name(parsed_arguments)
     logging.info('Database\'s collection set to {}'.format(collection_name))
 
-    set_signal_handler(collection_name)
+    database_config = DatabaseConfig()
+    database_handler, database_client = select_database(parsed_arguments.database, parsed_arguments.snapshot,
+                                                        database_config.write_buffer_size,
+                                                        database_config.flush_interval)
+    if parsed_arguments.workers > 1:
+        run_workers(parsed_arguments, directories, database_handler, database_client, collection_name)
+        return
+
+    if not ASYNCIO_DISPATCHER:
+        set_signal_handler(database_handler, database_client, collection_name)
 
-    run_fuzzer(bind, parsed_arguments, collection_name)
+    run_fuzzer(bind, parsed_arguments, database_handler, database_client, collection_name)
 
 
 def init_logging(arguments):
@@ -45,6 +65,7 @@ def init_logging(arguments):
     directories = directories_creator.create()
     init_basic_stats(directories.stats) #TODO refactor, this part exposes some inner state in Stats class
     init_loggers(directories.logs, directories.stats)
+    return directories
 
 
 def init_basic_stats(stats_directory):
@@ -64,42 +85,125 @@ def create_collection_name(parsed_arguments):
     return collection_name
 
 
-def set_signal_handler(db_collection_name):
-    gevent.signal_handler(signal.SIGINT, signal_handler, db_collection_name)
+def set_signal_handler(database_handler, database_client, db_collection_name):
+    gevent.signal_handler(signal.SIGINT, signal_handler, database_handler, database_client, db_collection_name)
+
+
+def run_workers(parsed_arguments, directories, database_handler, database_client, collection_name):
+    """ Spawns worker processes which fuzz disjoint shards of entity sets and share the population collection.
+
+    Every worker writes logs and stats to its own subdirectory. When all workers exit, their counters are merged
+    and the stats of the whole population are written by this process.
+    """
+    context = multiprocessing.get_context('spawn')
+    workers = []
+    worker_stats_directories = []
+    for index in range(parsed_arguments.workers):
+        worker_directory = WORKER_DIRECTORY_NAME.format(index)
+        logs_directory = os.path.join(directories.logs, worker_directory)
+        stats_directory = os.path.join(directories.stats, worker_directory)
+        shard = Shard(index, parsed_arguments.workers)
+        worker = context.Process(target=run_worker, name=worker_directory,
+                                 args=(parsed_arguments, shard, logs_directory, stats_directory, collection_name))
+        worker.start()
+        workers.append(worker)
+        worker_stats_directories.append(stats_directory)
+    logging.info('Started {} worker processes'.format(len(workers)))
+
+    # an interruption is delivered to the workers as well, this process only waits until they write their stats
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for worker in workers:
+        worker.join()
+
+    for stats_directory in worker_stats_directories:
+        stats_file_path = os.path.join(stats_directory, WORKER_STATS_FILE_NAME)
+        if os.path.isfile(stats_file_path):
+            merge_stats(stats_file_path)
+        else:
+            logging.error('Stats of the worker {} are missing'.format(stats_directory))
+
+    database = database_handler(database_client(collection_name))
+    stats = StatsPrinter(database)
+    stats.write()
+    database.close()
+
 
+def run_worker(parsed_arguments, shard, logs_directory, stats_directory, collection_name):
+    """ This is the entry point of a worker process spawned by run_workers."""
+    make_directory(logs_directory)
+    if stats_directory != logs_directory:
+        make_directory(stats_directory)
+    init_basic_stats(stats_directory)
+    init_loggers(logs_directory, stats_directory)
 
-def run_fuzzer(bind, parsed_arguments, collection_name):
+    database_config = DatabaseConfig()
+    database_handler, database_client = select_database(parsed_arguments.database, None,
+                                                        database_config.write_buffer_size,
+                                                        database_config.flush_interval, shared_collection=True)
+    if not ASYNCIO_DISPATCHER:
+        gevent.signal_handler(signal.SIGINT, worker_signal_handler)
+
+    try:
+        run_fuzzer(None, parsed_arguments, database_handler, database_client, collection_name, shard)
+    finally:
+        # the stats are written however the worker exits, so the main process does not lose them
+        dump_stats(os.path.join(Stats.directory, WORKER_STATS_FILE_NAME))
+
+
+def run_fuzzer(bind, parsed_arguments, database_handler, database_client, collection_name, shard=SINGLE_SHARD):
     """ This is the main gevent thread for the odfuzz process.)
 
     :param bind: # Argument 'bind' can be used for binding the standard ooutput of this process instance to another process, e.g. celery (ODfuzz-server)
     :param parsed_arguments:
+    :param database_handler: A class of the database handler which stores the population
+    :param database_client: A factory of the database client, called with the collection name
     :param collection_name:
+    :param shard: A shard of entity sets fuzzed by this process if it is one of the worker processes
     :return:
     """
-    manager = Manager(bind, parsed_arguments, collection_name)
     try:
-        if parsed_arguments.timeout == INFINITY_TIMEOUT:
+        manager = Manager(bind, parsed_arguments, database_handler, database_client, collection_name, shard)
+        if parsed_arguments.timeout == INFINITY_TIMEOUT or ASYNCIO_DISPATCHER:
+            # the asyncio pipeline raises asyncio.TimeoutError by itself when the timeout expires
             manager.start()
         else:
             gevent.with_timeout(parsed_arguments.timeout, manager.start)
     except ODfuzzException as ex:
         sys.stderr.write(str(ex) + '\n')
         sys.exit(1)
-    except gevent.Timeout:
-        signal_handler(collection_name)
+    except (gevent.Timeout, asyncio.TimeoutError, KeyboardInterrupt):
+        # without the gevent signal handlers, an interruption by the user is handled here as well
+        if shard.count > 1:
+            worker_signal_handler()
+        else:
+            signal_handler(database_handler, database_client, collection_name)
     except Exception:
         logging.error(traceback.format_exc())
         print(traceback.format_exc())
         sys.exit(1)
 
 
-def signal_handler(db_collection_name):
+def signal_handler(database_handler, database_client, db_collection_name):
     exit_message = 'Program interrupted. Exiting...'
     logging.info(exit_message)
     sys.stdout.write('\n' + exit_message + '\n')
 
-    stats = StatsPrinter(MongoDBHandler, MongoDB, db_collection_name)
+    # the fuzzer is interrupted at an arbitrary place, so writes buffered by its database handler have to be saved
+    flush_all()
+    database = database_handler(database_client(db_collection_name))
+    stats = StatsPrinter(database)
     stats.write()
+    database.close()
+
+    sys.exit(0)
+
+
+def worker_signal_handler():
+    logging.info('Worker interrupted. Exiting...')
+
+    # the population and the stats of the whole run are written by the main process; this worker's stats
+    # are dumped by run_worker on the exit
+    flush_all()
 
     sys.exit(0)
 
@@ -1,10 +1,17 @@
 """This module contains classes that store and print statistics."""
 
 import os
+import json
 
 from datetime import datetime
 
-from odfuzz.constants import RUNTIME_FILE_NAME
+from odfuzz.constants import RUNTIME_FILE_NAME, MUTATION_STATS_FILE_NAME, CSV_MUTATION_STATS_HEADER
+from odfuzz.mutators import mutation_scheduler, OperatorStats
+
+# counters of Stats which are summed over all worker processes
+STATS_COUNTERS = ('tests_num', 'fails_num', 'exceptions_num', 'created_by_mutation', 'created_by_crossover',
+                  'rejected_duplicates')
+OPERATOR_COUNTERS = ('selections', 'evaluations', 'improvements', 'total_score')
 
 #TODO refactor, class is not inicialized and used in some method parameter, but filled directly in import module calls.
 
@@ -20,6 +27,7 @@ class Stats:
     exceptions_num = 0
     created_by_mutation = 0
     created_by_crossover = 0
+    rejected_duplicates = 0
 
 
     directory = None
@@ -29,13 +37,14 @@ class Stats:
 class StatsPrinter:
     """A printer that writes all statistics to the defined output."""
 
-    def __init__(self, database_handler, database_client, collection_name):
-        self._database = database_handler(database_client(collection_name))
+    def __init__(self, database):
+        self._database = database
         self._stats = Stats()
 
     def write(self):
         self._write_sorted_entities()
         self._write_runtime_stats()
+        self._write_mutation_stats()
 
     def _write_sorted_entities(self):
         """ Writes subset of all generated URLs that triggered Error/Exception on server from DB,
@@ -54,13 +63,60 @@ class StatsPrinter:
 
         """
         file_path = os.path.join(self._stats.directory, RUNTIME_FILE_NAME)
+        population_score = self._database.population_score()
         formatted_output = (
             'Generated tests: ' + str(self._stats.tests_num) + '\n'
             'Failed tests: ' + str(self._stats.fails_num) + '\n'
             'Raised exceptions: ' + str(self._stats.exceptions_num) + '\n'
             'Created by mutation: ' + str(self._stats.created_by_mutation) + '\n'
             'Created by crossover: ' + str(self._stats.created_by_crossover) + '\n'
+            'Rejected duplicates: ' + str(self._stats.rejected_duplicates) + '\n'
+            'Population size: ' + str(population_score.count) + '\n'
+            'Population score (min/avg/max): ' + '{}/{:.2f}/{}'.format(
+                population_score.minimum, population_score.average, population_score.maximum) + '\n'
             'Runtime: ' + str(datetime.now() - self._stats.start_datetime) + '\n'
         )
         with open(file_path, 'a', encoding='utf-8') as overall_file:
             overall_file.write(formatted_output)
+
+    def _write_mutation_stats(self):
+        """ Writes how often were mutation operators selected and how successful their offspring were.
+
+        """
+        operators_stats = mutation_scheduler().stats
+        if not operators_stats:
+            return
+        file_path = os.path.join(self._stats.directory, MUTATION_STATS_FILE_NAME)
+        with open(file_path, 'w', encoding='utf-8') as mutation_file:
+            mutation_file.write(CSV_MUTATION_STATS_HEADER + '\n')
+            for (mutator_name, operator_name), stats in sorted(operators_stats.items()):
+                mutation_file.write('{};{};{};{};{};{:.2f}\n'.format(
+                    mutator_name, operator_name, stats.selections, stats.evaluations, stats.improvements,
+                    stats.average_score))
+
+
+def dump_stats(file_path):
+    """Write counters of this worker process, so the main process can merge them with the other workers."""
+    operators = [[mutator_name, operator_name] + [getattr(stats, counter) for counter in OPERATOR_COUNTERS]
+                 for (mutator_name, operator_name), stats in mutation_scheduler().stats.items()]
+    worker_stats = {
+        'counters': {counter: getattr(Stats, counter) for counter in STATS_COUNTERS},
+        'mutation_operators': operators
+    }
+    with open(file_path, 'w', encoding='utf-8') as stats_file:
+        json.dump(worker_stats, stats_file)
+
+
+def merge_stats(file_path):
+    """Add counters written by a worker process by dump_stats to counters of this process."""
+    with open(file_path, encoding='utf-8') as stats_file:
+        worker_stats = json.load(stats_file)
+
+    for counter, value in worker_stats['counters'].items():
+        setattr(Stats, counter, getattr(Stats, counter) + value)
+
+    operators_stats = mutation_scheduler().stats
+    for mutator_name, operator_name, *values in worker_stats['mutation_operators']:
+        stats = operators_stats.setdefault((mutator_name, operator_name), OperatorStats())
+        for counter, value in zip(OPERATOR_COUNTERS, values):
+            setattr(stats, counter, getattr(stats, counter) + value)
@@ -29,6 +29,9 @@ setup(
         'python-dateutil==2.8.1',
         'pyodata==1.4.0',
     ],
+    extras_require={
+        'asyncio': ['aiohttp>=3.6.2'],
+    },
     tests_require=[
         'mongomock>=3.14.0',
         'pytest>=3.5.0',
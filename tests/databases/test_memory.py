@@ -0,0 +1,148 @@
+import random
+
+from bson import ObjectId, json_util
+
+from odfuzz.databases import InMemoryDBHandler, MemoryDB
+
+
+def create_handler(*documents, snapshot_file=None):
+    memory_handler = InMemoryDBHandler(MemoryDB(str(ObjectId()), snapshot_file))
+    for document in documents:
+        memory_handler.save_entry(document)
+    return memory_handler
+
+
+def test_memory_insert_same(data_three_filter_logicals_company_code):
+    memory_handler = create_handler(data_three_filter_logicals_company_code, data_three_filter_logicals_company_code)
+
+    assert memory_handler.total_entries() == 1
+
+
+def test_memory_find_existing(data_single_filter_logical_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code)
+    data_single_filter_logical_company_code['score'] = 1000
+
+    assert memory_handler.find_entry(ObjectId("5c61a1295f627d1db904dd39"))['score'] == 1
+    assert not memory_handler.find_entry(ObjectId("5c61a1295f627d1db904dd40"))
+
+
+def test_memory_collection_is_shared_by_clients(data_single_filter_logical_company_code):
+    MemoryDB('shared_collection').collection.clear()
+    InMemoryDBHandler(MemoryDB('shared_collection')).save_entry(data_single_filter_logical_company_code)
+
+    assert InMemoryDBHandler(MemoryDB('shared_collection')).total_entries() == 1
+
+
+def test_memory_delete_existing(data_single_filter_logical_company_code, data_three_filter_logicals_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_three_filter_logicals_company_code)
+
+    assert memory_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39")) == 1
+    assert memory_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39")) == 0
+    assert memory_handler.total_entries() == 1
+    assert memory_handler.total_score() == 10
+
+
+def test_memory_delete_worst_entries(data_single_filter_logical_company_code, data_search_output_set_error,
+                                     data_inlinecount_correspondence_company_code_error):
+    memory_handler = create_handler(data_search_output_set_error, data_single_filter_logical_company_code,
+                                    data_inlinecount_correspondence_company_code_error)
+
+    memory_handler.delete_worst_entries(0)
+    assert memory_handler.total_entries() == 3
+
+    memory_handler.delete_worst_entries(2)
+    assert memory_handler.total_entries() == 1
+    assert memory_handler.find_entry(ObjectId("5c61a1295f627d1db904dd33"))
+    assert memory_handler.total_score() == 100
+
+    memory_handler.delete_worst_entries(2)
+    assert memory_handler.total_entries() == 0
+
+
+def test_memory_delete_worst_skips_deleted_entries(data_single_filter_logical_company_code,
+                                                   data_three_filter_logicals_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_three_filter_logicals_company_code)
+    memory_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39"))
+
+    memory_handler.delete_worst_entries(1)
+
+    assert memory_handler.total_entries() == 0
+
+
+def test_memory_total_score_eleven(data_single_filter_logical_company_code, data_three_filter_logicals_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_three_filter_logicals_company_code)
+
+    assert memory_handler.total_score() == 11
+
+    memory_handler.delete_collection()
+    assert memory_handler.total_score() == 0
+    assert memory_handler.total_entries() == 0
+
+
+def test_memory_sample_filter_entries(data_single_filter_logical_company_code, data_two_filter_logicals_company_code,
+                                      data_three_filter_logicals_company_code, data_search_output_set):
+    random.seed(14)
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_two_filter_logicals_company_code,
+                                    data_three_filter_logicals_company_code, data_search_output_set)
+
+    entry = memory_handler.sample_filter_entry('C_CorrespondenceCompanyCodeVH', ObjectId("5c61a1295f627d1db904dd38"))
+    assert entry == data_three_filter_logicals_company_code
+
+    entry = memory_handler.sample_filter_entry('C_CorrespondenceOutputSet', None)
+    assert not entry
+
+
+def test_memory_find_best_three(data_single_filter_logical_company_code, data_two_filter_logicals_company_code,
+                                data_search_correspondence_company_code_error, data_inlinecount_correspondence_company_code_error,
+                                data_single_filter_logical_company_code_error):
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_two_filter_logicals_company_code,
+                                    data_search_correspondence_company_code_error, data_single_filter_logical_company_code_error,
+                                    data_inlinecount_correspondence_company_code_error)
+
+    best_three_entries = memory_handler.find_best_entries('C_CorrespondenceCompanyCodeVH')
+
+    assert best_three_entries == [data_single_filter_logical_company_code_error, data_search_correspondence_company_code_error,
+                                  data_inlinecount_correspondence_company_code_error]
+
+
+def test_memory_distinct_errorous_two_entities(data_single_filter_logical_company_code_error, data_search_output_set_error,
+                                               data_single_filter_logical_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code_error, data_search_output_set_error,
+                                    data_single_filter_logical_company_code)
+
+    distinct_entities = memory_handler.find_distinct_errorous_entity_names()
+
+    assert set(distinct_entities) == set(['C_CorrespondenceOutputSet', 'C_CorrespondenceCompanyCodeVH'])
+
+
+def test_memory_snapshot_at_close(tmpdir, data_single_filter_logical_company_code, data_search_output_set_error):
+    snapshot_file = str(tmpdir.join('population.json'))
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_search_output_set_error,
+                                    snapshot_file=snapshot_file)
+
+    memory_handler.close()
+
+    with open(snapshot_file, encoding='utf-8') as snapshot:
+        documents = [json_util.loads(line) for line in snapshot]
+    assert documents == [data_single_filter_logical_company_code, data_search_output_set_error]
+
+
+def test_memory_insert_same_hash(data_single_filter_logical_company_code, data_single_filter_logical_company_code_error):
+    data_single_filter_logical_company_code['hash'] = 'f5d1b3c8'
+    data_single_filter_logical_company_code_error['hash'] = 'f5d1b3c8'
+    memory_handler = create_handler(data_single_filter_logical_company_code)
+
+    assert not memory_handler.save_entry(data_single_filter_logical_company_code_error)
+    assert memory_handler.rejected_duplicates == 1
+
+    memory_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39"))
+    assert memory_handler.save_entry(data_single_filter_logical_company_code_error)
+
+
+def test_memory_sample_filter_entry_after_delete(data_single_filter_logical_company_code, data_three_filter_logicals_company_code):
+    memory_handler = create_handler(data_single_filter_logical_company_code, data_three_filter_logicals_company_code)
+
+    memory_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd37"))
+
+    assert memory_handler.sample_filter_entry('C_CorrespondenceCompanyCodeVH', None) == data_single_filter_logical_company_code
+    assert not memory_handler.sample_filter_entry('C_CorrespondenceCompanyCodeVH', ObjectId("5c61a1295f627d1db904dd39"))
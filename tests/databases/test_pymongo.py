@@ -1,9 +1,12 @@
+import asyncio
+import gevent
 import pytest
 
 from bson import ObjectId
+from pymongo import errors
 from mongomock import MongoClient
 
-from odfuzz.databases import MongoDBHandler
+from odfuzz.databases import MongoDBHandler, ScoreCache, flush_all
 
 
 class MongoDBMock:
@@ -191,3 +194,287 @@ def test_distinct_errorous_two_entities(data_single_filter_logical_company_code_
     distinct_entities = mongo_handler.find_distinct_errorous_entity_names()
 
     assert set(distinct_entities) == set(['C_CorrespondenceOutputSet', 'C_CorrespondenceCompanyCodeVH'])
+
+
+def test_database_population_score_loaded(data_single_filter_logical_company_code, data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_mock.collection.insert_many([data_single_filter_logical_company_code, data_three_filter_logicals_company_code])
+    mongo_handler = MongoDBHandler(mongo_mock)
+
+    population_score = mongo_handler.population_score()
+
+    assert (population_score.minimum, population_score.maximum, population_score.average) == (1, 10, 5.5)
+
+
+def test_database_population_score_updated(data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                           data_search_output_set_error):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock)
+
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+    mongo_handler.save_entry(data_three_filter_logicals_company_code)
+    mongo_handler.save_entry(data_three_filter_logicals_company_code)
+    mongo_handler.save_entry(data_search_output_set_error)
+    assert (mongo_handler.total_entries(), mongo_handler.total_score()) == (3, 111)
+
+    mongo_handler.delete_worst_entries(1)
+    assert mongo_handler.population_score().minimum == 10
+
+    mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd33"))
+    mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd33"))
+    assert mongo_handler.population_score().maximum == 10
+    assert (mongo_handler.total_entries(), mongo_handler.total_score()) == (1, 10)
+
+    mongo_handler.delete_collection()
+    assert mongo_handler.population_score().maximum is None
+    assert mongo_handler.population_score().average == 0
+
+
+def test_database_shared_population_score(data_single_filter_logical_company_code,
+                                          data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    first_handler = MongoDBHandler(mongo_mock, shared_collection=True)
+    second_handler = MongoDBHandler(mongo_mock, shared_collection=True)
+
+    first_handler.save_entry(data_single_filter_logical_company_code)
+    second_handler.save_entry(data_three_filter_logicals_company_code)
+    assert (first_handler.total_entries(), first_handler.total_score()) == (2, 11)
+
+    # the worst entry was saved by the other handler
+    second_handler.delete_worst_entries(1)
+    for handler in (first_handler, second_handler):
+        population_score = handler.population_score()
+        assert (population_score.count, population_score.minimum, population_score.maximum) == (1, 10, 10)
+
+
+def test_database_insert_same_hash(data_single_filter_logical_company_code, data_single_filter_logical_company_code_error):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock)
+    data_single_filter_logical_company_code['hash'] = 'f5d1b3c8'
+    data_single_filter_logical_company_code_error['hash'] = 'f5d1b3c8'
+
+    assert mongo_handler.save_entry(data_single_filter_logical_company_code)
+    assert not mongo_handler.save_entry(data_single_filter_logical_company_code_error)
+    assert not mongo_handler.save_entry(data_single_filter_logical_company_code)
+
+    assert mongo_mock.collection.find().count() == 1
+    assert mongo_handler.rejected_duplicates == 2
+    assert mongo_handler.total_score() == 1
+
+
+def test_database_buffered_writes(data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                  data_search_output_set_error):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+    mongo_handler.save_entry(data_three_filter_logicals_company_code)
+    mongo_handler.save_entry(data_search_output_set_error)
+    assert mongo_mock.collection.find().count() == 0
+    assert mongo_handler.find_entry(ObjectId("5c61a1295f627d1db904dd39"))
+
+    assert mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39")) == 1
+    mongo_handler.flush()
+    assert mongo_mock.collection.find().count() == 2
+
+    mongo_handler.delete_worst_entries(1)
+    assert mongo_mock.collection.find().count() == 2
+    assert mongo_handler.total_entries() == 1
+    assert mongo_mock.collection.find().count() == 1
+    assert mongo_handler.total_score() == 100
+
+
+def test_database_buffered_delete_of_missing_entry(data_single_filter_logical_company_code,
+                                                   data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_mock.collection.insert_many([data_single_filter_logical_company_code, data_three_filter_logicals_company_code])
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+
+    assert mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd40")) == 1
+    mongo_handler.flush()
+
+    assert [query['score'] for query in mongo_mock.collection.find()] == [10]
+    assert mongo_handler.total_score() == 10
+
+
+def test_database_buffered_duplicates(data_single_filter_logical_company_code, data_single_filter_logical_company_code_error):
+    mongo_mock = MongoDBMock()
+    data_single_filter_logical_company_code['hash'] = 'f5d1b3c8'
+    mongo_mock.collection.insert_one(data_single_filter_logical_company_code)
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+    data_single_filter_logical_company_code_error['hash'] = 'f5d1b3c8'
+
+    mongo_handler.save_entry(data_single_filter_logical_company_code_error)
+    mongo_handler.flush()
+
+    assert mongo_handler.rejected_duplicates == 1
+    assert mongo_handler.total_score() == 1
+
+
+def test_database_flush_all(data_single_filter_logical_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+
+    flush_all()
+
+    assert mongo_mock.collection.find().count() == 1
+
+
+def test_database_buffer_is_restored_after_failed_write(data_single_filter_logical_company_code,
+                                                       data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_mock.collection.insert_one(data_three_filter_logicals_company_code)
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+    bulk_write = mongo_mock.collection.bulk_write
+
+    def failing_bulk_write(requests, **kwargs):
+        raise errors.AutoReconnect('connection lost')
+
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+    mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd37"))
+    mongo_mock.collection.bulk_write = failing_bulk_write
+    with pytest.raises(errors.AutoReconnect):
+        mongo_handler.flush()
+    mongo_mock.collection.bulk_write = bulk_write
+    mongo_handler.flush()
+
+    assert [query['score'] for query in mongo_mock.collection.find()] == [1]
+    assert mongo_handler.total_score() == 1
+
+
+def test_database_failed_requests_of_bulk_are_restored(data_single_filter_logical_company_code,
+                                                       data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+    bulk_write = mongo_mock.collection.bulk_write
+
+    def partially_failing_bulk_write(requests, **kwargs):
+        bulk_write(requests[:1], **kwargs)
+        raise errors.BulkWriteError({'writeErrors': [{'index': 1, 'code': 91, 'errmsg': 'shutting down'}]})
+
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+    mongo_handler.save_entry(data_three_filter_logicals_company_code)
+    mongo_mock.collection.bulk_write = partially_failing_bulk_write
+    with pytest.raises(errors.BulkWriteError):
+        mongo_handler.flush()
+    assert mongo_mock.collection.count_documents({}) == 1
+    mongo_mock.collection.bulk_write = bulk_write
+    mongo_handler.flush()
+
+    assert mongo_mock.collection.count_documents({}) == 2
+    assert mongo_handler.rejected_duplicates == 0
+    assert mongo_handler.total_score() == 11
+
+
+def test_database_buffer_is_flushed_after_interval(data_single_filter_logical_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=0.01)
+    mongo_handler.save_entry(data_single_filter_logical_company_code)
+    assert isinstance(mongo_handler._scheduled_flush, gevent.Greenlet)
+    assert mongo_mock.collection.count_documents({}) == 0
+
+    gevent.sleep(0.05)
+
+    assert mongo_mock.collection.count_documents({}) == 1
+
+
+def test_database_buffer_is_flushed_in_event_loop(data_single_filter_logical_company_code):
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=0.01)
+
+    async def save_and_wait():
+        mongo_handler.save_entry(data_single_filter_logical_company_code)
+        assert isinstance(mongo_handler._scheduled_flush, asyncio.TimerHandle)
+        assert mongo_mock.collection.count_documents({}) == 0
+        await asyncio.sleep(0.05)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(save_and_wait())
+    loop.close()
+
+    assert mongo_mock.collection.count_documents({}) == 1
+
+
+def test_database_is_duplicate(data_single_filter_logical_company_code, data_single_filter_logical_company_code_error,
+                               data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    data_single_filter_logical_company_code['hash'] = 'f5d1b3c8'
+    mongo_mock.collection.insert_one(data_single_filter_logical_company_code)
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+    mongo_handler.save_entry(data_three_filter_logicals_company_code)
+    data_single_filter_logical_company_code_error['hash'] = 'f5d1b3c8'
+
+    assert mongo_handler.is_duplicate(data_single_filter_logical_company_code_error)
+    assert mongo_handler.is_duplicate(data_three_filter_logicals_company_code)
+    data_single_filter_logical_company_code_error['hash'] = 'a1b2c3d4'
+    assert not mongo_handler.is_duplicate(data_single_filter_logical_company_code_error)
+
+
+def test_database_indexes_created():
+    mongo_mock = MongoDBMock()
+    mongo_handler = MongoDBHandler(mongo_mock)
+    mongo_handler.delete_collection()
+
+    index_keys = [index['key'] for index in mongo_mock.collection.index_information().values()]
+
+    assert [('score', 1)] in index_keys
+    assert [('entity_set', 1), ('score', -1)] in index_keys
+    assert [('entity_set', 1), ('http', 1), ('score', -1)] in index_keys
+
+
+def test_database_delete_worst_entries_buffered(data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                                data_search_output_set_error, data_search_output_set):
+    mongo_mock = MongoDBMock()
+    mongo_mock.collection.insert_many([data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                       data_search_output_set_error, data_search_output_set])
+    mongo_handler = MongoDBHandler(mongo_mock, write_buffer_size=10, flush_interval=3600)
+
+    mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd37"))
+    mongo_handler.delete_worst_entries(2)
+    mongo_handler.flush()
+
+    assert [query['score'] for query in mongo_mock.collection.find()] == [100]
+    assert mongo_handler.total_score() == 100
+
+
+def test_database_sample_filter_entry_by_parts_count(data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                                     data_search_output_set):
+    mongo_mock = MongoDBMock()
+    data_single_filter_logical_company_code['filter_parts_count'] = 2
+    data_three_filter_logicals_company_code['filter_parts_count'] = 4
+    data_search_output_set['filter_parts_count'] = 0
+    mongo_mock.collection.insert_many([data_single_filter_logical_company_code, data_three_filter_logicals_company_code,
+                                       data_search_output_set])
+    mongo_handler = MongoDBHandler(mongo_mock)
+
+    entry = mongo_handler.sample_filter_entry('C_CorrespondenceCompanyCodeVH', ObjectId("5c61a1295f627d1db904dd37"))
+    assert entry == data_single_filter_logical_company_code
+
+    entry = mongo_handler.sample_filter_entry('C_CorrespondenceOutputSet', None)
+    assert entry is None
+
+
+def test_database_score_cache():
+    score_cache = ScoreCache(2)
+    score_cache.put(1, 10)
+    score_cache.put(2, 0)
+    score_cache.get(1)
+    score_cache.put(3, 30)
+
+    assert (score_cache.get(1), score_cache.get(2), score_cache.get(3)) == (10, None, 30)
+
+
+def test_database_find_score_cached(data_single_filter_logical_company_code, data_three_filter_logicals_company_code):
+    mongo_mock = MongoDBMock()
+    data_single_filter_logical_company_code['filter_parts_count'] = 2
+    mongo_mock.collection.insert_many([data_single_filter_logical_company_code, data_three_filter_logicals_company_code])
+    mongo_handler = MongoDBHandler(mongo_mock)
+
+    mongo_handler.sample_filter_entry('C_CorrespondenceCompanyCodeVH', None)
+    mongo_mock.collection.delete_many({})
+    assert mongo_handler.find_score(ObjectId("5c61a1295f627d1db904dd39")) == 1
+    assert mongo_handler.find_score(ObjectId("5c61a1295f627d1db904dd37")) is None
+
+    mongo_handler.delete_entry(ObjectId("5c61a1295f627d1db904dd39"))
+    assert mongo_handler.find_score(ObjectId("5c61a1295f627d1db904dd39")) is None
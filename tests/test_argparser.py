@@ -67,3 +67,59 @@ def test_help_with_other_arguments(argparser):
 def test_help_only_argument(argparser):
     with pytest.raises(SystemExit):
         argparser.parse(['--help'])
+
+
+def test_default_database(argparser):
+    parsed_arguments = argparser.parse(['https://www.odata.org'])
+    assert parsed_arguments.database == 'mongodb'
+    assert not parsed_arguments.snapshot
+
+
+def test_memory_database_with_snapshot(argparser):
+    parsed_arguments = argparser.parse(['https://www.odata.org', '-d', 'memory', '--snapshot', 'population.json'])
+    assert parsed_arguments.database == 'memory'
+    assert parsed_arguments.snapshot == 'population.json'
+
+
+def test_snapshot_without_memory_database(argparser):
+    with pytest.raises(ArgParserError):
+        argparser.parse(['https://www.odata.org', '--snapshot', 'population.json'])
+
+
+def test_workers(argparser):
+    assert argparser.parse(['https://www.odata.org']).workers == 1
+    assert argparser.parse(['https://www.odata.org', '--workers', '16']).workers == 16
+
+
+def test_invalid_number_of_workers(argparser):
+    with pytest.raises(ArgParserError):
+        argparser.parse(['https://www.odata.org', '-w', '0'])
+
+
+def test_workers_with_memory_database(argparser):
+    with pytest.raises(ArgParserError):
+        argparser.parse(['https://www.odata.org', '-d', 'memory', '-w', '2'])
+
+
+def test_rate_arguments(argparser):
+    parsed_arguments = argparser.parse(
+        ['https://www.odata.org/', '--rate', '20', '--burst', '5', '--entity-set-rate', 'Customers=2.5',
+         '--entity-set-rate', 'Orders=1'])
+
+    assert parsed_arguments.rate == 20
+    assert parsed_arguments.burst == 5
+    assert parsed_arguments.entity_set_rates == {'Customers': 2.5, 'Orders': 1}
+
+
+def test_default_rate_is_unlimited(argparser):
+    parsed_arguments = argparser.parse(['https://www.odata.org'])
+
+    assert parsed_arguments.rate is None
+    assert parsed_arguments.entity_set_rates == {}
+
+
+def test_invalid_entity_set_rate(argparser):
+    with pytest.raises(ArgParserError):
+        argparser.parse(['https://www.odata.org/', '--entity-set-rate', 'Customers'])
+    with pytest.raises(ArgParserError):
+        argparser.parse(['https://www.odata.org/', '--entity-set-rate', 'Customers=0'])
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+
+from collections import namedtuple
+
+from odfuzz.config import Config
+from odfuzz.exceptions import DispatcherError
+from odfuzz.fuzzer import AsyncDispatcher
+
+web = pytest.importorskip('aiohttp.web')
+
+Arguments = namedtuple('Arguments', 'service credentials')
+
+
+async def entity_set(request):
+    if request.query.get('$top') == 'slow':
+        await asyncio.sleep(1)
+    return web.json_response({'d': {'results': [{'Key': request.headers['Authorization']}]}})
+
+
+async def serve_and_request(*queries, **kwargs):
+    application = web.Application()
+    application.router.add_get('/service/EntitySet', entity_set)
+    runner = web.AppRunner(application)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    dispatcher = AsyncDispatcher(Arguments('http://127.0.0.1:{}/service'.format(port), 'user:password'))
+    try:
+        return await asyncio.gather(*[dispatcher.get(query, **kwargs) for query in queries], return_exceptions=True)
+    finally:
+        await dispatcher.close()
+        await runner.cleanup()
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_responses_have_attributes_of_requests_responses():
+    Config.init()
+    response, = run(serve_and_request('EntitySet?$top=1'))
+
+    assert response.status_code == 200
+    assert response.headers.get('content-length')
+    assert response.json()['d']['results'][0]['Key'].startswith('Basic ')
+    assert response.request.url.endswith('/service/EntitySet?$top=1')
+    assert response.elapsed.total_seconds() > 0
+
+
+def test_timeout_is_raised_as_dispatcher_error():
+    Config.init()
+    fast, slow = run(serve_and_request('EntitySet?$top=1', 'EntitySet?$top=slow', timeout=0.5))
+
+    assert fast.status_code == 200
+    assert isinstance(slow, DispatcherError)
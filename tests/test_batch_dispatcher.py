@@ -0,0 +1,144 @@
+import gevent
+import pytest
+
+from collections import namedtuple
+from datetime import timedelta
+
+from odfuzz.config import Config
+from odfuzz.exceptions import DispatcherTransientError
+from odfuzz.fuzzer import BatchDispatcher, ConcurrencyLimiter, FitnessEvaluator
+
+FakeResponse = namedtuple('FakeResponse', 'status_code headers content elapsed')
+
+BATCH_RESPONSE = (
+    b'--batchresponse_1\r\n'
+    b'Content-Type: application/http\r\n'
+    b'Content-Transfer-Encoding: binary\r\n'
+    b'\r\n'
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: application/json; charset=utf-8\r\n'
+    b'Content-Length: 14\r\n'
+    b'\r\n'
+    b'{"d": {"a": 1}}\r\n'
+    b'--batchresponse_1\r\n'
+    b'Content-Type: application/http\r\n'
+    b'Content-Transfer-Encoding: binary\r\n'
+    b'\r\n'
+    b'HTTP/1.1 500 Internal Server Error\r\n'
+    b'Content-Type: application/json\r\n'
+    b'\r\n'
+    b'{"error": {"code": "X", "message": {"value": "Y"}}}\r\n'
+    b'--batchresponse_1--\r\n')
+
+
+class FakeDispatcher:
+    service = 'https://example.com/sap/opu/odata/EXAMPLE_SRV/'
+
+    def __init__(self, batch_status_code=202, batch_response=BATCH_RESPONSE, rate_limiter=None):
+        self.batch_status_code = batch_status_code
+        self.batch_response = batch_response
+        self.rate_limiter = rate_limiter
+        self.requests = []
+        self.bodies = []
+
+    def send(self, method, query, **kwargs):
+        return getattr(self, method.lower())(query, **kwargs)
+
+    def get(self, query, **kwargs):
+        self.requests.append(('GET', query))
+        return FakeResponse(200, {'x-csrf-token': 'token'}, b'{}', timedelta(seconds=0.1))
+
+    def post(self, query, **kwargs):
+        self.requests.append(('POST', query))
+        self.bodies.append(kwargs['data'])
+        assert kwargs['headers']['X-CSRF-Token'] == 'token'
+        headers = {'content-type': 'multipart/mixed; boundary=batchresponse_1'}
+        return FakeResponse(self.batch_status_code, headers, self.batch_response, timedelta(seconds=0.5))
+
+
+class FakeRateLimiter:
+    def __init__(self):
+        self.reserved = []
+
+    def reserve(self, query):
+        self.reserved.append(query)
+        return 0
+
+
+def get_concurrently(dispatcher, queries):
+    greenlets = [gevent.spawn(dispatcher.get, query) for query in queries]
+    gevent.joinall(greenlets, raise_error=True)
+    return [greenlet.value for greenlet in greenlets]
+
+
+def test_queries_are_packed_and_unpacked():
+    Config.init()
+    fake_dispatcher = FakeDispatcher()
+    ok, error = get_concurrently(BatchDispatcher(fake_dispatcher, 2), ['Set?$top=1', 'Set?$filter=A eq 1'])
+
+    assert fake_dispatcher.requests == [('GET', ''), ('POST', '$batch?sap-client=500')]
+    assert b'GET Set?$filter=A%20eq%201 HTTP/1.1' in fake_dispatcher.bodies[0]
+    assert ok.status_code == 200
+    assert ok.json() == {'d': {'a': 1}}
+    assert ok.headers['content-length'] == '14'
+    assert ok.request.url == fake_dispatcher.service + 'Set?$top=1'
+    assert ok.elapsed.total_seconds() == 0.5
+    assert error.status_code == 500
+    assert error.json()['error']['code'] == 'X'
+
+
+def test_incomplete_batch_is_sent_after_linger():
+    Config.init()
+    fake_dispatcher = FakeDispatcher()
+    get_concurrently(BatchDispatcher(fake_dispatcher, 10), ['Set?$top=1', 'Set?$top=2'])
+
+    assert fake_dispatcher.requests.count(('POST', '$batch?sap-client=500')) == 1
+
+
+def test_rejected_batch_falls_back_to_single_requests():
+    Config.init()
+    fake_dispatcher = FakeDispatcher(batch_status_code=405)
+    dispatcher = BatchDispatcher(fake_dispatcher, 2)
+    get_concurrently(dispatcher, ['Set?$top=1', 'Set?$top=2'])
+    get_concurrently(dispatcher, ['Set?$top=3', 'Set?$top=4'])
+
+    assert fake_dispatcher.requests.count(('POST', '$batch?sap-client=500')) == 1
+    assert sorted(query for method, query in fake_dispatcher.requests if method == 'GET') == \
+        ['', 'Set?$top=1', 'Set?$top=2', 'Set?$top=3', 'Set?$top=4']
+
+
+def test_overloaded_batch_raises_transient_error():
+    Config.init()
+    with pytest.raises(DispatcherTransientError):
+        get_concurrently(BatchDispatcher(FakeDispatcher(batch_status_code=503), 1), ['Set?$top=1'])
+
+
+def test_every_packed_query_takes_rate_token():
+    Config.init()
+    rate_limiter = FakeRateLimiter()
+    fake_dispatcher = FakeDispatcher(rate_limiter=rate_limiter)
+    get_concurrently(BatchDispatcher(fake_dispatcher, 2), ['Set?$top=1', 'Set?$top=2'])
+
+    assert rate_limiter.reserved == ['Set?$top=1', 'Set?$top=2']
+
+
+def test_batched_timings_are_ignored():
+    Config.init()
+    ok, _ = get_concurrently(BatchDispatcher(FakeDispatcher(), 2), ['Set?$top=1', 'Set?$top=2'])
+    limiter = ConcurrencyLimiter(10, 1, 20)
+    limiter.record_response(ok)
+
+    assert ok.batched
+    assert FitnessEvaluator.eval_http_response_time(ok) == 0
+    assert limiter._latency is None
+
+
+def test_malformed_batch_response_falls_back_to_single_requests():
+    Config.init()
+    malformed_part = b'--batchresponse_1\r\nContent-Type: application/http\r\n\r\nHTTP/1.1 OK\r\n\r\n'
+    fake_dispatcher = FakeDispatcher(batch_response=malformed_part * 2 + b'--batchresponse_1--\r\n')
+    responses = get_concurrently(BatchDispatcher(fake_dispatcher, 2), ['Set?$top=1', 'Set?$top=2'])
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert [query for method, query in fake_dispatcher.requests if method == 'GET'] == \
+        ['', 'Set?$top=1', 'Set?$top=2']
@@ -0,0 +1,100 @@
+import pytest
+
+from collections import namedtuple
+
+from odfuzz.cache import DataModelCache, MetadataCache, ProbeCache
+from odfuzz.config import Config
+from odfuzz.constants import ENV_CACHE_DIR, PROBE_COUNT, PROBE_ENTITY_SET
+from odfuzz.entities import DirectBuilder, DispatchedBuilder
+from odfuzz.restrictions import RestrictionsGroup
+
+FakeResponse = namedtuple('FakeResponse', 'status_code text content headers')
+
+SERVICE = 'https://example.com/sap/opu/odata/EXAMPLE_SRV/'
+
+
+class FakeDispatcher:
+    service = SERVICE
+
+    def __init__(self, metadata, etag):
+        self.metadata = metadata
+        self.etag = etag
+        self.metadata_requests = []
+
+    def get(self, query, **kwargs):
+        if not query.startswith('$metadata'):
+            return FakeResponse(200, '', b'', {})
+        headers = kwargs.get('headers', {})
+        self.metadata_requests.append(headers)
+        if headers.get('If-None-Match') == self.etag:
+            return FakeResponse(304, '', b'', {})
+        return FakeResponse(200, '', self.metadata, {'ETag': self.etag})
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(ENV_CACHE_DIR, str(tmp_path))
+    Config.init()
+    yield tmp_path
+    monkeypatch.delenv(ENV_CACHE_DIR)
+    Config.init()
+
+
+def test_metadata_are_requested_conditionally(metadata, cache_dir):
+    metadata = metadata.encode('utf-8')
+    dispatcher = FakeDispatcher(metadata, '"v1"')
+    DispatchedBuilder(dispatcher, RestrictionsGroup(None), False).build()
+    assert dispatcher.metadata_requests == [{}]
+
+    dispatcher = FakeDispatcher(b'', '"v1"')
+    queryable = DispatchedBuilder(dispatcher, RestrictionsGroup(None), False).build()
+    assert dispatcher.metadata_requests == [{'If-None-Match': '"v1"'}]
+    assert {group.entity_set.name for group in queryable.all()} == {'MasterSet', 'DataSet'}
+
+    cache = MetadataCache(str(cache_dir), SERVICE + '?sap-client=' + Config.fuzzer.sap_client)
+    assert cache.load() == metadata
+
+
+def test_data_model_is_loaded_from_cache(metadata, cache_dir):
+    metadata = metadata.encode('utf-8')
+    first_queryable = DirectBuilder(metadata, RestrictionsGroup(None)).build()
+
+    data_model = DataModelCache(str(cache_dir)).load(metadata)
+    assert [entity_set.name for entity_set in data_model.entity_sets] == ['MasterSet', 'DataSet']
+    assert not hasattr(data_model.entity_set('MasterSet').entity_type.proprty('Key'), 'generate')
+
+    second_queryable = DirectBuilder(metadata, RestrictionsGroup(None)).build()
+    assert len(second_queryable.all()) == len(first_queryable.all())
+    assert DataModelCache(str(cache_dir)).load(b'<edmx:Edmx/>') is None
+
+
+def test_data_model_too_deep_to_pickle_is_not_cached(metadata, cache_dir):
+    metadata = metadata.encode('utf-8')
+    nested = []
+    for _ in range(100000):
+        nested = [nested]
+
+    DataModelCache(str(cache_dir)).save(metadata, nested)
+
+    assert DataModelCache(str(cache_dir)).load(metadata) is None
+
+
+def test_pyodata_enumerations_are_not_changed(metadata, cache_dir):
+    from pyodata.v2 import model
+
+    DirectBuilder(metadata.encode('utf-8'), RestrictionsGroup(None)).build()
+
+    assert model.Typ.Kinds.__qualname__ == 'Kinds'
+
+
+def test_probe_caches_of_workers_are_merged(tmp_path):
+    first_worker = ProbeCache(str(tmp_path), SERVICE, b'metadata')
+    second_worker = ProbeCache(str(tmp_path), SERVICE, b'metadata')
+    first_worker.set('MasterSet', PROBE_ENTITY_SET, 501)
+    second_worker.set('DataSet', PROBE_COUNT, 42)
+    first_worker.save()
+    second_worker.save()
+
+    cache = ProbeCache(str(tmp_path), SERVICE, b'metadata')
+    assert cache.get('MasterSet', PROBE_ENTITY_SET) == 501
+    assert cache.get('DataSet', PROBE_COUNT) == 42
@@ -0,0 +1,84 @@
+import random
+
+from collections import namedtuple
+from datetime import timedelta
+
+from odfuzz.exceptions import DispatcherError, DispatcherTransientError
+from odfuzz.fuzzer import ConcurrencyLimiter
+
+FakeResponse = namedtuple('FakeResponse', 'status_code elapsed')
+
+
+def response(status_code=200, latency=0.1):
+    return FakeResponse(status_code, timedelta(seconds=latency))
+
+
+def test_limit_grows_by_about_one_per_limit_of_responses():
+    limiter = ConcurrencyLimiter(4, 1, 10)
+
+    for _ in range(4):
+        limiter.record_response(response())
+    assert limiter.limit == 4
+
+    limiter.record_response(response())
+    assert limiter.limit == 5
+
+
+def test_limit_stays_within_bounds():
+    limiter = ConcurrencyLimiter(4, 2, 5)
+
+    for _ in range(100):
+        limiter.record_response(response())
+    assert limiter.limit == 5
+
+    for _ in range(100):
+        limiter.record_exception(DispatcherTransientError('Timeout'))
+    assert limiter.limit == 2
+
+
+def test_limit_decreases_once_per_limit_of_overloaded_responses():
+    limiter = ConcurrencyLimiter(8, 1, 10)
+
+    limiter.record_response(response(503))
+    assert limiter.limit == 6
+
+    for _ in range(8):
+        limiter.record_response(response(429))
+    assert limiter.limit == 6
+
+    limiter.record_response(response(429))
+    assert limiter.limit == 4
+
+
+def test_limit_decreases_when_latency_grows():
+    limiter = ConcurrencyLimiter(8, 1, 10)
+
+    for _ in range(100):
+        limiter.record_response(response(latency=0.1))
+    assert limiter.limit == 10
+
+    for _ in range(10):
+        limiter.record_response(response(latency=2.0))
+    assert limiter.limit < 10
+
+
+def test_mixed_latencies_of_steady_service_do_not_decrease_limit():
+    limiter = ConcurrencyLimiter(10, 2, 50)
+    generator = random.Random(0)
+
+    for _ in range(5000):
+        if generator.random() < 0.3:
+            limiter.record_response(response(400, generator.uniform(0.02, 0.05)))
+        else:
+            limiter.record_response(response(200, generator.uniform(0.5, 3.0)))
+
+    assert limiter.limit == 50
+
+
+def test_fuzzed_errors_do_not_change_limit():
+    limiter = ConcurrencyLimiter(4, 1, 10)
+
+    limiter.record_response(response(500))
+    limiter.record_exception(DispatcherError('Invalid URL'))
+
+    assert limiter.limit == 4
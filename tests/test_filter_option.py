@@ -0,0 +1,89 @@
+from odfuzz.entities import FilterOption, FilterOptionBuilder, FilterOptionDeleter
+
+
+def grouped_filter_option():
+    """CompanyCode eq 'A' and (CityName eq 'B' or Currency eq 'C')"""
+    return {
+        'groups': [{'id': 'group', 'logicals': ['inner'], 'left_id': 'outer'}],
+        'logicals': [
+            {'id': 'outer', 'name': 'and', 'left_id': 'first', 'right_id': 'group'},
+            {'id': 'inner', 'name': 'or', 'left_id': 'second', 'right_id': 'third', 'group_id': 'group'}
+        ],
+        'parts': [
+            {'id': 'first', 'name': 'CompanyCode', 'operator': 'eq', 'operand': "'A'", 'right_id': 'outer'},
+            {'id': 'second', 'name': 'CityName', 'operator': 'eq', 'operand': "'B'", 'right_id': 'inner'},
+            {'id': 'third', 'name': 'Currency', 'operator': 'eq', 'operand': "'C'", 'left_id': 'inner'}
+        ]
+    }
+
+
+def test_filter_option_lookups_follow_changes():
+    option_value = grouped_filter_option()
+    filter_option = FilterOption(option_value['logicals'], option_value['parts'], option_value['groups'])
+
+    assert filter_option.part_by_id('second') is option_value['parts'][1]
+    assert filter_option.group_by_id('group') is option_value['groups'][0]
+    assert filter_option.logical_by_id('missing') is None
+
+    filter_option.add_part()
+    added_part = filter_option.last_part
+    assert filter_option.part_by_id(added_part['id']) is added_part
+
+    replacing_part = {'id': 'replacing'}
+    filter_option.last_part = replacing_part
+    assert filter_option.part_by_id(added_part['id']) is None
+    assert filter_option.part_by_id('replacing') is replacing_part
+
+
+def test_filter_option_builder():
+    option_value = grouped_filter_option()
+    filter_option = FilterOption(option_value['logicals'], option_value['parts'], option_value['groups'])
+
+    assert FilterOptionBuilder(filter_option).build() == "CompanyCode eq 'A' and (CityName eq 'B' or Currency eq 'C')"
+
+
+def test_filter_option_deleter_removes_group():
+    option_value = grouped_filter_option()
+    logical = option_value['logicals'].pop(0)
+
+    FilterOptionDeleter(option_value, logical).remove_adjacent('right_id')
+
+    assert option_value == {
+        'groups': [],
+        'logicals': [],
+        'parts': [{'id': 'first', 'name': 'CompanyCode', 'operator': 'eq', 'operand': "'A'"}]
+    }
+
+
+def test_filter_option_deleter_removes_part_in_group():
+    option_value = grouped_filter_option()
+    logical = option_value['logicals'].pop(1)
+
+    FilterOptionDeleter(option_value, logical).remove_adjacent('left_id')
+    filter_option = FilterOption(option_value['logicals'], option_value['parts'], option_value['groups'])
+
+    assert [part['id'] for part in option_value['parts']] == ['first', 'third']
+    assert option_value['groups'] == []
+    assert FilterOptionBuilder(filter_option).build() == "CompanyCode eq 'A' and Currency eq 'C'"
+
+
+def test_filter_option_sequential_ids():
+    filter_option = FilterOption([], [], [])
+    filter_option.add_part()
+    filter_option.add_logical()
+    filter_option.add_group()
+
+    assert [filter_option.last_part['id'], filter_option.last_logical['id'], filter_option.last_group['id']] == [1, 2, 3]
+
+
+def test_filter_option_ids_continue_after_existing_ids():
+    legacy_option_value = grouped_filter_option()
+    legacy_option = FilterOption(legacy_option_value['logicals'], legacy_option_value['parts'],
+                                 legacy_option_value['groups'])
+    legacy_option.add_part()
+    assert legacy_option.last_part['id'] == 1
+    assert legacy_option.part_by_id('first')['name'] == 'CompanyCode'
+
+    filter_option = FilterOption([{'id': 2}], [{'id': 1}, {'id': 3}], [])
+    filter_option.add_part()
+    assert filter_option.last_part['id'] == 4
@@ -0,0 +1,57 @@
+import sys
+
+from bson import ObjectId
+
+from odfuzz.config import Config
+from odfuzz.databases import InMemoryDBHandler, MemoryDB
+from odfuzz.fuzzer import Fuzzer, EmptyOffspring, BetterOffspring
+
+
+class FakeQuery:
+    def __init__(self, url_hash, score, predecessors=()):
+        self.dictionary = {'_id': ObjectId(), 'hash': url_hash, 'score': score, 'entity_set': 'DataSet',
+                           'predecessors': list(predecessors), 'http': '500'}
+
+
+class FakeAnalyzer:
+    def __init__(self, offspring):
+        self.offspring = offspring
+
+    def analyze(self, query):
+        return self.offspring
+
+
+class NullLogger:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def create_fuzzer(database):
+    Config.init()
+    stderr = sys.stderr
+    try:
+        fuzzer = Fuzzer(object(), None, database, NullLogger(), False, False)
+    finally:
+        sys.stderr = stderr
+    fuzzer._urls_logger = fuzzer._stats_logger = NullLogger()
+    return fuzzer
+
+
+def test_rejected_duplicates_do_not_shrink_population():
+    database = InMemoryDBHandler(MemoryDB(str(ObjectId())))
+    parent = FakeQuery('parent', 1)
+    for query in [parent, FakeQuery('first', 2), FakeQuery('second', 3)]:
+        database.save_entry(query.dictionary)
+    fuzzer = create_fuzzer(database)
+
+    fuzzer._analyzer = FakeAnalyzer(EmptyOffspring(database))
+    fuzzer._settle_generated_query(FakeQuery('first', 10))
+    fuzzer._analyzer = FakeAnalyzer(BetterOffspring(database, parent.dictionary['_id']))
+    fuzzer._settle_crossed_query(FakeQuery('second', 10, [parent.dictionary['_id']]))
+
+    assert database.total_entries() == 3
+    assert database.rejected_duplicates == 2
+    assert database.find_entry(parent.dictionary['_id'])
+
+    fuzzer._settle_generated_query(FakeQuery('third', 10))
+    assert database.total_entries() == 3
@@ -1,8 +1,14 @@
+import re
+import asyncio
+import uuid
 import random
 
 from collections import namedtuple
 
-from odfuzz.generators import EdmDouble, EdmString, RandomGenerator
+from odfuzz.config import Config
+from odfuzz.constants import HEX_BINARY, ENV_DISPATCHER
+from odfuzz.generators import EdmBinary, EdmDouble, EdmGuid, EdmString, RandomGenerator, ValuePools, \
+    random_characters
 from odfuzz.encoders import encode_string
 
 StringPropertyMock = namedtuple('StringPropertyMock', 'max_length')
@@ -42,3 +48,66 @@ def test_double_generator_without_encoder():
     generated_double = EdmDouble.generate()
 
     assert generated_double == '1.2712595986497026e+39d'
+
+
+def test_random_characters():
+    random.seed(14)
+    characters = random_characters(HEX_BINARY, 1000)
+
+    assert len(characters) == 1000
+    assert set(characters) == set(HEX_BINARY)
+
+
+def test_pooled_values():
+    RandomGenerator._encode = lambda x: x
+
+    random.seed(14)
+    strings = RandomGenerator.random_strings(10, 100)
+    assert len(strings) == 100
+    assert all(len(string) <= 10 for string in strings)
+
+    guids = EdmGuid.generate_values(10)
+    assert all(uuid.UUID(guid[5:-1]).version == 4 for guid in guids)
+
+    binaries = EdmBinary.generate_values(10)
+    assert all(re.fullmatch('(X|binary)\'([{0}]{{2}})+\''.format(HEX_BINARY), binary) for binary in binaries)
+
+
+def test_value_pools_refill():
+    generated = []
+
+    def generate_values(number):
+        generated.append(number)
+        return list(range(number))
+
+    value_pools = ValuePools(4)
+    popped = [value_pools.pop('key', generate_values) for _ in range(6)]
+
+    assert value_pools.enabled
+    assert not ValuePools(0).enabled
+    assert popped == [3, 2, 1, 0, 3, 2]
+    assert generated[0] == 4
+
+
+def test_value_pool_is_refilled_in_event_loop_with_asyncio_dispatcher(monkeypatch):
+    monkeypatch.setenv(ENV_DISPATCHER, 'asyncio')
+    Config.init()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    generated = []
+
+    def generate_values(number):
+        generated.append(number)
+        return list(range(number))
+
+    value_pools = ValuePools(8)
+    for _ in range(8):
+        value_pools.pop('key', generate_values)
+    assert generated == [8]
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    asyncio.set_event_loop(None)
+    monkeypatch.delenv(ENV_DISPATCHER)
+    Config.init()
+
+    assert generated == [8, 8]
@@ -30,10 +30,11 @@ def test_int_type_max_length_patch(master_entity_type):
 
 def test_string_property_generator_patch(master_entity_type, empty_restrictions):
     data_property = master_entity_type.proprty('Data')
-    generator = EdmString.generate.__get__(data_property, None)
+    monkey.patch_proprty_max_length(data_property)
 
     monkey.patch_proprty_generator('MasterEntity', data_property, empty_restrictions)
-    assert data_property.generate == generator
+    assert data_property.generate.__func__ == EdmString.generate
+    assert data_property.generate.__self__.max_length == data_property.max_length
 
 
 def test_num_property_generator_patch(master_entity_type, empty_restrictions):
@@ -78,3 +79,15 @@ def test_interval_property_operator_patch(master_entity_type):
         operators_names2 = set(key for key, value in interval_value_property.operators.get_all())
     assert sorted((operators_names1, operators_names2), key=len) == sorted(
         ({'eq'}, {'ge', 'le'}), key=len)
+
+
+def test_properties_share_bundles(master_entity_type, empty_restrictions):
+    data_property = master_entity_type.proprty('Data')
+    data_type_property = master_entity_type.proprty('DataType')
+    key_property = master_entity_type.proprty('Key')
+    monkey.patch_proprties('MasterEntity', [data_property, data_type_property, key_property], empty_restrictions)
+
+    assert data_property.generate is data_type_property.generate
+    assert data_property.operators is data_type_property.operators
+    assert key_property.generate is not data_property.generate
+    assert key_property.generate.__self__.max_length == 5
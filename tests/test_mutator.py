@@ -3,8 +3,12 @@ import re
 
 from collections import namedtuple
 
-from odfuzz.mutators import DateTimeMutator, DecimalMutator, GuidMutator, StringMutator
+import pytest
+
+from odfuzz.mutators import BooleanMutator, DateTimeMutator, DecimalMutator, GuidMutator, Mutator, NumberMutator, \
+    StringMutator, RandomScheduler, UCBScheduler, mutation_scheduler, set_mutation_scheduler
 from odfuzz.encoders import encode_string
+from odfuzz.exceptions import ODfuzzException
 
 DateTimeProperty = namedtuple('DateTimeProperty', 'precision')
 DateTimePropertyMock = namedtuple('DateTimePropertyMock', 'precision scale')
@@ -100,12 +104,21 @@ def test_guid_mutator():
     guid = 'guid\'dddddddd-dddd-dddd-dddd-dddddddddddd\''
 
     random.seed(14)
-    mutated_guid = GuidMutator.replace_char(guid)
+    mutated_guid = GuidMutator.replace_char(None, guid)
 
     assert guid != mutated_guid
     assert re.match(f"guid'{guid_regex}'", mutated_guid)
 
 
+def test_guid_and_boolean_mutators_use_scheduler():
+    scheduler = set_mutation_scheduler('random')
+    with scheduler.recording() as recorded:
+        GuidMutator._mutate(None, 'guid\'dddddddd-dddd-dddd-dddd-dddddddddddd\'')
+        assert BooleanMutator._mutate(None, 'true') == 'false'
+
+    assert recorded == [('GuidMutator', 'replace_char'), ('BooleanMutator', 'flip_value')]
+
+
 def test_string_mutator_with_encoder():
     string = '\'12345+\''
     StringMutator._encode = encode_string
@@ -135,3 +148,46 @@ class GeneratorMock:
 
     def randint(self, frm, to):
         return next(self._randint)
+
+
+def test_mutators_register_own_operators():
+    assert [operator.__name__ for operator in NumberMutator._operators] == \
+        ['increment_value', 'decrement_value', 'add_digit', 'delete_digit']
+    assert [operator.__name__ for operator in DecimalMutator._operators] == ['replace_digit', 'shift_value']
+    assert '_mutate_date' not in [operator.__name__ for operator in DateTimeMutator._operators]
+    assert Mutator._operators == ()
+
+
+def test_scheduler_records_selected_operators():
+    scheduler = RandomScheduler()
+    scheduler.select(NumberMutator)
+    with scheduler.recording() as selected:
+        operator = scheduler.select(NumberMutator)
+    scheduler.select(NumberMutator)
+
+    assert selected == [('NumberMutator', operator.__name__)]
+    assert sum(stats.selections for stats in scheduler.stats.values()) == 3
+
+
+def test_ucb_scheduler_prefers_improving_operators():
+    random.seed(14)
+    scheduler = UCBScheduler()
+    tried = {scheduler.select(DecimalMutator).__name__ for _ in range(2)}
+    assert tried == {'replace_digit', 'shift_value'}
+
+    for _ in range(50):
+        operator = scheduler.select(DecimalMutator)
+        scheduler.credit([('DecimalMutator', operator.__name__)], 10, operator.__name__ == 'shift_value')
+
+    assert scheduler.stats[('DecimalMutator', 'shift_value')].selections > 40
+    assert scheduler.stats[('DecimalMutator', 'shift_value')].average_score == 10
+
+
+def test_set_mutation_scheduler():
+    try:
+        assert isinstance(set_mutation_scheduler('ucb'), UCBScheduler)
+        assert isinstance(mutation_scheduler(), UCBScheduler)
+        with pytest.raises(ODfuzzException):
+            set_mutation_scheduler('unknown')
+    finally:
+        set_mutation_scheduler('random')
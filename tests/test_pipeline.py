@@ -0,0 +1,128 @@
+import time
+import asyncio
+import gevent
+import pytest
+
+from odfuzz.fuzzer import Pipeline, AsyncPipeline, ConcurrencyLimiter
+
+
+def test_all_queries_are_dispatched_and_settled():
+    dispatched = []
+    settled = []
+
+    def send(query):
+        dispatched.append(query)
+        return True
+
+    pipeline = Pipeline(send, 3)
+    pipeline.start()
+    pipeline.put(list(range(10)), settled.append)
+    pipeline.join()
+    pipeline.stop()
+
+    assert sorted(dispatched) == list(range(10))
+    assert sorted(settled) == list(range(10))
+
+
+def test_slow_query_does_not_block_other_queries():
+    settled = []
+
+    def send(query):
+        gevent.sleep(0.2 if query == 'slow' else 0)
+        return True
+
+    pipeline = Pipeline(send, 2)
+    pipeline.start()
+    pipeline.put(['slow', 'fast1', 'fast2', 'fast3'], settled.append)
+    pipeline.join()
+    pipeline.stop()
+
+    assert settled == ['fast1', 'fast2', 'fast3', 'slow']
+
+
+def test_stage_exception_is_raised_in_caller():
+    def settle(query):
+        raise ValueError(query)
+
+    pipeline = Pipeline(lambda query: True, 1)
+    pipeline.start()
+    with pytest.raises(ValueError):
+        pipeline.put(['query'], settle)
+        pipeline.join()
+    pipeline.stop()
+
+
+def test_async_slow_query_does_not_block_other_queries():
+    settled = []
+
+    async def send(query):
+        await asyncio.sleep(0.2 if query == 'slow' else 0)
+        return True
+
+    pipeline = AsyncPipeline(send, 2)
+    pipeline.start()
+    pipeline.put(['slow', 'fast1', 'fast2', 'fast3'], settled.append)
+    pipeline.join()
+    pipeline.stop()
+
+    assert settled == ['fast1', 'fast2', 'fast3', 'slow']
+
+
+def test_async_stage_exception_is_raised_in_caller():
+    async def send(query):
+        raise ValueError(query)
+
+    pipeline = AsyncPipeline(send, 1)
+    pipeline.start()
+    with pytest.raises(ValueError):
+        pipeline.put(['query1', 'query2'], lambda query: None)
+        pipeline.join()
+    pipeline.stop()
+
+
+def test_given_up_queries_are_not_settled():
+    settled = []
+
+    def send(query):
+        return query != 'failed'
+
+    pipeline = Pipeline(send, 2)
+    pipeline.start()
+    pipeline.put(['query1', 'failed', 'query2'], settled.append)
+    pipeline.join()
+    pipeline.stop()
+
+    assert sorted(settled) == ['query1', 'query2']
+
+
+def test_limiter_bounds_requests_in_flight():
+    in_flight = []
+    max_in_flight = []
+
+    def send(query):
+        in_flight.append(query)
+        max_in_flight.append(len(in_flight))
+        gevent.sleep(0.01)
+        in_flight.remove(query)
+        return True
+
+    pipeline = Pipeline(send, 5, ConcurrencyLimiter(2, 1, 5))
+    pipeline.start()
+    pipeline.put(list(range(10)), lambda query: None)
+    pipeline.join()
+    pipeline.stop()
+
+    assert max(max_in_flight) == 2
+
+
+def test_async_deadline_raises_timeout_error():
+    async def send(query):
+        await asyncio.sleep(1)
+        return True
+
+    pipeline = AsyncPipeline(send, 1, deadline=time.monotonic() + 0.1)
+    pipeline.start()
+    with pytest.raises(asyncio.TimeoutError):
+        pipeline.put(['query1', 'query2', 'query3'], lambda query: None)
+        pipeline.join()
+    pipeline.stop()
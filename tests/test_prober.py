@@ -0,0 +1,126 @@
+import gevent
+import pytest
+
+from collections import namedtuple
+
+from odfuzz.cache import ProbeCache, NullProbeCache
+from odfuzz.config import Config
+from odfuzz.constants import ENV_CACHE_DIR, ENV_DISPATCHER, GLOBAL_ENTITY_SET, INT_MAX, PROBE_COUNT, PROBE_ENTITY_SET
+from odfuzz.entities import DispatchedBuilder, Prober
+from odfuzz.exceptions import DispatcherError
+from odfuzz.restrictions import RestrictionsGroup
+
+FakeResponse = namedtuple('FakeResponse', 'status_code text content headers')
+FakeEntitySet = namedtuple('FakeEntitySet', 'name topable')
+
+
+class FakeDispatcher:
+    service = 'https://example.com/sap/opu/odata/EXAMPLE_SRV/'
+
+    def __init__(self, metadata=b'', delay=0):
+        self.metadata = metadata
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, query, **kwargs):
+        self.requests.append(query)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        gevent.sleep(self.delay)
+        self.in_flight -= 1
+
+        if query.startswith('$metadata'):
+            return FakeResponse(200, '', self.metadata, {})
+        if query.startswith('DataSet/$count'):
+            return FakeResponse(200, '42', b'42', {})
+        if query.startswith('MasterSet/$count'):
+            raise DispatcherError('Connection refused')
+        if query.startswith('MasterSet?'):
+            return FakeResponse(501, '', b'', {})
+        return FakeResponse(200, '', b'', {})
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(ENV_CACHE_DIR, str(tmp_path))
+    Config.init()
+    yield tmp_path
+    monkeypatch.delenv(ENV_CACHE_DIR)
+    Config.init()
+
+
+def test_probes_are_sent_through_bounded_pool():
+    dispatcher = FakeDispatcher(delay=0.01)
+    entity_sets = [FakeEntitySet('Set{}'.format(number), True) for number in range(20)]
+    Config.init()
+
+    prober = Prober(dispatcher, NullProbeCache(), 4)
+    prober.probe(entity_sets, first_touch=False)
+
+    assert len(dispatcher.requests) == 20
+    assert dispatcher.max_in_flight == 4
+    assert prober.total_entities('Set0') == INT_MAX
+
+
+def test_probes_are_sent_from_threads_with_asyncio_dispatcher(monkeypatch):
+    dispatcher = FakeDispatcher(delay=0.05)
+    entity_sets = [FakeEntitySet('Set{}'.format(number), True) for number in range(8)]
+    monkeypatch.setenv(ENV_DISPATCHER, 'asyncio')
+    Config.init()
+
+    prober = Prober(dispatcher, NullProbeCache(), 4)
+    prober.probe(entity_sets, first_touch=False)
+    monkeypatch.delenv(ENV_DISPATCHER)
+    Config.init()
+
+    assert len(dispatcher.requests) == 8
+    assert 1 < dispatcher.max_in_flight <= 4
+
+
+def test_first_touch_results_are_cached_per_metadata(metadata, cache_dir):
+    dispatcher = FakeDispatcher(metadata.encode('utf-8'))
+    restrictions = RestrictionsGroup(None)
+    queryable = DispatchedBuilder(dispatcher, restrictions, True).build()
+
+    assert restrictions.get('$top').exclude[GLOBAL_ENTITY_SET] == ['MasterSet']
+    top_query = next(group.query_option('$top') for group in queryable.all() if group.entity_set.name == 'DataSet')
+    assert 42 in top_query._max_range_prob
+    assert len(dispatcher.requests) == 7
+
+    cache = ProbeCache(str(cache_dir), dispatcher.service + '?sap-client=' + Config.fuzzer.sap_client,
+                       metadata.encode('utf-8'))
+    assert cache.get('MasterSet', PROBE_ENTITY_SET) == 501
+    assert cache.get('DataSet', PROBE_COUNT) == 42
+    assert not cache.contains('MasterSet', PROBE_COUNT)
+
+    dispatcher = FakeDispatcher(metadata.encode('utf-8'))
+    DispatchedBuilder(dispatcher, RestrictionsGroup(None), True).build()
+    assert [query.split('?')[0] for query in dispatcher.requests] == ['$metadata', 'MasterSet/$count']
+
+    dispatcher = FakeDispatcher(metadata.replace('MasterEntity', 'MainEntity').encode('utf-8'))
+    DispatchedBuilder(dispatcher, RestrictionsGroup(None), True).build()
+    assert len(dispatcher.requests) == 7
+
+
+class FailingDispatcher(FakeDispatcher):
+    def get(self, query, **kwargs):
+        self.requests.append(query)
+        return FakeResponse(500, 'error', b'error', {})
+
+
+def test_transient_results_are_not_cached(cache_dir):
+    dispatcher = FailingDispatcher()
+    cache = ProbeCache(str(cache_dir), dispatcher.service, b'metadata')
+    prober = Prober(dispatcher, cache, 4)
+    prober.probe([FakeEntitySet('DataSet', True)], first_touch=False)
+    for entity_set_name, status_code in [('DataSet', 403), ('MasterSet', 503), ('ItemSet', 501)]:
+        prober._store_result(entity_set_name, PROBE_ENTITY_SET, lambda: status_code)
+
+    assert prober.total_entities('DataSet') == INT_MAX
+    assert prober.status_code('DataSet', PROBE_ENTITY_SET) == 403
+    assert not cache.contains('DataSet', PROBE_COUNT)
+    assert not cache.contains('DataSet', PROBE_ENTITY_SET)
+    assert not cache.contains('MasterSet', PROBE_ENTITY_SET)
+    assert cache.get('ItemSet', PROBE_ENTITY_SET) == 501
@@ -0,0 +1,71 @@
+from odfuzz.constants import GLOBAL_PROPRTY
+from odfuzz.entities import DirectBuilder, LazyQueryableEntities, LazyQueryGroup, Shard, SINGLE_SHARD, select_shard
+from odfuzz.restrictions import RestrictionsGroup
+
+
+def test_query_options_use_filtered_views(metadata):
+    queryable_entities = DirectBuilder(metadata.encode('utf-8'), RestrictionsGroup(None)).build()
+    query_group = next(group for group in queryable_entities.all() if group.entity_set.name == 'MasterSet')
+    entity_type = query_group.entity_set.entity_type
+
+    filter_entity_set = query_group.query_option('$filter').entity_set
+    filter_proprties = [proprty.name for proprty in filter_entity_set.entity_type.proprties()]
+    assert filter_entity_set.name == 'MasterSet'
+    assert 'Data' not in filter_proprties
+    assert 'FiscalYear' in filter_proprties
+    assert filter_entity_set.entity_type.proprty('FiscalYear') is not entity_type.proprty('FiscalYear')
+    assert filter_entity_set.entity_type.key_proprties == entity_type.key_proprties
+
+    assert 'Data' in [proprty.name for proprty in entity_type.proprties()]
+    assert not hasattr(entity_type.proprty('FiscalYear'), 'generate_remaining_proprties')
+
+
+def test_rebuilt_query_group_does_not_modify_restrictions(metadata):
+    queryable_entities = DirectBuilder(metadata.encode('utf-8'), RestrictionsGroup(None)).build()
+    query_group = next(group for group in queryable_entities.all() if group.entity_set.name == 'MasterSet')
+    exclude_restr = {'MasterSet': ['FiscalYear'], GLOBAL_PROPRTY: ['Data']}
+
+    for _ in range(2):
+        entity_set = query_group._delete_restricted_proprties(exclude_restr, 'filterable', [])
+        proprties = [proprty.name for proprty in entity_set.entity_type.proprties()]
+        assert 'FiscalYear' not in proprties and 'Data' not in proprties
+
+    assert exclude_restr == {'MasterSet': ['FiscalYear'], GLOBAL_PROPRTY: ['Data']}
+
+
+class FakeQueryGroup:
+    built = []
+
+    def __init__(self, query_group_data, query_options):
+        self.entity_set = query_group_data
+        self._query_options = query_options
+        FakeQueryGroup.built.append(query_group_data)
+
+    def query_options(self):
+        return self._query_options
+
+
+def test_query_groups_are_built_lazily_and_evicted():
+    FakeQueryGroup.built = []
+    queryable_entities = LazyQueryableEntities(2)
+    for name, query_options in (('A', ['$top']), ('B', []), ('C', ['$skip']), ('D', ['$top'])):
+        queryable_entities.add(LazyQueryGroup(FakeQueryGroup, name, query_options))
+    assert FakeQueryGroup.built == []
+
+    assert [query_group.entity_set for query_group in queryable_entities.all()] == ['A', 'C', 'D']
+    assert FakeQueryGroup.built == ['A', 'B', 'C', 'D']
+
+    assert [query_group.entity_set for query_group in queryable_entities.all()] == ['A', 'C', 'D']
+    assert FakeQueryGroup.built == ['A', 'B', 'C', 'D', 'A', 'C', 'D']
+
+    assert all(queryable_entities.random().entity_set in ('A', 'C', 'D') for _ in range(20))
+    assert 'B' not in FakeQueryGroup.built[4:]
+
+
+def test_entity_sets_are_dealt_to_shards():
+    entity_sets = ['Set{}'.format(index) for index in range(7)]
+    shards = [select_shard(entity_sets, Shard(index, 3)) for index in range(3)]
+
+    assert shards[0] == ['Set0', 'Set3', 'Set6']
+    assert sorted(sum(shards, [])) == entity_sets
+    assert select_shard(entity_sets, SINGLE_SHARD) == entity_sets
@@ -0,0 +1,59 @@
+import random
+import logging
+
+from copy import deepcopy
+
+from odfuzz.fuzzer import SingleQueryable, replace_filter_part, copy_filter
+
+
+def filter_option():
+    return {
+        'groups': [],
+        'logicals': [{'id': 'logical', 'name': 'and', 'left_id': 'left', 'right_id': 'right'}],
+        'parts': [
+            {'id': 'left', 'name': 'CompanyCode', 'operator': 'eq', 'operand': "'A'", 'right_id': 'logical'},
+            {'id': 'right', 'name': 'CityName', 'operator': 'eq', 'operand': "'B'", 'left_id': 'logical'}
+        ]
+    }
+
+
+def parent(name, operand):
+    option = filter_option()
+    option['parts'][1]['name'] = name
+    option['parts'][1]['operand'] = operand
+    return {'_id': name, 'order': ['_$filter'], '_$filter': option, '_$orderby': [['Currency', 'asc']],
+            'accessible_keys': {}, 'accessible_set': None}
+
+
+def test_replace_filter_part_shares_unchanged_nodes():
+    option = filter_option()
+    replaced = replace_filter_part(option, 1, {'id': 'right', 'name': 'Currency'})
+
+    assert option['parts'][1]['name'] == 'CityName'
+    assert replaced['parts'][1]['name'] == 'Currency'
+    assert replaced['parts'][0] is option['parts'][0]
+    assert replaced['logicals'] is option['logicals']
+
+
+def test_copy_filter_copies_all_nodes():
+    option = filter_option()
+    copied = copy_filter(option)
+
+    assert copied == option
+    assert all(copied_part is not part for copied_part, part in zip(copied['parts'], option['parts']))
+    assert copied['logicals'][0] is not option['logicals'][0]
+
+
+def test_crossover_does_not_modify_parents():
+    random.seed(14)
+    queryable = SingleQueryable(None, logging.getLogger(), 1)
+    query1, query2 = parent('Currency', "'C'"), parent('CityName', "'D'")
+    original1, original2 = deepcopy(query1), deepcopy(query2)
+
+    for _ in range(10):
+        offspring = queryable._crossover_filter([0, 1], query1, query2)
+        queryable._crossover_options(offspring, query2)
+        queryable._mutate_orderby_part(offspring['_$orderby'])
+
+    assert query1 == original1
+    assert query2 == original2
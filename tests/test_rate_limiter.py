@@ -0,0 +1,47 @@
+import time
+
+from collections import namedtuple
+
+import pytest
+
+from odfuzz.fuzzer import TokenBucket, RateLimiter
+
+Arguments = namedtuple('Arguments', 'rate burst entity_set_rates')
+
+
+def test_bucket_allows_burst_and_then_spaces_requests():
+    bucket = TokenBucket(10, 3)
+    now = time.monotonic()
+
+    delays = [bucket.reserve(now) for _ in range(5)]
+
+    assert delays[:3] == [0, 0, 0]
+    assert delays[3:] == pytest.approx([0.1, 0.2])
+
+
+def test_bucket_is_refilled_up_to_burst():
+    bucket = TokenBucket(10, 2)
+    now = time.monotonic()
+    bucket.reserve(now)
+    bucket.reserve(now)
+
+    assert bucket.reserve(now + 100) == 0
+    assert bucket.reserve(now + 100) == 0
+    assert bucket.reserve(now + 100) == pytest.approx(0.1)
+
+
+def test_entity_set_rate_limits_only_its_queries():
+    limiter = RateLimiter(None, 1, {'Customers': 1})
+
+    assert limiter.reserve('Customers?$top=1') == 0
+    assert limiter.reserve('Customers(CustomerID=\'1\')/Orders') > 0.9
+    assert limiter.reserve('Orders?$top=1') == 0
+
+
+def test_global_rate_is_split_among_workers():
+    assert RateLimiter.from_arguments(Arguments(None, 1, {}), 2) is None
+
+    limiter = RateLimiter.from_arguments(Arguments(10, 1, {}), 2)
+    limiter.reserve('$metadata')
+
+    assert limiter.reserve('$metadata') == pytest.approx(0.2, abs=0.01)
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+from odfuzz.constants import RETRY_BUDGET_RESERVE
+from odfuzz.exceptions import DispatcherError, DispatcherTransientError
+from odfuzz.fuzzer import RetryPolicy
+
+FakeResponse = namedtuple('FakeResponse', 'status_code headers')
+
+
+def test_only_transient_errors_and_overload_responses_are_retried():
+    policy = RetryPolicy(5, 1.0, 100.0, 0.1)
+
+    assert policy.retry_delay(1, error=DispatcherTransientError('Connection reset')) is not None
+    assert policy.retry_delay(1, error=DispatcherError('Invalid URL')) is None
+    assert policy.retry_delay(1, response=FakeResponse(503, {})) is not None
+    assert policy.retry_delay(1, response=FakeResponse(500, {})) is None
+
+
+def test_delays_grow_exponentially_up_to_maximum():
+    policy = RetryPolicy(20, 1.0, 4.0, 1.0)
+    error = DispatcherTransientError('Timeout')
+
+    for attempt in range(1, 20):
+        assert 0 <= policy.retry_delay(attempt, error=error) <= min(4.0, 2 ** (attempt - 1))
+    assert policy.retry_delay(20, error=error) is None
+
+
+def test_retry_after_header_is_respected():
+    policy = RetryPolicy(5, 1.0, 100.0, 0.1)
+
+    assert policy.retry_delay(1, response=FakeResponse(429, {'Retry-After': '30'})) == 30
+    assert policy.retry_delay(1, response=FakeResponse(429, {'Retry-After': '300'})) == 100.0
+
+
+def test_requests_are_given_up_when_budget_is_spent():
+    policy = RetryPolicy(5, 0.0, 0.0, 0.0)
+    error = DispatcherTransientError('Connection refused')
+
+    delays = [policy.retry_delay(1, error=error) for _ in range(RETRY_BUDGET_RESERVE + 1)]
+
+    assert delays[:RETRY_BUDGET_RESERVE] == [0.0] * RETRY_BUDGET_RESERVE
+    assert delays[-1] is None
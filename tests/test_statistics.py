@@ -0,0 +1,26 @@
+from odfuzz.mutators import OperatorStats, mutation_scheduler, set_mutation_scheduler
+from odfuzz.statistics import Stats, dump_stats, merge_stats
+
+
+def test_worker_stats_are_merged(tmp_path):
+    set_mutation_scheduler('random')
+    Stats.tests_num = 10
+    Stats.fails_num = 2
+    operator_stats = mutation_scheduler().stats.setdefault(('StringMutator', 'flip_bit'), OperatorStats())
+    operator_stats.selections = 4
+    operator_stats.evaluations = 2
+    operator_stats.total_score = 30
+    stats_file_path = str(tmp_path / 'worker_stats.json')
+    dump_stats(stats_file_path)
+
+    set_mutation_scheduler('random')
+    Stats.tests_num = 5
+    Stats.fails_num = 0
+    merge_stats(stats_file_path)
+    merge_stats(stats_file_path)
+
+    assert Stats.tests_num == 25
+    assert Stats.fails_num == 4
+    merged_stats = mutation_scheduler().stats[('StringMutator', 'flip_bit')]
+    assert merged_stats.selections == 8
+    assert merged_stats.average_score == 15
@@ -0,0 +1,94 @@
+"""Measures how building and shortening of $filter options scale with the number of filter parts."""
+
+import sys
+import copy
+import time
+from argparse import ArgumentParser
+
+from odfuzz.entities import FilterOption, FilterOptionBuilder, FilterOptionDeleter
+
+
+def create_chained_filter(parts_num):
+    """Create a filter option value in the form of 'P0 eq 0 and P1 eq 1 and ... and PN eq N'."""
+    parts = [{'id': 'part{}'.format(index), 'name': 'P{}'.format(index), 'operator': 'eq', 'operand': str(index)}
+             for index in range(parts_num)]
+    logicals = []
+    for index in range(parts_num - 1):
+        logical_id = 'logical{}'.format(index)
+        logicals.append({'id': logical_id, 'name': 'and', 'left_id': parts[index]['id'],
+                         'right_id': parts[index + 1]['id']})
+        parts[index]['right_id'] = logical_id
+        parts[index + 1]['left_id'] = logical_id
+    return {'logicals': logicals, 'parts': parts, 'groups': []}
+
+
+def create_grouped_filter(parts_num):
+    """Create a filter option value in the form of 'P0 eq 0 and (P1 eq 1 and ... and PN eq N)'."""
+    option_value = create_chained_filter(parts_num)
+    first_part = option_value['parts'][0]
+    first_logical = option_value['logicals'][0]
+    del option_value['parts'][1]['left_id']
+
+    group = {'id': 'group0', 'logicals': [], 'left_id': first_logical['id']}
+    for logical in option_value['logicals'][1:]:
+        logical['group_id'] = group['id']
+        group['logicals'].append(logical['id'])
+    first_logical['right_id'] = group['id']
+    first_part['right_id'] = first_logical['id']
+    option_value['groups'].append(group)
+    return option_value
+
+
+SHAPES = {'chained': create_chained_filter, 'grouped': create_grouped_filter}
+
+
+def measure_build(option_value, repeats):
+    elapsed = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        filter_option = FilterOption(option_value['logicals'], option_value['parts'], option_value['groups'])
+        FilterOptionBuilder(filter_option).build()
+        elapsed += time.perf_counter() - start
+    return elapsed / repeats
+
+
+def measure_delete(option_value, repeats):
+    elapsed = 0
+    for _ in range(repeats):
+        copied_value = copy.deepcopy(option_value)
+        start = time.perf_counter()
+        logical = copied_value['logicals'].pop(select_deleted_logical(copied_value))
+        FilterOptionDeleter(copied_value, logical).remove_adjacent('right_id')
+        elapsed += time.perf_counter() - start
+    return elapsed / repeats
+
+
+def select_deleted_logical(option_value):
+    """Select the logical in the middle of the chain or the one next to the group, which deletes the whole group."""
+    if option_value['groups']:
+        return 0
+    return len(option_value['logicals']) // 2
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument('-m', '--max-parts', type=int, default=2048, help='the largest measured filter size')
+    arg_parser.add_argument('-r', '--repeats', type=int, default=50, help='number of measurements per filter size')
+    arg_parser.add_argument('-s', '--shape', choices=SHAPES, default='chained', help='a shape of the measured filters')
+    parsed_arguments = arg_parser.parse_args()
+
+    # the builder walks the filter recursively
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), parsed_arguments.max_parts * 5))
+
+    print('{:>8} {:>14} {:>14}'.format('parts', 'build [us]', 'delete [us]'))
+    parts_num = 4
+    while parts_num <= parsed_arguments.max_parts:
+        option_value = SHAPES[parsed_arguments.shape](parts_num)
+        build_time = measure_build(option_value, parsed_arguments.repeats)
+        delete_time = measure_delete(option_value, parsed_arguments.repeats)
+        print('{:>8} {:>14.1f} {:>14.1f}'.format(parts_num, build_time * 1e6, delete_time * 1e6))
+        parts_num *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Compares generating random values one by one with generating them in bulks for the value pools."""
+
+import time
+from argparse import ArgumentParser
+
+from odfuzz.generators import EdmBinary, EdmGuid, RandomGenerator, ValuePools
+import odfuzz.generators as generators
+
+
+def measure(generate, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        generate()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument('-n', '--number', type=int, default=100000, help='number of generated values per type')
+    arg_parser.add_argument('-p', '--pool-size', type=int, default=10000, help='size of the value pools')
+    parsed_arguments = arg_parser.parse_args()
+
+    value_generators = (
+        ('Edm.String', lambda: RandomGenerator.random_string(100)),
+        ('Edm.Binary', EdmBinary.generate),
+        ('Edm.Guid', EdmGuid.generate),
+    )
+
+    print('{:>12} {:>14} {:>14}'.format('type', 'single [us]', 'pooled [us]'))
+    for type_name, generate in value_generators:
+        generators.value_pools = ValuePools(0)
+        single_time = measure(generate, parsed_arguments.number)
+        generators.value_pools = ValuePools(parsed_arguments.pool_size)
+        pooled_time = measure(generate, parsed_arguments.number)
+        print('{:>12} {:>14.2f} {:>14.2f}'.format(type_name, single_time * 1e6, pooled_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
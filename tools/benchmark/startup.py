@@ -0,0 +1,110 @@
+"""Measures time and memory needed to build query groups from a metadata document."""
+
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from odfuzz.entities import DirectBuilder
+from odfuzz.restrictions import RestrictionsGroup
+
+PROPERTY_TYPES = (
+    'Type="Edm.String" MaxLength="40"',
+    'Type="Edm.Int32"',
+    'Type="Edm.Decimal" Precision="13" Scale="3"',
+    'Type="Edm.DateTime" Precision="7"',
+    'Type="Edm.Boolean"',
+    'Type="Edm.Guid"',
+)
+
+METADATA = """<edmx:Edmx xmlns:edmx="http://schemas.microsoft.com/ado/2007/06/edmx" \
+xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata" \
+xmlns:sap="http://www.sap.com/Protocols/SAPData" Version="1.0">
+ <edmx:DataServices m:DataServiceVersion="2.0">
+  <Schema xmlns="http://schemas.microsoft.com/ado/2008/09/edm" Namespace="BENCHMARK_SRV" xml:lang="en">
+   <ComplexType Name="Address">
+    <Property Name="Street" Type="Edm.String" MaxLength="60"/>
+    <Property Name="City" Type="Edm.String" MaxLength="40"/>
+   </ComplexType>
+{entity_types}
+{associations}
+   <EntityContainer Name="BENCHMARK_SRV" m:IsDefaultEntityContainer="true">
+{entity_sets}
+{association_sets}
+   </EntityContainer>
+  </Schema>
+ </edmx:DataServices>
+</edmx:Edmx>"""
+
+ENTITY_TYPE = """   <EntityType Name="Entity{index}">
+    <Key><PropertyRef Name="Key"/></Key>
+    <Property Name="Key" Type="Edm.String" MaxLength="10" Nullable="false"/>
+{proprties}
+    <Property Name="Address" Type="BENCHMARK_SRV.Address"/>
+    <NavigationProperty Name="toNext" Relationship="BENCHMARK_SRV.toNext{index}" \
+FromRole="FromRole_toNext{index}" ToRole="ToRole_toNext{index}"/>
+   </EntityType>"""
+
+ASSOCIATION = """   <Association Name="toNext{index}">
+    <End Type="BENCHMARK_SRV.Entity{index}" Multiplicity="1" Role="FromRole_toNext{index}"/>
+    <End Type="BENCHMARK_SRV.Entity{next_index}" Multiplicity="*" Role="ToRole_toNext{index}"/>
+   </Association>"""
+
+ENTITY_SET = """    <EntitySet Name="Entity{index}Set" EntityType="BENCHMARK_SRV.Entity{index}" sap:searchable="true"/>"""
+
+ASSOCIATION_SET = """    <AssociationSet Name="toNext{index}Set" Association="BENCHMARK_SRV.toNext{index}">
+     <End EntitySet="Entity{index}Set" Role="FromRole_toNext{index}"/>
+     <End EntitySet="Entity{next_index}Set" Role="ToRole_toNext{index}"/>
+    </AssociationSet>"""
+
+
+def create_metadata(entity_sets_num, proprties_num):
+    """Create a metadata document with a chain of associated entity sets."""
+    proprties = '\n'.join('    <Property Name="Property{}" {}/>'.format(index, PROPERTY_TYPES[index % len(PROPERTY_TYPES)])
+                          for index in range(proprties_num))
+    indexes = [(index, (index + 1) % entity_sets_num) for index in range(entity_sets_num)]
+    return METADATA.format(
+        entity_types='\n'.join(ENTITY_TYPE.format(index=index, proprties=proprties) for index, _ in indexes),
+        associations='\n'.join(ASSOCIATION.format(index=index, next_index=next_index) for index, next_index in indexes),
+        entity_sets='\n'.join(ENTITY_SET.format(index=index) for index, _ in indexes),
+        association_sets='\n'.join(ASSOCIATION_SET.format(index=index, next_index=next_index)
+                                   for index, next_index in indexes)
+    ).encode('utf-8')
+
+
+def build(metadata, restrictions_file):
+    return DirectBuilder(metadata, RestrictionsGroup(restrictions_file)).build()
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument('-m', '--metadata', type=str, help='a metadata file used instead of the generated one')
+    arg_parser.add_argument('-r', '--restrictions', type=str, help='a restrictions file')
+    arg_parser.add_argument('-e', '--entity-sets', type=int, default=500, help='number of generated entity sets')
+    arg_parser.add_argument('-p', '--properties', type=int, default=20,
+                            help='number of generated properties per entity type')
+    parsed_arguments = arg_parser.parse_args()
+
+    if parsed_arguments.metadata:
+        with open(parsed_arguments.metadata, 'rb') as metadata_file:
+            metadata = metadata_file.read()
+    else:
+        metadata = create_metadata(parsed_arguments.entity_sets, parsed_arguments.properties)
+
+    start = time.perf_counter()
+    queryable_entities = build(metadata, parsed_arguments.restrictions)
+    elapsed = time.perf_counter() - start
+    del queryable_entities
+
+    # memory is traced in a separate build, because tracing slows the build down
+    tracemalloc.start()
+    queryable_entities = build(metadata, parsed_arguments.restrictions)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('Query groups: {}'.format(len(queryable_entities.all())))
+    print('Build time: {:.2f} s'.format(elapsed))
+    print('Retained memory: {:.1f} MB (peak {:.1f} MB)'.format(current / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()